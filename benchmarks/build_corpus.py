@@ -0,0 +1,147 @@
+"""
+指令解析基准语料生成脚本
+按模板确定性地生成带标注的语音指令语料，输出为JSON Lines文件
+
+用法：python -m benchmarks.build_corpus [--output benchmarks/data/parser_corpus_v1.jsonl]
+"""
+import os
+import sys
+import json
+import argparse
+import itertools
+
+CORPUS_VERSION = "v1"
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(__file__), "data", f"parser_corpus_{CORPUS_VERSION}.jsonl")
+
+PREFIXES = ["", "请", "帮我", "麻烦", "小助手，"]
+SUFFIXES = ["", "吧", "。", "，谢谢", "！"]
+
+CHINESE_NUMBERS = {
+    10: "十", 15: "十五", 20: "二十", 25: "二十五", 30: "三十", 40: "四十",
+    45: "四十五", 50: "五十", 60: "六十", 70: "七十", 75: "七十五", 80: "八十", 90: "九十", 100: "一百",
+}
+
+APPS = {"记事本": "notepad", "计算器": "calculator", "浏览器": "browser", "任务管理器": "task_manager"}
+
+FOLDERS = {"下载": "~/Downloads", "桌面": "~/Desktop", "文档": "~/Documents", "图片": "~/Pictures", "音乐": "~/Music"}
+
+FILENAMES = ["季度报告", "会议纪要", "预算表", "简历", "合同草稿", "年终总结", "项目计划", "发票"]
+
+FIXED_PHRASES = {
+    ("play_music", "{}"): ["播放音乐", "放首歌", "听音乐", "播放歌曲", "来点音乐", "我想听歌", "放点歌听听", "继续播放", "放一首歌"],
+    ("pause_music", "{}"): ["暂停音乐", "停止播放", "暂停播放", "别放了", "先停一下音乐", "把歌停了", "音乐先停了"],
+    ("next_song", "{}"): ["下一首", "切歌", "换一首歌", "下一首歌", "换首歌", "跳过这首歌"],
+    ("previous_song", "{}"): ["上一首", "回到上一首歌", "上一首歌", "放上一首", "刚才那首再放一遍"],
+    ("lock_screen", "{}"): ["锁屏", "锁定电脑", "锁定屏幕", "帮我锁一下电脑", "把屏幕锁上", "锁一下屏幕", "我要离开一下锁住电脑"],
+}
+
+UNKNOWN_PHRASES = [
+    "今天天气怎么样", "给我讲个笑话", "你叫什么名字", "现在几点了", "明天要下雨吗", "帮我订一张机票",
+    "晚饭吃什么好", "这首歌叫什么", "你好", "谢谢你", "没事了", "算了",
+]
+
+
+def _entry(text, command, parameters, category):
+    return {"text": text, "command": command, "parameters": parameters, "category": category}
+
+
+def _decorate(phrase):
+    """为基础说法加上常见的前后缀"""
+    for prefix, suffix in itertools.product(PREFIXES, SUFFIXES):
+        yield f"{prefix}{phrase}{suffix}"
+
+
+def _level_entries(command, subjects, category):
+    """音量/亮度调节语料"""
+    relative = {
+        "increase": ["调高", "调大", "大一点", "高一点", "增加"],
+        "decrease": ["调低", "调小", "小一点", "低一点", "减少"],
+    }
+    if command == "adjust_brightness":
+        relative = {
+            "increase": ["调高", "调亮", "亮一点", "高一点", "增加"],
+            "decrease": ["调低", "调暗", "暗一点", "低一点", "减少"],
+        }
+    # 可以直接跟数值的调节词
+    with_amount = {"increase": ["调高", "增加"], "decrease": ["调低", "减少"]}
+
+    for subject in subjects:
+        for action, words in relative.items():
+            for word in words:
+                for phrase in _decorate(f"把{subject}{word}"):
+                    yield _entry(phrase, command, {"action": action, "amount": 10}, category)
+            for word in with_amount[action]:
+                for amount in (10, 15, 20, 30, 50):
+                    yield _entry(f"{subject}{word}{CHINESE_NUMBERS[amount]}", command,
+                                 {"action": action, "amount": amount}, category)
+                    yield _entry(f"把{subject}{word}{amount}%", command,
+                                 {"action": action, "amount": amount}, category)
+
+        for amount, chinese in CHINESE_NUMBERS.items():
+            for template in ("把{s}调到{n}", "{s}调到{n}", "{s}设置为{n}", "{s}调成百分之{n}"):
+                yield _entry(template.format(s=subject, n=chinese), command,
+                             {"action": "set", "amount": amount}, category)
+            yield _entry(f"{subject}调到{amount}%", command, {"action": "set", "amount": amount}, category)
+
+
+def build_corpus():
+    """生成完整语料（顺序与内容确定）"""
+    entries = []
+
+    entries.extend(_level_entries("adjust_volume", ["音量", "声音"], "volume"))
+    entries.extend(_level_entries("adjust_brightness", ["亮度", "屏幕亮度"], "brightness"))
+
+    for (command, parameters), phrases in FIXED_PHRASES.items():
+        for phrase in phrases:
+            for text in _decorate(phrase):
+                entries.append(_entry(text, command, json.loads(parameters), command))
+
+    for name, app in APPS.items():
+        for verb in ("打开", "启动", "开一下"):
+            for text in _decorate(f"{verb}{name}"):
+                entries.append(_entry(text, "open_app", {"app_name": app}, "open_app"))
+        for template in ("关掉{}", "关闭{}", "把{}关了", "关一下{}"):
+            for text in _decorate(template.format(name)):
+                entries.append(_entry(text, "close_app", {"app_name": app}, "close_app"))
+
+    for name, path in FOLDERS.items():
+        for template in ("打开{}文件夹", "打开{}目录", "浏览{}文件夹"):
+            for text in _decorate(template.format(name)):
+                entries.append(_entry(text, "open_folder", {"path": path}, "open_folder"))
+
+    for filename in FILENAMES:
+        for template in ("搜索名为{}的文件", "查找“{}”", "找一下{}文件", "搜索文件{}"):
+            for text in _decorate(template.format(filename)):
+                entries.append(_entry(text, "search_file", {"filename": filename}, "search_file"))
+
+    for phrase in UNKNOWN_PHRASES:
+        for text in _decorate(phrase):
+            entries.append(_entry(text, None, {}, "unknown"))
+
+    # 去重并编号
+    unique = {}
+    for entry in entries:
+        unique.setdefault(entry["text"], entry)
+    return [dict(id=f"{CORPUS_VERSION}-{index:05d}", **entry) for index, entry in enumerate(unique.values())]
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="生成指令解析基准语料")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="输出文件路径")
+    args = parser.parse_args()
+
+    corpus = build_corpus()
+    output_dir = os.path.dirname(args.output)
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    with open(args.output, "w", encoding="utf-8") as f:
+        for entry in corpus:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    print(f"已生成语料 {CORPUS_VERSION}：{len(corpus)} 条 -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
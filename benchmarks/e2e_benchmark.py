@@ -0,0 +1,268 @@
+"""
+端到端延迟基准测试
+用虚拟麦克风回放脚本化的语音会话，经真实的采集、语音活动检测、识别队列与指令解析流程，
+识别与系统执行使用模拟组件，统计从说完话到指令执行完成的延迟。无需声卡与网络，结果可复现
+
+用法：python -m benchmarks.e2e_benchmark [--speed 10] [--recognition-latency 0.3] [--output 结果.json]
+      python -m benchmarks.e2e_benchmark --wav 录音1.wav --transcript 打开记事本 --wav 录音2.wav --transcript 锁屏
+      python -m benchmarks.e2e_benchmark --session 会话.json   （内容为 VirtualMicrophone 的片段列表）
+"""
+import os
+import sys
+import json
+import math
+import time
+import array
+import argparse
+import platform
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import speech_recognition as sr
+from config.settings import SAMPLE_RATE
+from modules.command_parser import CommandParser
+from modules.llm_backend import LLMBackend
+from modules.noise_calibration import NoiseCalibrationStore
+from modules.recognizer_backend import RecognizerBackend, RecognitionResult
+from modules.virtual_microphone import VirtualMicrophone
+from benchmarks.parser_benchmark import percentile, _git_revision
+
+# 默认会话：每条指令一段合成的类元音音频（基频各不相同），以及期望执行的命令
+DEFAULT_SESSION = [
+    ("打开记事本", "open_app"),
+    ("音量调高", "adjust_volume"),
+    ("锁屏", "lock_screen"),
+    ("暂停音乐", "pause_music"),
+    ("屏幕亮一点", "adjust_brightness"),
+]
+
+
+def synthesize_clip(text, f0, sample_rate=SAMPLE_RATE, seconds_per_char=0.22, amplitude=0.3):
+    """合成一段带谐波结构的类元音音频（16位PCM），时长随文本长度增加"""
+    count = int(len(text) * seconds_per_char * sample_rate)
+    harmonics = [k for k in range(1, 25) if f0 * k < sample_rate / 2]
+    peak = sum(1 / k for k in harmonics)
+    samples = array.array('h', (
+        int(amplitude * 32767 / peak * sum(math.sin(2 * math.pi * f0 * k * i / sample_rate) / k for k in harmonics))
+        for i in range(count)
+    ))
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    return samples.tobytes()
+
+
+def default_script(gap=1.2, lead_in=1.5):
+    """默认会话脚本：开头留出环境噪声校准的静音，指令之间间隔gap秒"""
+    script = [lead_in]
+    for index, (text, command) in enumerate(DEFAULT_SESSION):
+        script.append({"pcm": synthesize_clip(text, 110 + 15 * index), "transcript": text, "command": command})
+        script.append(gap)
+    return script
+
+
+class FakeRecognizerBackend(RecognizerBackend):
+    """模拟识别后端：在音频中找到脚本片段，返回其标注文本，按设定延迟返回"""
+    name = 'fake'
+
+    def __init__(self, microphone, latency=0.0):
+        super().__init__()
+        self.microphone = microphone
+        self.latency = latency
+        self.recognized = []  # (片段, 开始识别时刻)
+
+    def _recognize(self, audio):
+        began = time.perf_counter()
+        clip = self.microphone.find_clip(audio.get_raw_data(convert_rate=self.microphone.SAMPLE_RATE,
+                                                            convert_width=2))
+        if self.latency:
+            time.sleep(self.latency)
+        if clip is None or not clip["transcript"]:
+            raise sr.UnknownValueError()
+        with self._lock:
+            self.recognized.append((clip, began))
+        return RecognitionResult(clip["transcript"], 0.95, self.name)
+
+
+class RecordingExecutor:
+    """模拟系统执行器：记录执行的命令与时刻，不操作系统"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.executed = []
+        self._lock = threading.Lock()
+
+    def execute_command(self, command_data):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.executed.append((dict(command_data), time.perf_counter()))
+        return {"success": True, "message": f"已执行：{command_data.get('command')}"}
+
+
+class SilentFeedback:
+    """模拟语音反馈：只记录要播报的文本"""
+
+    def __init__(self):
+        self.spoken = []
+
+    def speak(self, text, priority=1):
+        self.spoken.append(text)
+
+    def speak_command_result(self, result):
+        self.speak(result.get("message"))
+
+    def speak_command_results(self, results):
+        self.speak("；".join(result.get("message", "") for result in results))
+
+    def speak_error(self, error_message):
+        self.speak(error_message)
+
+    def speak_welcome(self):
+        pass
+
+    def speak_goodbye(self):
+        pass
+
+    def clear_queue(self):
+        pass
+
+    def get_status(self):
+        return {"spoken": len(self.spoken)}
+
+
+def run_benchmark(script=None, speed=10.0, recognition_latency=0.0, execution_latency=0.0, timeout=None):
+    """回放会话并返回报告字典"""
+    from main import VoiceControlAssistant
+
+    script = script or default_script()
+    microphone = VirtualMicrophone(script, speed=speed)
+    recognizer_backend = FakeRecognizerBackend(microphone, recognition_latency)
+    executor = RecordingExecutor(execution_latency)
+    command_parser = CommandParser(LLMBackend(api_key=None, base_url=None), parse_cache_path=None,
+                                   learned_rules_path=None)
+
+    assistant = VoiceControlAssistant(
+        audio_source=microphone,
+        recognizer_backend=recognizer_backend,
+        command_parser=command_parser,
+        system_executor=executor,
+        voice_feedback=SilentFeedback()
+    )
+    # 每次都在回放音频上校准，不读写已保存的校准结果
+    assistant.voice_input.noise_calibration = NoiseCalibrationStore()
+
+    # 记录每条语音指令处理完成的时刻
+    handled = []
+    handle_voice_input = assistant._handle_voice_input
+
+    def timed_handler(voice_text, error_message=None):
+        handle_voice_input(voice_text, error_message)
+        if voice_text:
+            handled.append((voice_text, time.perf_counter()))
+
+    assistant._handle_voice_input = timed_handler
+
+    began = time.perf_counter()
+    if not assistant.start(block=False):
+        raise RuntimeError("语音控制助手启动失败")
+    finished = microphone.finished.wait(timeout or microphone.duration / max(speed, 1.0) + 30)
+    assistant.voice_input.recognition_queue.join(10)
+    wall_time = time.perf_counter() - began
+    status = assistant.get_status()["voice_input_status"]
+    assistant.stop()
+
+    # 按片段统计：说完话（最后一个采样送出）到开始识别、到指令执行完成
+    recognized_at = {id(clip): at for clip, at in recognizer_backend.recognized}
+    utterances = []
+    for clip in microphone.clips:
+        entry = {"name": clip["name"], "transcript": clip["transcript"], "recognized": id(clip) in recognized_at}
+        if entry["recognized"]:
+            entry["endpoint_ms"] = round((recognized_at[id(clip)] - clip["ended_at"]) * 1000, 2)
+            done = next((at for text, at in handled if text == clip["transcript"] and at >= clip["ended_at"]), None)
+            entry["end_to_end_ms"] = round((done - clip["ended_at"]) * 1000, 2) if done else None
+        utterances.append(entry)
+
+    # 脚本中标注了期望命令时，按顺序核对实际执行的命令
+    expected = [
+        item.get("command") if isinstance(item, dict) else None
+        for item in script if isinstance(item, str) or (isinstance(item, dict) and ("pcm" in item or "wav" in item))
+    ]
+    executed_commands = [command.get("command") for command, _ in executor.executed]
+    labeled = [(index, command) for index, command in enumerate(expected) if command]
+    endpoint = [entry["endpoint_ms"] for entry in utterances if entry.get("endpoint_ms") is not None]
+    end_to_end = [entry["end_to_end_ms"] for entry in utterances if entry.get("end_to_end_ms") is not None]
+    return {
+        "environment": {
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform()
+        },
+        "settings": {
+            "speed": speed,
+            "recognition_latency": recognition_latency,
+            "execution_latency": execution_latency
+        },
+        "audio_s": round(microphone.duration, 3),
+        "wall_time_s": round(wall_time, 3),
+        "completed": finished,
+        "clips": len(microphone.clips),
+        "recognized": len(recognizer_backend.recognized),
+        "executed": executed_commands,
+        "command_accuracy": round(sum(
+            1 for index, command in labeled
+            if index < len(executed_commands) and executed_commands[index] == command
+        ) / len(labeled), 4) if labeled else None,
+        "endpoint_ms": {"p50": percentile(endpoint, 50), "p95": percentile(endpoint, 95)} if endpoint else None,
+        "end_to_end_ms": {"p50": percentile(end_to_end, 50), "p95": percentile(end_to_end, 95)} if end_to_end else None,
+        "utterances": utterances,
+        "capture": status["capture"],
+        "vad": status["vad"],
+        "queue": status["queue"]
+    }
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="端到端延迟基准测试")
+    parser.add_argument("--wav", action="append", help="回放的录音文件（可多次指定）")
+    parser.add_argument("--transcript", action="append", help="与 --wav 一一对应的识别文本")
+    parser.add_argument("--session", help="会话脚本JSON（VirtualMicrophone 片段列表）")
+    parser.add_argument("--speed", type=float, default=10.0, help="回放速度倍数（1为实时）")
+    parser.add_argument("--recognition-latency", type=float, default=0.3, help="模拟识别延迟（秒）")
+    parser.add_argument("--execution-latency", type=float, default=0.0, help="模拟执行延迟（秒）")
+    parser.add_argument("--output", help="结果JSON输出路径")
+    args = parser.parse_args()
+
+    script = None
+    if args.session:
+        with open(args.session, 'r', encoding='utf-8') as f:
+            script = json.load(f)
+    elif args.wav:
+        script = VirtualMicrophone.from_wav_files(args.wav, args.transcript).script
+
+    report = run_benchmark(
+        script,
+        speed=args.speed,
+        recognition_latency=args.recognition_latency,
+        execution_latency=args.execution_latency
+    )
+
+    print(f"回放 {report['audio_s']}秒音频（{args.speed}倍速），耗时 {report['wall_time_s']}秒；"
+          f"{report['clips']} 条指令，识别 {report['recognized']} 条，执行 {len(report['executed'])} 条")
+    if report["end_to_end_ms"]:
+        print(f"  说完话到开始识别 p50 {report['endpoint_ms']['p50']}ms  p95 {report['endpoint_ms']['p95']}ms")
+        print(f"  说完话到执行完成 p50 {report['end_to_end_ms']['p50']}ms  p95 {report['end_to_end_ms']['p95']}ms")
+
+    if args.output:
+        output_dir = os.path.dirname(args.output)
+        if output_dir and not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存：{args.output}")
+    return 0 if report["completed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
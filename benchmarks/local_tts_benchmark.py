@@ -0,0 +1,124 @@
+"""
+本地语音合成开销基准测试
+比较每条播报启动一次 espeak 进程与常驻 espeak 进程（--stdin）两种方式下，从提交文本到收到首批音频的耗时。
+音频只读取不播放，结果只反映合成引擎本身的开销
+
+用法：python -m benchmarks.local_tts_benchmark [--repeat 3] [--executable espeak-ng] [--output 结果.json]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from config.settings import TTS_PREWARM_PHRASES, LOCAL_TTS_RATE
+from modules.local_tts import EspeakProcess, find_espeak
+from benchmarks.parser_benchmark import percentile, _git_revision
+
+
+class DiscardPlayer:
+    """读取并丢弃音频的播放器"""
+
+    def __init__(self):
+        self.bytes = 0
+
+    def play_pcm(self, pieces, sample_width, channels, rate, stop_event=None, on_start=None):
+        for index, pcm in enumerate(pieces):
+            if index == 0 and on_start:
+                on_start()
+            self.bytes += len(pcm)
+        return True
+
+
+def spawn_latencies(executable, voice, phrases):
+    """每条播报启动一个进程（原 os.system 方式），返回各条到收到首批音频的耗时（秒）"""
+    latencies = []
+    for text in phrases:
+        began = time.perf_counter()
+        process = subprocess.Popen([executable, '-v', voice, '-s', str(LOCAL_TTS_RATE), '--stdout', text],
+                                   stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        process.stdout.read(64)
+        latencies.append(time.perf_counter() - began)
+        process.stdout.read()
+        process.stdout.close()
+        process.wait()
+    return latencies
+
+
+def persistent_latencies(executable, voice, phrases):
+    """常驻进程逐行播报（先播报一条预热），返回各条到收到首批音频的耗时（秒）与引擎状态"""
+    engine = EspeakProcess(DiscardPlayer(), executable=executable, voice=voice)
+    engine.start()
+    latencies = []
+    try:
+        # 进程启动与语音数据加载只发生一次，不计入单条开销
+        engine.speak(phrases[0])
+        for text in phrases:
+            began = time.perf_counter()
+            first = []
+            engine.speak(text, on_start=lambda: first.append(time.perf_counter() - began))
+            if first:
+                latencies.append(first[0])
+        return latencies, engine.get_status()
+    finally:
+        engine.close()
+
+
+def summarize(latencies):
+    """耗时（秒）的毫秒分位数"""
+    values = [value * 1000 for value in latencies]
+    return {"p50": round(percentile(values, 50), 2), "p95": round(percentile(values, 95), 2)}
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="本地语音合成开销基准测试")
+    parser.add_argument("--executable", default=None, help="espeak / espeak-ng 路径，默认自动查找")
+    parser.add_argument("--voice", default=None, help="发音人，默认 espeak-ng 为 cmn、espeak 为 zh")
+    parser.add_argument("--repeat", type=int, default=3, help="固定播报重复的轮数")
+    parser.add_argument("--output", help="结果JSON输出路径")
+    args = parser.parse_args()
+
+    executable = args.executable or find_espeak()
+    if not executable:
+        print("未找到 espeak 或 espeak-ng")
+        return 1
+    voice = args.voice or ('cmn' if os.path.basename(executable).startswith('espeak-ng') else 'zh')
+    phrases = list(TTS_PREWARM_PHRASES) * args.repeat
+
+    spawn = spawn_latencies(executable, voice, phrases)
+    persistent, engine_status = persistent_latencies(executable, voice, phrases)
+    report = {
+        "environment": {
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "engine": executable
+        },
+        "utterances": len(phrases),
+        "spawn_ms": summarize(spawn),
+        "persistent_ms": summarize(persistent) if persistent else None,
+        "engine": engine_status
+    }
+
+    print(f"{len(phrases)} 条播报，提交到收到首批音频：")
+    print(f"  每条启动进程  p50 {report['spawn_ms']['p50']}ms  p95 {report['spawn_ms']['p95']}ms")
+    if report["persistent_ms"]:
+        print(f"  常驻进程      p50 {report['persistent_ms']['p50']}ms  p95 {report['persistent_ms']['p95']}ms")
+
+    if args.output:
+        output_dir = os.path.dirname(args.output)
+        if output_dir and not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存：{args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
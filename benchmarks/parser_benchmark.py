@@ -0,0 +1,295 @@
+"""
+指令解析基准测试
+使用确定性的模拟LLM后端运行CommandParser，统计各解析层级的命中占比、延迟分位数、吞吐量与准确率
+
+用法：python -m benchmarks.parser_benchmark [--corpus 路径] [--passes 2] [--output 结果.json]
+      指定 --base-url 时改为请求真实的OpenAI兼容服务（如 tools.mock_llm_server）
+"""
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import platform
+import subprocess
+from types import SimpleNamespace
+from collections import Counter, defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from modules.command_parser import CommandParser
+from modules.llm_backend import LLMBackend
+from benchmarks.build_corpus import DEFAULT_OUTPUT as DEFAULT_CORPUS
+
+TIERS = ["direct", "slot", "local", "cache", "llm"]
+
+# 准确率下限：整体（overall）与各本地解析层级低于该值时基准测试失败（测试用例同样检查）
+MIN_ACCURACY = {"overall": 0.97, "direct": 0.99, "slot": 0.98, "local": 0.99}
+# 每个意图类别的准确率下限，避免个别类别的混淆被整体准确率掩盖
+MIN_CATEGORY_ACCURACY = 0.98
+
+
+class FakeLLMClient:
+    """
+    确定性的模拟OpenAI客户端
+    根据提示词中的指令文本返回语料标注结果，延迟与出错与否由指令文本的哈希决定
+    """
+
+    def __init__(self, labels, latency=0.0, jitter=0.0, error_rate=0.0):
+        self.labels = labels
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def _seed(self, voice_text):
+        return int(hashlib.md5(voice_text.encode('utf-8')).hexdigest()[:8], 16)
+
+    def _response(self, voice_text):
+        rng = random.Random(self._seed(voice_text))
+        label = self.labels.get(voice_text)
+        if label is None or rng.random() < self.error_rate:
+            return {"command": None, "parameters": {}, "confidence": 0, "error": "无法理解的指令"}, rng
+        return {"command": label["command"], "parameters": label["parameters"], "confidence": 0.9}, rng
+
+    def create(self, messages, stream=False, **kwargs):
+        self.requests += 1
+        prompt = messages[-1]["content"]
+        voice_text = prompt.split("指令：", 1)[1].splitlines()[0].strip()
+        response, rng = self._response(voice_text)
+        if self.latency:
+            time.sleep(max(0.0, self.latency + rng.uniform(-self.jitter, self.jitter)))
+
+        content = json.dumps(response, ensure_ascii=False)
+        if stream:
+            return self._stream(content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    def _stream(self, content):
+        for start in range(0, len(content), 4):
+            delta = SimpleNamespace(content=content[start:start + 4])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+def load_corpus(path):
+    """加载JSON Lines语料"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentile(values, percent):
+    """计算分位数（最近秩法）"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(percent / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def _normalize_parameters(parameters):
+    """统一参数格式，路径展开用户目录后比较"""
+    normalized = dict(parameters or {})
+    if isinstance(normalized.get("path"), str):
+        normalized["path"] = os.path.normpath(os.path.expanduser(normalized["path"]))
+    return normalized
+
+
+def is_correct(entry, result):
+    """判断解析结果是否与标注一致"""
+    if entry["command"] is None:
+        return not result.get("command")
+    return (result.get("command") == entry["command"]
+            and _normalize_parameters(result.get("parameters")) == _normalize_parameters(entry["parameters"]))
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run_benchmark(corpus, passes=2, llm_latency=0.0, llm_jitter=0.0, llm_error_rate=0.0, seed=0, max_errors=20,
+                  llm_backend=None):
+    """
+    运行基准测试并返回报告字典
+    llm_backend: 指定时通过该后端请求LLM服务，否则使用进程内的模拟客户端
+    """
+    labels = {entry["text"]: entry for entry in corpus}
+    # 缓存与学习规则只保存在内存中，不读写默认的磁盘文件
+    parser = CommandParser(llm_backend, parse_cache_path=None, learned_rules_path=None)
+    if llm_backend is None:
+        parser.llm_client = FakeLLMClient(labels, llm_latency, llm_jitter, llm_error_rate)
+
+    latencies = defaultdict(list)
+    correct = Counter()
+    totals = Counter()
+    category_totals = Counter()
+    category_correct = Counter()
+    errors = []
+
+    order = list(corpus)
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    for _ in range(passes):
+        rng.shuffle(order)
+        for entry in order:
+            before = Counter(parser.tier_counts)
+            began = time.perf_counter()
+            result = parser.parse_voice_command(entry["text"])
+            elapsed = time.perf_counter() - began
+
+            changed = [tier for tier in TIERS if parser.tier_counts[tier] > before[tier]]
+            tier = changed[-1] if changed else "none"
+            latencies[tier].append(elapsed)
+            totals[tier] += 1
+            category_totals[entry["category"]] += 1
+
+            if is_correct(entry, result):
+                correct[tier] += 1
+                category_correct[entry["category"]] += 1
+            elif len(errors) < max_errors:
+                errors.append({
+                    "id": entry["id"], "text": entry["text"], "tier": tier,
+                    "expected": {"command": entry["command"], "parameters": entry["parameters"]},
+                    "actual": {"command": result.get("command"), "parameters": result.get("parameters")}
+                })
+    wall_time = time.perf_counter() - start
+
+    total = sum(totals.values())
+    tiers = {}
+    for tier in TIERS + ["none"]:
+        if not totals[tier]:
+            continue
+        values = latencies[tier]
+        tiers[tier] = {
+            "count": totals[tier],
+            "share": round(totals[tier] / total, 4),
+            "accuracy": round(correct[tier] / totals[tier], 4),
+            "latency_ms": {
+                "p50": round(percentile(values, 50) * 1000, 4),
+                "p95": round(percentile(values, 95) * 1000, 4),
+                "p99": round(percentile(values, 99) * 1000, 4),
+                "mean": round(sum(values) / len(values) * 1000, 4)
+            }
+        }
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    return {
+        "corpus": {"size": len(corpus), "version": corpus[0]["id"].split("-")[0] if corpus else None},
+        "environment": {
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform()
+        },
+        "settings": {
+            "passes": passes,
+            "llm_latency": llm_latency,
+            "llm_jitter": llm_jitter,
+            "llm_error_rate": llm_error_rate,
+            "seed": seed,
+            "llm_backend": llm_backend.get_status() if llm_backend else "in-process"
+        },
+        "utterances": total,
+        "wall_time_s": round(wall_time, 4),
+        "throughput_per_s": round(total / wall_time, 2) if wall_time else None,
+        "accuracy": round(sum(correct.values()) / total, 4) if total else None,
+        "latency_ms": {
+            "p50": round(percentile(all_latencies, 50) * 1000, 4),
+            "p95": round(percentile(all_latencies, 95) * 1000, 4),
+            "p99": round(percentile(all_latencies, 99) * 1000, 4)
+        } if all_latencies else None,
+        "llm_requests": parser.llm_client.requests if llm_backend is None else parser.tier_counts["llm"],
+        "tiers": tiers,
+        "categories": {
+            category: round(category_correct[category] / count, 4)
+            for category, count in sorted(category_totals.items())
+        },
+        "errors": errors
+    }
+
+
+def check_accuracy(report, minimum=None, category_minimum=None):
+    """
+    检查整体、各层级与各类别准确率是否达到下限
+    返回未达标项的列表：[{"scope": "overall/层级/category:类别", "accuracy": 实际值, "minimum": 下限}, ...]
+    """
+    minimum = MIN_ACCURACY if minimum is None else minimum
+    category_minimum = MIN_CATEGORY_ACCURACY if category_minimum is None else category_minimum
+    actual = {tier: stats["accuracy"] for tier, stats in report["tiers"].items()}
+    actual["overall"] = report["accuracy"]
+    failures = [
+        {"scope": scope, "accuracy": actual[scope], "minimum": bound}
+        for scope, bound in minimum.items()
+        if actual.get(scope) is not None and actual[scope] < bound
+    ]
+    failures.extend(
+        {"scope": f"category:{category}", "accuracy": accuracy, "minimum": category_minimum}
+        for category, accuracy in report["categories"].items()
+        if accuracy < category_minimum
+    )
+    return failures
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="指令解析基准测试")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="语料文件（JSON Lines）")
+    parser.add_argument("--passes", type=int, default=2, help="语料重复轮数（第二轮起可命中缓存）")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="模拟LLM延迟（秒）")
+    parser.add_argument("--llm-jitter", type=float, default=0.0, help="模拟LLM延迟抖动（秒）")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="模拟LLM解析失败的比例")
+    parser.add_argument("--seed", type=int, default=0, help="语料打乱顺序的随机种子")
+    parser.add_argument("--base-url", help="OpenAI兼容服务地址（如 http://127.0.0.1:8765/v1）")
+    parser.add_argument("--model", default="mock", help="配合 --base-url 使用的模型名称")
+    parser.add_argument("--timeout", type=float, default=10.0, help="配合 --base-url 使用的请求超时（秒）")
+    parser.add_argument("--output", help="结果JSON输出路径")
+    parser.add_argument("--no-accuracy-check", action="store_true", help="准确率低于下限时不返回失败状态")
+    args = parser.parse_args()
+
+    llm_backend = None
+    if args.base_url:
+        llm_backend = LLMBackend(base_url=args.base_url, model=args.model, timeout=args.timeout, max_retries=0)
+
+    report = run_benchmark(
+        load_corpus(args.corpus),
+        passes=args.passes,
+        llm_latency=args.llm_latency,
+        llm_jitter=args.llm_jitter,
+        llm_error_rate=args.llm_error_rate,
+        seed=args.seed,
+        llm_backend=llm_backend
+    )
+    report["accuracy_failures"] = check_accuracy(report)
+
+    print(f"语料 {report['corpus']['version']}：{report['utterances']} 次解析，"
+          f"吞吐量 {report['throughput_per_s']}/秒，准确率 {report['accuracy']:.2%}")
+    for tier, stats in report["tiers"].items():
+        latency = stats["latency_ms"]
+        print(f"  {tier:<7} 占比 {stats['share']:>7.2%}  准确率 {stats['accuracy']:>7.2%}  "
+              f"p50 {latency['p50']:.3f}ms  p95 {latency['p95']:.3f}ms  p99 {latency['p99']:.3f}ms")
+
+    if args.output:
+        output_dir = os.path.dirname(args.output)
+        if output_dir and not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存：{args.output}")
+
+    for failure in report["accuracy_failures"]:
+        print(f"准确率低于下限：{failure['scope']} {failure['accuracy']:.2%} < {failure['minimum']:.2%}")
+    if report["accuracy_failures"] and not args.no_accuracy_check:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,6 +2,7 @@
 应用配置文件
 """
 import os
+import re
 from dotenv import load_dotenv
 
 # 加载环境变量
@@ -21,6 +22,71 @@ SAMPLE_RATE = 16000
 CHUNK_SIZE = 1024
 CHANNELS = 1
 AUDIO_FORMAT = 'int16'
+AUDIO_PRE_ROLL_MS = 300  # 语句起点前保留的音频时长（毫秒），避免首字被截断
+AUDIO_BUFFER_SECONDS = 15  # 采集环形缓冲区的时长（秒），需大于预录音与最长语句之和
+PHRASE_TIME_LIMIT = 10  # 单条语句的最长时长（秒）
+# 环境噪声校准结果（按输入设备保存），置空则每次启动都重新校准
+NOISE_CALIBRATION_PATH = os.getenv('NOISE_CALIBRATION_PATH', os.path.join('cache', 'noise_calibration.json'))
+NOISE_CALIBRATION_MAX_AGE = 7 * 24 * 3600  # 校准结果有效期（秒），过期后启动时重新校准
+NOISE_CALIBRATION_SAVE_INTERVAL = 60  # 运行中写回动态阈值的最短间隔（秒）
+
+# 语音识别模式：phrase=按停顿切分整句后上传识别，streaming=边说边推送音频的流式连续识别
+RECOGNITION_MODE = os.getenv('RECOGNITION_MODE', 'phrase')
+STREAMING_RECOGNIZER = os.getenv('STREAMING_RECOGNIZER', 'azure')  # azure / socket（本地流式识别服务）
+STREAMING_SERVER_ADDRESS = os.getenv('STREAMING_SERVER_ADDRESS', '127.0.0.1:8766')  # socket 识别服务地址
+STREAMING_END_SILENCE_MS = 300  # 说话停止后多久给出最终结果（毫秒）
+
+# 识别队列：录音线程只负责入队，由工作线程识别并处理指令
+RECOGNITION_QUEUE_SIZE = 4  # 排队等待识别的音频段上限
+RECOGNITION_WORKERS = 1  # 工作线程数；大于1时多条指令可能并行执行、不保证顺序
+RECOGNITION_OVERFLOW_POLICY = 'drop_oldest'  # 队列满时：drop_oldest / drop_newest / block
+RECOGNITION_BLOCK_TIMEOUT = 5  # block策略下录音线程最长等待时间（秒）
+
+# 语音活动检测（整句识别模式下，不含语音的音频段不上传识别）
+VAD_ENABLED = True
+VAD_FRAME_MS = 30
+VAD_ENERGY_THRESHOLD_DB = -45  # 语音帧的最低能量（dBFS）
+VAD_ZCR_RANGE = (0.01, 0.35)  # 语音帧的过零率范围
+VAD_FLATNESS_THRESHOLD = 0.4  # 频谱平坦度上限，宽带噪声（关门声、键盘声）接近0.5以上
+VAD_MIN_SPEECH_MS = 150  # 音频段中语音帧累计达到该时长才上传识别
+
+# 唤醒词（整句识别模式下，检测到唤醒词后才识别随后的指令）
+WAKE_WORD_ENABLED = os.getenv('WAKE_WORD_ENABLED', 'false').lower() == 'true'
+WAKE_WORD_TEMPLATE_DIR = os.getenv('WAKE_WORD_TEMPLATE_DIR', os.path.join('models', 'wake_word'))  # 唤醒词录音（WAV）
+WAKE_WORD_THRESHOLD = 0.25  # 与模板的DTW平均距离低于该值时唤醒
+WAKE_WORD_NEAR_MISS_THRESHOLD = 0.35  # 险些唤醒的距离上限，用于统计漏检
+WAKE_WORD_COMMAND_WINDOW = 5  # 唤醒后等待指令的最长时间（秒）
+
+# 语音合成配置
+TTS_VOICE = os.getenv('TTS_VOICE', 'zh-CN-XiaoxiaoNeural')
+TTS_OUTPUT_FORMAT = 'Riff16Khz16BitMonoPcm'  # Azure合成输出格式（WAV），在本地播放
+# 流式合成：在标点处把播报分段，后一段在前一段播放时合成，第一段一有音频就开始播放
+TTS_STREAMING = True
+TTS_STREAM_FORMAT = 'Raw16Khz16BitMonoPcm'  # 流式合成输出格式（无文件头的PCM）
+TTS_PIPELINE_DEPTH = 2  # 最多提前合成的分段数
+TTS_CHUNK_MIN_CHARS = 6  # 分段的最短字数，过短的分段与相邻分段合并
+TTS_QUEUE_DEADLINE = 10  # 播报入队后超过该时间（秒）仍未开始播放则丢弃，避免播报过时的结果
+# 合成音频缓存（按文本、发音人、格式的哈希保存），置空则仅在内存中缓存
+TTS_CACHE_DIR = os.getenv('TTS_CACHE_DIR', os.path.join('cache', 'tts'))
+TTS_CACHE_MAX_BYTES = 50 * 1024 * 1024  # 缓存总大小上限，超出时淘汰最久未播放的音频
+# 本地语音合成（未配置Azure时使用的常驻引擎）：auto / espeak / pyttsx3 / say / none
+LOCAL_TTS_ENGINE = os.getenv('LOCAL_TTS_ENGINE', 'auto')
+LOCAL_TTS_VOICE = os.getenv('LOCAL_TTS_VOICE', '')  # espeak 发音人，为空时 espeak-ng 用 cmn，espeak 用 zh
+LOCAL_TTS_RATE = 175  # 语速（每分钟词数）
+LOCAL_TTS_END_SILENCE = 0.2  # espeak 输出停止多久后视为一条播报结束（秒）
+# 启动时在后台预先合成的固定播报
+TTS_PREWARM_PHRASES = [
+    "抱歉，我没有理解您的指令，请重试",
+    "麦克风初始化失败，请检查设备连接",
+    "命令执行成功",
+    "命令执行失败",
+    "屏幕已锁定",
+    "开始播放音乐",
+    "音乐已暂停",
+    "音乐暂停/播放命令已发送",
+    "正在打开文件管理器",
+    "正在打开文件夹",
+]
 
 # 系统配置
 PLATFORM = os.name
@@ -54,3 +120,207 @@ COMMAND_TEMPLATES = {
     'lock_screen': ['锁屏', '锁定电脑', '锁定屏幕'],
     'adjust_brightness': ['调节亮度', '屏幕亮一点', '屏幕暗一点', '亮度调高', '亮度调低']
 }
+
+# 直接匹配语法（由 CommandMatcher 编译为单次扫描的多模式匹配器）
+# 规则按顺序匹配：命中任一 keywords 且所有 modifiers 槽位都能确定取值时生效
+COMMAND_GRAMMAR = [
+    {
+        'command': 'adjust_volume',
+        'keywords': ['音量', '声音'] + COMMAND_TEMPLATES['adjust_volume'],
+        'modifiers': {
+            'action': {
+                'increase': ['大', '高', '增加', '调高'],
+                'decrease': ['小', '低', '减少', '调低'],
+            },
+        },
+        'parameters': {'amount': 10},
+    },
+    {
+        'command': 'adjust_brightness',
+        'keywords': ['亮度', '屏幕亮', '屏幕暗', '调亮', '调暗'] + COMMAND_TEMPLATES['adjust_brightness'],
+        'modifiers': {
+            'action': {
+                'increase': ['亮一点', '亮点', '高', '增加', '调高', '调亮'],
+                'decrease': ['暗', '低', '减少', '调低'],
+            },
+        },
+        'parameters': {'amount': 10},
+    },
+    {'command': 'play_music', 'keywords': COMMAND_TEMPLATES['play_music']},
+    {'command': 'pause_music', 'keywords': COMMAND_TEMPLATES['pause_music']},
+    {'command': 'lock_screen', 'keywords': COMMAND_TEMPLATES['lock_screen']},
+    {'command': 'open_folder', 'keywords': COMMAND_TEMPLATES['open_folder']},
+    # 带 slots 的规则需要由 SlotExtractor 填充参数后才能生效
+    {'command': 'open_folder', 'keywords': ['文件夹', '目录'], 'slots': ['path']},
+    {'command': 'search_file', 'keywords': ['搜索', '查找', '找一下'] + COMMAND_TEMPLATES['search_file'], 'slots': ['filename']},
+    {
+        'command': 'open_app',
+        'keywords': ['打开记事本', '启动记事本'],
+        'parameters': {'app_name': 'notepad'},
+    },
+    {
+        'command': 'open_app',
+        'keywords': ['打开计算器', '启动计算器'],
+        'parameters': {'app_name': 'calculator'},
+    },
+    {
+        'command': 'open_app',
+        'keywords': ['打开文件管理器', '浏览文件'],
+        'parameters': {'app_name': 'file_explorer'},
+    },
+]
+DIRECT_MATCH_CONFIDENCE = 0.9
+
+# LLM解析结果缓存配置
+PARSE_CACHE_SIZE = 512  # 内存中最多缓存的解析结果数
+PARSE_CACHE_TTL = 7 * 24 * 3600  # 缓存有效期（秒）
+PARSE_CACHE_PATH = os.getenv('PARSE_CACHE_PATH', os.path.join('cache', 'parse_cache.db'))  # 置空则仅使用内存缓存
+
+# 本地意图分类配置（字符n-gram TF-IDF + 余弦相似度）
+LOCAL_INTENT_ENABLED = True
+LOCAL_INTENT_THRESHOLD = 0.62  # 最高相似度低于该值时交给LLM
+LOCAL_INTENT_MARGIN = 0.08  # 与次优（不同意图）相似度的最小差距
+LOCAL_INTENT_NGRAM_RANGE = (1, 3)
+# 与命令动作相矛盾的动词：说法中出现时不采用本地分类结果（打开/关闭的说法字符相似，容易混淆）
+INTENT_CONFLICTING_VERBS = {
+    'open_app': ['关闭', '关掉', '关了', '关一下', '退出'],
+    'close_app': ['打开', '启动', '开启', '开一下'],
+    # “放一首歌”与“换一首歌”字符相似，但是播放而不是切歌
+    'next_song': ['放一首', '来一首', '听一首'],
+}
+
+# 本地意图分类样例库
+INTENT_EXAMPLES = [
+    {'text': '把声音调大一些', 'command': 'adjust_volume', 'parameters': {'action': 'increase', 'amount': 10}},
+    {'text': '声音再大一点', 'command': 'adjust_volume', 'parameters': {'action': 'increase', 'amount': 10}},
+    {'text': '大声一点', 'command': 'adjust_volume', 'parameters': {'action': 'increase', 'amount': 10}},
+    {'text': '我听不清楚', 'command': 'adjust_volume', 'parameters': {'action': 'increase', 'amount': 10}},
+    {'text': '把声音调小一些', 'command': 'adjust_volume', 'parameters': {'action': 'decrease', 'amount': 10}},
+    {'text': '声音再小一点', 'command': 'adjust_volume', 'parameters': {'action': 'decrease', 'amount': 10}},
+    {'text': '小声一点', 'command': 'adjust_volume', 'parameters': {'action': 'decrease', 'amount': 10}},
+    {'text': '太吵了', 'command': 'adjust_volume', 'parameters': {'action': 'decrease', 'amount': 10}},
+    {'text': '屏幕太暗了', 'command': 'adjust_brightness', 'parameters': {'action': 'increase', 'amount': 10}},
+    {'text': '把屏幕调亮一些', 'command': 'adjust_brightness', 'parameters': {'action': 'increase', 'amount': 10}},
+    {'text': '屏幕太亮了', 'command': 'adjust_brightness', 'parameters': {'action': 'decrease', 'amount': 10}},
+    {'text': '把屏幕调暗一些', 'command': 'adjust_brightness', 'parameters': {'action': 'decrease', 'amount': 10}},
+    {'text': '来点音乐', 'command': 'play_music', 'parameters': {}},
+    {'text': '我想听歌', 'command': 'play_music', 'parameters': {}},
+    {'text': '放点歌听听', 'command': 'play_music', 'parameters': {}},
+    {'text': '继续播放', 'command': 'play_music', 'parameters': {}},
+    {'text': '放一首歌', 'command': 'play_music', 'parameters': {}},
+    {'text': '来一首歌', 'command': 'play_music', 'parameters': {}},
+    {'text': '别放了', 'command': 'pause_music', 'parameters': {}},
+    {'text': '先停一下音乐', 'command': 'pause_music', 'parameters': {}},
+    {'text': '把歌停了', 'command': 'pause_music', 'parameters': {}},
+    {'text': '关掉音乐', 'command': 'pause_music', 'parameters': {}},
+    {'text': '把音乐关了', 'command': 'pause_music', 'parameters': {}},
+    {'text': '下一首', 'command': 'next_song', 'parameters': {}},
+    {'text': '切歌', 'command': 'next_song', 'parameters': {}},
+    {'text': '换一首歌', 'command': 'next_song', 'parameters': {}},
+    {'text': '上一首', 'command': 'previous_song', 'parameters': {}},
+    {'text': '回到上一首歌', 'command': 'previous_song', 'parameters': {}},
+    {'text': '帮我锁一下电脑', 'command': 'lock_screen', 'parameters': {}},
+    {'text': '把屏幕锁上', 'command': 'lock_screen', 'parameters': {}},
+    {'text': '锁一下屏幕', 'command': 'lock_screen', 'parameters': {}},
+    {'text': '我要离开一下锁住电脑', 'command': 'lock_screen', 'parameters': {}},
+    {'text': '帮我开一下记事本', 'command': 'open_app', 'parameters': {'app_name': 'notepad'}},
+    {'text': '我要记点东西', 'command': 'open_app', 'parameters': {'app_name': 'notepad'}},
+    {'text': '帮我开一下计算器', 'command': 'open_app', 'parameters': {'app_name': 'calculator'}},
+    {'text': '我要算一下数', 'command': 'open_app', 'parameters': {'app_name': 'calculator'}},
+    {'text': '打开浏览器', 'command': 'open_app', 'parameters': {'app_name': 'browser'}},
+    {'text': '我要上网', 'command': 'open_app', 'parameters': {'app_name': 'browser'}},
+    {'text': '打开任务管理器', 'command': 'open_app', 'parameters': {'app_name': 'task_manager'}},
+    {'text': '打开音乐播放器', 'command': 'open_app', 'parameters': {'app_name': 'music_player'}},
+    {'text': '关掉记事本', 'command': 'close_app', 'parameters': {'app_name': 'notepad'}},
+    {'text': '把记事本关了', 'command': 'close_app', 'parameters': {'app_name': 'notepad'}},
+    {'text': '关掉计算器', 'command': 'close_app', 'parameters': {'app_name': 'calculator'}},
+    {'text': '把计算器关了', 'command': 'close_app', 'parameters': {'app_name': 'calculator'}},
+    {'text': '关掉浏览器', 'command': 'close_app', 'parameters': {'app_name': 'browser'}},
+    {'text': '关掉任务管理器', 'command': 'close_app', 'parameters': {'app_name': 'task_manager'}},
+    {'text': '把任务管理器关了', 'command': 'close_app', 'parameters': {'app_name': 'task_manager'}},
+    {'text': '关掉音乐播放器', 'command': 'close_app', 'parameters': {'app_name': 'music_player'}},
+    {'text': '把音乐播放器关了', 'command': 'close_app', 'parameters': {'app_name': 'music_player'}},
+    {'text': '帮我关一下记事本', 'command': 'close_app', 'parameters': {'app_name': 'notepad'}},
+    {'text': '帮我关一下计算器', 'command': 'close_app', 'parameters': {'app_name': 'calculator'}},
+    {'text': '帮我关一下浏览器', 'command': 'close_app', 'parameters': {'app_name': 'browser'}},
+]
+
+# 批量解析配置
+BATCH_MAX_WORKERS = 8  # 并发LLM请求的线程数
+LLM_RATE_LIMIT = 10  # 每秒最多发出的LLM请求数（0表示不限流）
+
+# LLM请求配置（任意OpenAI兼容的聊天补全服务）
+LLM_BASE_URL = os.getenv('LLM_BASE_URL') or None  # 为空时使用OpenAI官方地址
+LLM_MODEL = os.getenv('LLM_MODEL', 'gpt-4')
+LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', 10))  # 单次LLM请求超时时间（秒）
+LLM_CONNECT_TIMEOUT = float(os.getenv('LLM_CONNECT_TIMEOUT', 3))  # 建立连接的超时时间（秒）
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', 2))
+LLM_DEADLINE = 8  # 异步解析的默认截止时间（秒）
+LLM_HEDGE_ENABLED = True  # 请求延迟超过历史分位数时发送一次对冲请求
+LLM_HEDGE_PERCENTILE = 95
+LLM_HEDGE_MIN_SAMPLES = 20  # 延迟样本不足时不发送对冲请求
+
+# LLM流式解析配置
+LLM_STREAMING = True  # 流式读取LLM输出，命令与必需参数确定后立即结束
+COMMAND_REQUIRED_PARAMETERS = {
+    'adjust_volume': ['action', 'amount'],
+    'adjust_brightness': ['action', 'amount'],
+    'open_app': ['app_name'],
+    'close_app': ['app_name'],
+    'open_folder': ['path'],
+    'search_file': ['filename'],
+}
+
+# 自学习规则配置（多次由LLM得到相同结果的说法提升为本地规则）
+LEARNED_RULES_ENABLED = True
+LEARNED_RULES_PATH = os.getenv('LEARNED_RULES_PATH', os.path.join('cache', 'learned_rules.json'))  # 置空则不持久化
+LEARNED_RULE_PROMOTION_THRESHOLD = 3  # 相同结果出现多少次后提升为规则
+LEARNED_RULE_HALF_LIFE = 14 * 24 * 3600  # 规则未被使用时置信度的半衰期（秒）
+LEARNED_RULE_CONFIDENCE = 0.9  # 规则的初始置信度
+LEARNED_RULE_MIN_CONFIDENCE = 0.5  # 置信度衰减到该值以下时淘汰规则
+LEARNED_RULE_MAX_CANDIDATES = 1000  # 最多跟踪的待提升说法数
+
+# 本地参数提取配置
+SLOT_MATCH_CONFIDENCE = 0.85
+KNOWN_FOLDERS = {
+    '下载': '~/Downloads',
+    '桌面': '~/Desktop',
+    '文档': '~/Documents',
+    '图片': '~/Pictures',
+    '照片': '~/Pictures',
+    '音乐': '~/Music',
+    '视频': '~/Videos',
+    '主目录': '~',
+    '用户目录': '~',
+}
+
+# 复合指令拆分（连接词），如“把音量调低然后锁屏”
+# 逗号、句号不作为拆分点，避免“好的，锁屏”之类的说法被拆开
+COMPOUND_SPLIT_PATTERN = re.compile(
+    r'[，,]?\s*(?:(?:然后|接着|随后|之后|并且|同时)再?|[；;])'
+)
+# 单独的“再”（如“打开计算器，再把声音调到五十”）只在拆出的各部分都能独立解析时拆分，
+# 否则“音量再调高一点”会被拆成“音量”和“调高一点”
+COMPOUND_AGAIN_PATTERN = re.compile(r'[，,]?\s*再(?=[把打开关锁播暂调搜查找])')
+
+# 语音识别后端：azure=云端识别，offline=本地离线识别（Vosk，限定指令词表），hybrid=本地置信度足够时直接采用，否则请求云端
+RECOGNIZER_BACKEND = os.getenv('RECOGNIZER_BACKEND', 'azure')  # 另有 socket=本地识别服务（STREAMING_SERVER_ADDRESS）
+# 识别请求的上传编码：wav（未压缩）/ flac（无损，约为一半大小）/ opus（低码率，需要ffmpeg）
+# Azure短音频接口只接受 wav 与 opus
+UPLOAD_ENCODING = os.getenv('UPLOAD_ENCODING', 'wav')
+OPUS_BITRATE = 16000  # Opus编码码率（bps）
+
+# 批量转写配置（tools/transcribe_batch.py）
+BATCH_TRANSCRIBE_WORKERS = 4  # 并发识别请求的线程数
+BATCH_TRANSCRIBE_RATE_LIMIT = 5  # 每秒最多发出的识别请求数（0表示不限流）
+BATCH_CHUNK_MAX_SECONDS = 15  # 单个识别片段的最长时长（秒）
+BATCH_MIN_SILENCE_SECONDS = 0.4  # 作为切分点的最短静音（秒）
+BATCH_CHUNK_OVERLAP_SECONDS = 0.2  # 片段前后扩展的重叠时长（秒）
+BATCH_SILENCE_THRESHOLD = 300  # 静音判定的能量阈值（与energy_threshold同一量纲）
+OFFLINE_MODEL_PATH = os.getenv('OFFLINE_MODEL_PATH', os.path.join('models', 'vosk-model-small-cn-0.22'))
+HYBRID_CONFIDENCE_THRESHOLD = 0.8  # 本地识别置信度达到该值时不再请求云端
+# 离线识别的限定词表：常用指令说法，词表越小识别越快越准
+OFFLINE_GRAMMAR_PHRASES = sorted(
+    set(phrase for phrases in COMMAND_TEMPLATES.values() for phrase in phrases)
+    | set(example['text'] for example in INTENT_EXAMPLES)
+)
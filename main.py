@@ -4,6 +4,7 @@
 import sys
 import time
 import signal
+import threading
 import logging
 from modules.voice_input import VoiceInputModule
 from modules.command_parser import CommandParser
@@ -21,21 +22,30 @@ logger = setup_logger(
 class VoiceControlAssistant:
     """语音控制助手主类"""
     
-    def __init__(self):
-        self.voice_input = VoiceInputModule()
-        self.command_parser = CommandParser()
-        self.system_executor = SystemExecutor()
-        self.voice_feedback = VoiceFeedback()
+    def __init__(self, audio_source=None, recognizer_backend=None, command_parser=None, system_executor=None,
+                 voice_feedback=None):
+        """
+        各组件未指定时使用默认实现；传入 audio_source（如 VirtualMicrophone）与模拟的识别、执行组件，
+        即可在没有声卡的环境中回放录制的会话
+        """
+        self.voice_input = VoiceInputModule(recognizer_backend=recognizer_backend, audio_source=audio_source)
+        self.command_parser = command_parser or CommandParser()
+        self.system_executor = system_executor or SystemExecutor()
+        self.voice_feedback = voice_feedback or VoiceFeedback()
         self.is_running = False
         
-        # 注册信号处理器
-        signal.signal(signal.SIGINT, self._signal_handler)
-        signal.signal(signal.SIGTERM, self._signal_handler)
+        # 注册信号处理器（只能在主线程中注册）
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGINT, self._signal_handler)
+            signal.signal(signal.SIGTERM, self._signal_handler)
         
         logger.info(f"{APP_NAME} v{APP_VERSION} 初始化完成")
     
-    def start(self):
-        """启动语音控制助手"""
+    def start(self, block=True):
+        """
+        启动语音控制助手
+        block 为 False 时开始监听后立即返回（无界面回放时由调用方决定何时 stop）
+        """
         try:
             logger.info("正在启动语音控制助手...")
             
@@ -49,7 +59,7 @@ class VoiceControlAssistant:
             self.voice_feedback.speak_welcome()
             
             # 开始监听语音输入
-            if not self.voice_input.start_listening(self._handle_voice_input):
+            if not self.voice_input.start_listening(self._handle_voice_input, self._handle_interim_voice_input):
                 logger.error("语音监听启动失败")
                 return False
             
@@ -57,7 +67,8 @@ class VoiceControlAssistant:
             logger.info("语音控制助手已启动，等待语音指令...")
             
             # 主循环
-            self._main_loop()
+            if block:
+                self._main_loop()
             
             return True
             
@@ -78,6 +89,9 @@ class VoiceControlAssistant:
             # 清空语音队列
             self.voice_feedback.clear_queue()
             
+            # 保存自学习规则等解析器状态
+            self.command_parser.flush()
+            
             # 播报告别信息
             self.voice_feedback.speak_goodbye()
             
@@ -102,6 +116,10 @@ class VoiceControlAssistant:
         finally:
             self.stop()
     
+    def _handle_interim_voice_input(self, voice_text):
+        """处理流式识别的中间结果"""
+        logger.info(f"识别中：{voice_text}")
+    
     def _handle_voice_input(self, voice_text, error_message=None):
         """处理语音输入"""
         try:
@@ -116,32 +134,50 @@ class VoiceControlAssistant:
             
             logger.info(f"收到语音指令：{voice_text}")
             
-            # 解析语音指令
-            command_data = self.command_parser.parse_voice_command(voice_text)
+            # 解析语音指令（可能包含多个按顺序执行的操作）
+            plan = self.command_parser.parse_voice_command_plan(voice_text)
             
-            if not command_data.get("command"):
+            if not any(command_data.get("command") for command_data in plan):
                 logger.warning(f"无法解析指令：{voice_text}")
                 self.voice_feedback.speak("抱歉，我没有理解您的指令，请重试")
                 return
             
-            # 验证命令
-            is_valid, message = self.command_parser.validate_command(command_data)
-            if not is_valid:
-                logger.warning(f"命令验证失败：{message}")
-                self.voice_feedback.speak(f"命令无效：{message}")
+            if len(plan) == 1:
+                command_data = plan[0]
+                
+                # 验证命令
+                is_valid, message = self.command_parser.validate_command(command_data)
+                if not is_valid:
+                    logger.warning(f"命令验证失败：{message}")
+                    self.voice_feedback.speak(f"命令无效：{message}")
+                    return
+                
+                # 执行命令
+                logger.info(f"执行命令：{command_data}")
+                result = self.system_executor.execute_command(command_data)
+                
+                # 播报执行结果
+                self.voice_feedback.speak_command_result(result)
                 return
             
-            # 执行命令
-            logger.info(f"执行命令：{command_data}")
-            result = self.system_executor.execute_command(command_data)
-            
-            # 播报执行结果
-            self.voice_feedback.speak_command_result(result)
+            # 按顺序执行计划，统一播报汇总结果
+            results = [self._execute_planned_command(command_data) for command_data in plan]
+            self.voice_feedback.speak_command_results(results)
             
         except Exception as e:
             logger.error(f"处理语音输入失败：{e}")
             self.voice_feedback.speak_error(f"处理指令失败：{str(e)}")
     
+    def _execute_planned_command(self, command_data):
+        """执行计划中的单条命令，无效命令返回失败结果"""
+        is_valid, message = self.command_parser.validate_command(command_data)
+        if not is_valid:
+            logger.warning(f"命令验证失败：{command_data.get('error') or message}")
+            return {"success": False, "message": "有一条指令没有理解"}
+        
+        logger.info(f"执行命令：{command_data}")
+        return self.system_executor.execute_command(command_data)
+    
     def _signal_handler(self, signum, frame):
         """信号处理器"""
         logger.info(f"收到信号 {signum}，正在关闭应用...")
@@ -152,8 +188,9 @@ class VoiceControlAssistant:
         """获取应用状态"""
         return {
             "is_running": self.is_running,
-            "voice_input_status": self.voice_input.is_listening,
+            "voice_input_status": self.voice_input.get_status(),
             "voice_feedback_status": self.voice_feedback.get_status(),
+            "command_parser_status": self.command_parser.get_status(),
             "available_commands": self.command_parser.get_available_commands()
         }
 
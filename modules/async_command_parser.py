@@ -0,0 +1,191 @@
+"""
+异步指令解析模块
+基于异步OpenAI客户端，支持单次调用截止时间与尾延迟对冲请求
+"""
+import time
+import asyncio
+import logging
+from collections import deque
+from config.settings import (
+    LLM_DEADLINE, LLM_HEDGE_ENABLED, LLM_HEDGE_PERCENTILE, LLM_HEDGE_MIN_SAMPLES,
+    BATCH_MAX_WORKERS, LLM_RATE_LIMIT
+)
+from modules.command_parser import CommandParser
+from utils.rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+class AsyncCommandParser(CommandParser):
+    """
+    在CommandParser的同步接口之外提供 *_async 异步接口
+    （同步接口仍可使用，继承的方法不会得到未等待的协程）
+    """
+    def __init__(self, deadline=LLM_DEADLINE, hedge_enabled=LLM_HEDGE_ENABLED,
+                 hedge_percentile=LLM_HEDGE_PERCENTILE, hedge_min_samples=LLM_HEDGE_MIN_SAMPLES, llm_backend=None,
+                 **kwargs):
+        super().__init__(llm_backend, **kwargs)
+        # 超时与重试由截止时间和对冲请求控制，客户端不再自行重试
+        self.async_llm_client = self.llm_backend.create_async_client(max_retries=0)
+        self.deadline = deadline
+        self.hedge_enabled = hedge_enabled
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self._latencies = deque(maxlen=200)
+        self.hedged_requests = 0
+        self.hedge_wins = 0
+        self.deadline_timeouts = 0
+
+    async def parse_voice_command_async(self, voice_text, deadline=None):
+        """
+        异步解析语音指令
+        deadline: 本次调用的截止时间（秒），默认使用LLM_DEADLINE
+        返回格式与CommandParser.parse_voice_command一致
+        """
+        if not voice_text:
+            return {"command": None, "parameters": {}, "confidence": 0, "error": "无语音输入"}
+
+        logger.info(f"开始异步解析指令：{voice_text}")
+
+        local_result = self._parse_locally(voice_text)
+        if local_result:
+            return local_result
+
+        if self.async_llm_client:
+            return await self._parse_with_llm_async(voice_text, deadline or self.deadline)
+        else:
+            return {"command": None, "parameters": {}, "confidence": 0, "error": "LLM服务未配置"}
+
+    async def parse_voice_command_plan_async(self, voice_text, deadline=None):
+        """
+        异步解析可能包含多个操作的语音指令
+        返回格式与CommandParser.parse_voice_command_plan一致
+        """
+        segments = self._split_compound(voice_text) if voice_text else []
+        if len(segments) <= 1:
+            return [await self.parse_voice_command_async(voice_text, deadline)]
+
+        logger.info(f"开始异步解析复合指令：{segments}")
+        plan = [self._parse_locally(segment) for segment in segments]
+        if all(plan):
+            return plan
+
+        if self.async_llm_client:
+            deadline = deadline or self.deadline
+            try:
+                response = await asyncio.wait_for(
+                    self.async_llm_client.chat.completions.create(**self._plan_request_options(voice_text)),
+                    timeout=deadline
+                )
+                return self._parse_plan_response(response.choices[0].message.content)
+            except asyncio.TimeoutError:
+                self.deadline_timeouts += 1
+                return [self._llm_error(f"请求超过截止时间（{deadline}秒）")]
+            except Exception as e:
+                return [self._llm_error(e)]
+
+        return [
+            result or {"command": None, "parameters": {}, "confidence": 0, "error": f"无法理解的指令：{segment}"}
+            for segment, result in zip(segments, plan)
+        ]
+
+    async def parse_voice_commands_async(self, texts, max_concurrency=None, rate_limit=None, deadline=None):
+        """
+        异步批量解析语音指令，每条LLM请求单独适用截止时间
+        返回格式与CommandParser.parse_voice_commands一致
+        """
+        texts = list(texts)
+        semaphore = asyncio.Semaphore(max_concurrency or BATCH_MAX_WORKERS)
+        rate_limiter = RateLimiter(LLM_RATE_LIMIT if rate_limit is None else rate_limit)
+        unique, keys, results, pending = self._prepare_batch(texts, self.async_llm_client is not None)
+        loop = asyncio.get_running_loop()
+
+        async def parse_remote(key):
+            async with semaphore:
+                start = time.perf_counter()
+                await loop.run_in_executor(None, rate_limiter.acquire)
+                result = await self._parse_with_llm_async(unique[key], deadline or self.deadline)
+                results[key] = (result, time.perf_counter() - start)
+
+        if pending:
+            logger.info(f"异步批量解析：{len(unique)} 条去重指令，{len(pending)} 条需要LLM解析")
+            await asyncio.gather(*(parse_remote(key) for key in pending))
+
+        return self._batch_results(texts, keys, results)
+
+    async def _parse_with_llm_async(self, voice_text, deadline):
+        """在截止时间内使用LLM解析指令（先查询解析缓存）"""
+        cached = self.parse_cache.get(voice_text)
+        if cached:
+            logger.info(f"解析缓存命中：{voice_text}")
+            self._record_tier("cache")
+            self._learn(voice_text, cached)
+            return cached
+
+        self._record_tier("llm")
+        try:
+            result = await asyncio.wait_for(self._hedged_request(voice_text), timeout=deadline)
+        except asyncio.TimeoutError:
+            self.deadline_timeouts += 1
+            return self._llm_error(f"请求超过截止时间（{deadline}秒）")
+        except Exception as e:
+            return self._llm_error(e)
+
+        self.parse_cache.put(voice_text, result)
+        self._learn(voice_text, result)
+        return result
+
+    async def _hedged_request(self, voice_text):
+        """发送LLM请求，超过延迟分位数仍未返回时再发送一次对冲请求，取先返回者"""
+        primary = asyncio.ensure_future(self._request_llm_async(voice_text))
+        tasks = {primary}
+        try:
+            hedge_delay = self._hedge_delay()
+            if hedge_delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+                if not done:
+                    logger.info(f"LLM请求超过{hedge_delay:.2f}秒未返回，发送对冲请求")
+                    self.hedged_requests += 1
+                    tasks.add(asyncio.ensure_future(self._request_llm_async(voice_text)))
+
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # 取消尚未完成的请求（包括截止时间到达时）
+            for task in tasks:
+                task.cancel()
+
+    async def _request_llm_async(self, voice_text):
+        """异步请求LLM，失败时抛出异常"""
+        start = time.perf_counter()
+        response = await self.async_llm_client.chat.completions.create(
+            **self._llm_request_options(voice_text)
+        )
+        self._latencies.append(time.perf_counter() - start)
+        return self._parse_llm_response(response.choices[0].message.content, voice_text)
+
+    def _hedge_delay(self):
+        """根据历史延迟计算对冲等待时间，样本不足时返回None"""
+        if not self.hedge_enabled or len(self._latencies) < self.hedge_min_samples:
+            return None
+        latencies = sorted(self._latencies)
+        index = min(len(latencies) - 1, int(len(latencies) * self.hedge_percentile / 100))
+        return latencies[index]
+
+    def get_status(self):
+        """获取解析器状态"""
+        status = super().get_status()
+        status.update({
+            "hedge_delay": self._hedge_delay(),
+            "hedged_requests": self.hedged_requests,
+            "hedge_wins": self.hedge_wins,
+            "deadline_timeouts": self.deadline_timeouts
+        })
+        return status
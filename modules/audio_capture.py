@@ -0,0 +1,162 @@
+"""
+音频采集模块
+从麦克风读取音频写入预分配的环形缓冲区，按能量阈值切分语句。
+每块音频以memoryview交给逐块消费者，不产生额外拷贝；语句开始前保留一段预录音，避免首字被截断
+"""
+import math
+import logging
+import threading
+import speech_recognition as sr
+from utils.audio_utils import pcm_rms, adapt_energy_threshold
+from utils.ring_buffer import ChunkRingBuffer
+
+logger = logging.getLogger(__name__)
+
+
+class AudioCapture:
+    def __init__(self, source, recognizer, pre_roll_ms=300, buffer_seconds=15, phrase_time_limit=10,
+                 on_threshold_update=None):
+        """
+        Args:
+            source: 音频源（sr.Microphone 或兼容的 sr.AudioSource）
+            recognizer: 提供 energy_threshold / pause_threshold / phrase_threshold 及动态阈值参数的 sr.Recognizer
+            pre_roll_ms: 语句起点之前保留的音频时长（毫秒）
+            buffer_seconds: 环形缓冲区可保存的音频时长（秒），需大于预录音与最长语句之和
+            phrase_time_limit: 单条语句的最长时长（秒）
+            on_threshold_update(threshold): 空闲时动态能量阈值更新后的回调（采集线程中调用）
+        """
+        self.source = source
+        self.recognizer = recognizer
+        self.pre_roll_ms = pre_roll_ms
+        self.buffer_seconds = buffer_seconds
+        self.phrase_time_limit = phrase_time_limit
+        self.on_threshold_update = on_threshold_update
+        self.ring = None
+        self.is_running = False
+        self._thread = None
+        self._on_segment = None
+        self._on_chunk = None
+        self._lock = threading.Lock()
+
+        self.chunks_captured = 0
+        self.segments = 0
+        self.short_segments_dropped = 0
+        self.bytes_copied = 0
+
+    def start(self, on_segment, on_chunk=None):
+        """
+        在后台线程中开始采集
+        on_segment(audio): 切分出的一条语句（sr.AudioData）
+        on_chunk(view): 每块原始音频的只读memoryview，只在回调期间有效，需要保留时自行复制
+        """
+        if self.is_running:
+            return
+        self._on_segment = on_segment
+        self._on_chunk = on_chunk
+        self.is_running = True
+        self._thread = threading.Thread(target=self._run, name="audio-capture", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2):
+        """停止采集"""
+        self.is_running = False
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def _run(self):
+        try:
+            with self.source as source:
+                self._capture(source)
+        except Exception as e:
+            logger.error(f"音频采集异常：{e}")
+        finally:
+            self.is_running = False
+
+    def _capture(self, source):
+        """采集循环：写入环形缓冲区并做语句端点检测"""
+        recognizer = self.recognizer
+        chunk_bytes = source.CHUNK * source.SAMPLE_WIDTH
+        seconds_per_chunk = source.CHUNK / source.SAMPLE_RATE
+        # 缓冲区与预录音均按整块计算，槽位在启动时一次性分配
+        if self.ring is None or self.ring.slot_size != chunk_bytes:
+            self.ring = ChunkRingBuffer(math.ceil(self.buffer_seconds / seconds_per_chunk), chunk_bytes)
+        ring = self.ring
+        pre_roll_chunks = int(math.ceil(self.pre_roll_ms / 1000 / seconds_per_chunk))
+        pause_chunks = int(math.ceil(recognizer.pause_threshold / seconds_per_chunk))
+        phrase_chunks = int(math.ceil(recognizer.phrase_threshold / seconds_per_chunk))
+        limit_chunks = int(math.ceil(self.phrase_time_limit / seconds_per_chunk)) if self.phrase_time_limit else None
+        if ring.slots < pre_roll_chunks + (limit_chunks or pause_chunks) + 1:
+            logger.warning("音频缓冲区小于预录音与最长语句之和，长语句开头可能被覆盖")
+
+        segment_start = None  # 当前语句起点（含预录音）的块序号
+        onset = None  # 检测到语音的块序号
+        speech_chunks = 0
+        silence_chunks = 0
+        last_end = ring.next_seq  # 上一语句的结束位置，预录音不与其重叠
+
+        while self.is_running:
+            data = source.stream.read(source.CHUNK)
+            if not data:
+                break
+            seq = ring.write(data)
+            view = ring.chunk(seq)
+            with self._lock:
+                self.chunks_captured += 1
+            if self._on_chunk:
+                self._on_chunk(view)
+
+            energy = pcm_rms(view, source.SAMPLE_WIDTH)
+            if segment_start is None:
+                if energy > recognizer.energy_threshold:
+                    onset = seq
+                    segment_start = max(seq - pre_roll_chunks, ring.oldest_seq, last_end)
+                    speech_chunks, silence_chunks = 1, 0
+                elif recognizer.dynamic_energy_threshold:
+                    # 空闲时在实时音频上持续校准：阈值向环境噪声能量收敛
+                    threshold = adapt_energy_threshold(recognizer, energy, seconds_per_chunk)
+                    if self.on_threshold_update:
+                        self.on_threshold_update(threshold)
+                continue
+
+            if energy > recognizer.energy_threshold:
+                speech_chunks += 1
+                silence_chunks = 0
+            else:
+                silence_chunks += 1
+
+            end = seq + 1
+            # 语句时长从检测到语音时算起，不含预录音
+            too_long = limit_chunks is not None and end - onset >= limit_chunks
+            if silence_chunks > pause_chunks or too_long:
+                self._emit(source, segment_start, end, speech_chunks >= phrase_chunks)
+                segment_start = None
+                last_end = end
+
+    def _emit(self, source, start, end, long_enough):
+        """把 [start, end) 块复制为一条语句交给回调（每条语句只复制一次）"""
+        if not long_enough:
+            with self._lock:
+                self.short_segments_dropped += 1
+            return
+        start = max(start, self.ring.oldest_seq)
+        data = self.ring.read(start, end)
+        with self._lock:
+            self.segments += 1
+            self.bytes_copied += len(data)
+        if self._on_segment:
+            self._on_segment(sr.AudioData(data, source.SAMPLE_RATE, source.SAMPLE_WIDTH))
+
+    def get_status(self):
+        """获取采集统计"""
+        with self._lock:
+            return {
+                "is_running": self.is_running,
+                "buffer_bytes": self.ring.nbytes if self.ring else 0,
+                "pre_roll_ms": self.pre_roll_ms,
+                "chunks_captured": self.chunks_captured,
+                "segments": self.segments,
+                "short_segments_dropped": self.short_segments_dropped,
+                "bytes_copied": self.bytes_copied,
+                "energy_threshold": round(self.recognizer.energy_threshold, 1)
+            }
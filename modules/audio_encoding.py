@@ -0,0 +1,127 @@
+"""
+音频上传编码模块
+识别请求上传前将PCM压缩为FLAC（无损）或Opus（低码率），减少上行带宽占用，并统计编码耗时与上传字节数
+"""
+import io
+import time
+import wave
+import shutil
+import logging
+import threading
+import subprocess
+import speech_recognition as sr
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_ENCODINGS = ('wav', 'flac', 'opus')
+CONTENT_TYPES = {
+    'wav': 'audio/wav; codecs=audio/pcm; samplerate={sample_rate}',
+    'flac': 'audio/flac',
+    'opus': 'audio/ogg; codecs=opus',
+}
+
+
+def _ffmpeg():
+    return shutil.which('ffmpeg')
+
+
+def decode_audio(data, encoding, sample_rate=16000):
+    """将上传的音频解码为16位单声道PCM（供本地识别服务使用）"""
+    if encoding == 'pcm':
+        return data
+    if encoding == 'wav':
+        with wave.open(io.BytesIO(data), 'rb') as wav:
+            return wav.readframes(wav.getnframes())
+    if encoding == 'flac':
+        command = [sr.get_flac_converter(), '--stdout', '--totally-silent', '--decode',
+                   '--force-raw-format', '--endian=little', '--sign=signed', '-']
+    elif encoding == 'opus':
+        if not _ffmpeg():
+            raise RuntimeError("解码Opus需要ffmpeg")
+        command = [_ffmpeg(), '-loglevel', 'error', '-i', 'pipe:0',
+                   '-f', 's16le', '-ac', '1', '-ar', str(sample_rate), 'pipe:1']
+    else:
+        raise ValueError(f"不支持的音频编码：{encoding}")
+
+    process = subprocess.run(command, input=data, capture_output=True, timeout=30)
+    if process.returncode != 0:
+        raise RuntimeError(f"{encoding}解码失败：{process.stderr.decode('utf-8', 'ignore').strip()}")
+    return process.stdout
+
+
+class AudioEncoder:
+    def __init__(self, encoding='wav', sample_rate=16000, opus_bitrate=16000):
+        if encoding not in UPLOAD_ENCODINGS:
+            raise ValueError(f"不支持的上传编码：{encoding}")
+        if encoding == 'opus' and not _ffmpeg():
+            logger.warning("未找到ffmpeg，无法使用Opus编码，改用FLAC")
+            encoding = 'flac'
+        self.encoding = encoding
+        self.sample_rate = sample_rate
+        self.opus_bitrate = opus_bitrate
+        self._lock = threading.Lock()
+
+        self.encodes = 0
+        self.uploads = 0
+        self.raw_bytes = 0
+        self.bytes_sent = 0
+        self.encode_time = 0.0
+
+    @property
+    def content_type(self):
+        """HTTP上传时使用的Content-Type"""
+        return CONTENT_TYPES[self.encoding].format(sample_rate=self.sample_rate)
+
+    def encode(self, audio):
+        """将AudioData编码为上传格式（在识别工作线程中调用，不占用录音线程）"""
+        start = time.perf_counter()
+        raw = audio.get_raw_data(convert_rate=self.sample_rate, convert_width=2)
+        if self.encoding == 'wav':
+            data = audio.get_wav_data(convert_rate=self.sample_rate, convert_width=2)
+        elif self.encoding == 'flac':
+            data = audio.get_flac_data(convert_rate=self.sample_rate, convert_width=2)
+        else:
+            data = self._encode_opus(raw)
+        elapsed = time.perf_counter() - start
+
+        # 原始与上传字节数在上传成功后由 record_sent 记录，失败的上传不计入压缩比
+        with self._lock:
+            self.encodes += 1
+            self.encode_time += elapsed
+        return data
+
+    def raw_size(self, audio):
+        """音频转换为上传采样率的16位PCM后的字节数（与 encode 的输入一致）"""
+        frames = len(audio.frame_data) // audio.sample_width
+        return frames * self.sample_rate // audio.sample_rate * 2
+
+    def _encode_opus(self, raw):
+        """使用ffmpeg将PCM编码为Ogg/Opus"""
+        process = subprocess.run(
+            [_ffmpeg(), '-loglevel', 'error', '-f', 's16le', '-ar', str(self.sample_rate), '-ac', '1',
+             '-i', 'pipe:0', '-c:a', 'libopus', '-b:a', str(self.opus_bitrate), '-application', 'voip',
+             '-f', 'ogg', 'pipe:1'],
+            input=raw, capture_output=True, timeout=30
+        )
+        if process.returncode != 0:
+            raise sr.RequestError(f"Opus编码失败：{process.stderr.decode('utf-8', 'ignore').strip()}")
+        return process.stdout
+
+    def record_sent(self, size, raw_size):
+        """记录一次成功上传的字节数及其对应的原始PCM字节数"""
+        with self._lock:
+            self.uploads += 1
+            self.bytes_sent += size
+            self.raw_bytes += raw_size
+
+    def get_status(self):
+        """获取编码统计"""
+        with self._lock:
+            return {
+                "encoding": self.encoding,
+                "uploads": self.uploads,
+                "raw_bytes": self.raw_bytes,
+                "bytes_sent": self.bytes_sent,
+                "compression_ratio": round(self.bytes_sent / self.raw_bytes, 3) if self.raw_bytes else None,
+                "avg_encode_ms": round(self.encode_time / self.encodes * 1000, 2) if self.encodes else None
+            }
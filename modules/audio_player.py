@@ -0,0 +1,121 @@
+"""
+音频播放模块
+通过PyAudio在本地播放合成的WAV音频或边合成边到达的PCM数据段，输出流按音频格式复用，播放可随时中断
+"""
+import wave
+import logging
+import threading
+from utils.audio_utils import wav_to_pcm
+
+logger = logging.getLogger(__name__)
+
+
+class AudioPlayer:
+    def __init__(self, chunk_ms=50):
+        """
+        Args:
+            chunk_ms: 每次写入输出流的音频时长（毫秒），决定中断播放的响应时间
+        """
+        self.chunk_ms = chunk_ms
+        self._pyaudio = None
+        self._stream = None
+        self._stream_format = None  # (采样宽度, 声道数, 采样率)
+        self._lock = threading.Lock()
+        self._generation = 0  # stop() 时递增，正在播放的音频据此中断
+        self.available = True
+        self.played = 0
+        self.interrupted = 0
+
+    def _open_stream(self, sample_width, channels, rate):
+        """打开（或复用）与音频格式一致的输出流（调用方持有锁）"""
+        audio_format = (sample_width, channels, rate)
+        if self._stream is not None and self._stream_format == audio_format:
+            return self._stream
+        if self._pyaudio is None:
+            import pyaudio
+            self._pyaudio = pyaudio.PyAudio()
+        if self._stream is not None:
+            self._stream.close()
+        self._stream = self._pyaudio.open(
+            format=self._pyaudio.get_format_from_width(sample_width),
+            channels=channels,
+            rate=rate,
+            output=True
+        )
+        self._stream_format = audio_format
+        return self._stream
+
+    def play(self, wav_data, stop_event=None, on_start=None):
+        """
+        播放WAV音频（阻塞至播放结束，或被 stop() / stop_event 中断）
+        on_start: 第一段音频写入输出流前调用
+        返回是否完整播放；PyAudio不可用时返回False，由调用方改用其他反馈方式
+        """
+        if not self.available:
+            return False
+        try:
+            frames, (sample_width, channels, rate) = wav_to_pcm(wav_data)
+        except (wave.Error, EOFError) as e:
+            logger.error(f"音频数据无效：{e}")
+            return False
+        return self.play_pcm([frames], sample_width, channels, rate, stop_event, on_start)
+
+    def play_pcm(self, pieces, sample_width, channels, rate, stop_event=None, on_start=None):
+        """
+        依次播放PCM数据段（pieces 可以是边合成边产出的生成器，每段到达后立即写入输出流）
+        参数与返回值同 play()
+        """
+        if not self.available:
+            return False
+        generation = self._generation
+        chunk_bytes = max(1, rate * self.chunk_ms // 1000) * sample_width * channels
+        started = False
+        try:
+            for pcm in pieces:
+                for offset in range(0, len(pcm), chunk_bytes):
+                    with self._lock:
+                        if generation != self._generation or (stop_event is not None and stop_event.is_set()):
+                            self.interrupted += 1
+                            return False
+                        stream = self._open_stream(sample_width, channels, rate)
+                        if not started:
+                            started = True
+                            if on_start:
+                                on_start()
+                        stream.write(pcm[offset:offset + chunk_bytes])
+        except ImportError:
+            logger.warning("PyAudio未安装，无法在本地播放合成的语音")
+            self.available = False
+            return False
+        except Exception as e:
+            logger.error(f"音频播放失败：{e}")
+            self.close()
+            return False
+        self.played += 1
+        return True
+
+    def stop(self):
+        """中断正在播放的音频"""
+        self._generation += 1
+
+    def close(self):
+        """关闭输出流"""
+        with self._lock:
+            if self._stream is not None:
+                try:
+                    self._stream.close()
+                except Exception:
+                    pass
+                self._stream = None
+                self._stream_format = None
+            if self._pyaudio is not None:
+                self._pyaudio.terminate()
+                self._pyaudio = None
+
+    def get_status(self):
+        """获取播放统计"""
+        return {
+            "available": self.available,
+            "played": self.played,
+            "interrupted": self.interrupted
+        }
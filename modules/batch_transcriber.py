@@ -0,0 +1,163 @@
+"""
+批量转写模块
+将录音文件或目录在静音处切分为片段，通过线程池并发识别（限流），结果逐条以JSON Lines输出，支持断点续转
+"""
+import os
+import json
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import speech_recognition as sr
+from config.settings import (
+    BATCH_TRANSCRIBE_WORKERS, BATCH_TRANSCRIBE_RATE_LIMIT, BATCH_CHUNK_MAX_SECONDS, BATCH_MIN_SILENCE_SECONDS,
+    BATCH_CHUNK_OVERLAP_SECONDS, BATCH_SILENCE_THRESHOLD
+)
+from modules.recognizer_backend import create_recognizer_backend
+from utils.audio_utils import split_at_silence
+from utils.rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+AUDIO_EXTENSIONS = ('.wav', '.flac', '.aiff', '.aif')
+
+
+def collect_audio_files(paths):
+    """展开文件与目录（递归），返回排序后的音频文件路径列表"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in names if name.lower().endswith(AUDIO_EXTENSIONS))
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            logger.warning(f"音频文件不存在：{path}")
+    return sorted(os.path.normpath(path) for path in files)
+
+
+def load_completed(output_path):
+    """读取已有的转写结果，返回已完成（无错误）片段的 (文件, 片段序号) 集合"""
+    completed = set()
+    if not output_path or not os.path.exists(output_path):
+        return completed
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # 上次中断时写了一半的行
+            if record.get("error") is None and "file" in record:
+                completed.add((record["file"], record["chunk"]))
+    return completed
+
+
+class BatchTranscriber:
+    def __init__(self, recognizer_backend=None, max_workers=BATCH_TRANSCRIBE_WORKERS,
+                 rate_limit=BATCH_TRANSCRIBE_RATE_LIMIT, max_chunk_s=BATCH_CHUNK_MAX_SECONDS,
+                 min_silence_s=BATCH_MIN_SILENCE_SECONDS, overlap_s=BATCH_CHUNK_OVERLAP_SECONDS,
+                 silence_threshold=BATCH_SILENCE_THRESHOLD):
+        self.recognizer_backend = recognizer_backend or create_recognizer_backend()
+        self.max_workers = max(1, max_workers)
+        self.rate_limiter = RateLimiter(rate_limit)
+        self.max_chunk_s = max_chunk_s
+        self.min_silence_s = min_silence_s
+        self.overlap_s = overlap_s
+        self.silence_threshold = silence_threshold
+        self.recognizer = sr.Recognizer()
+        self.skipped = 0
+
+    def split_file(self, path):
+        """读取音频文件并在静音处切分，返回 [(片段序号, 起始秒, 结束秒, AudioData), ...]"""
+        with sr.AudioFile(path) as source:
+            audio = self.recognizer.record(source)
+        pcm = audio.get_raw_data(convert_width=2)
+        rate = audio.sample_rate
+        chunks = split_at_silence(pcm, rate, self.max_chunk_s, self.min_silence_s, self.overlap_s,
+                                  self.silence_threshold)
+        return [
+            (index, start / rate, end / rate, sr.AudioData(pcm[start * 2:end * 2], rate, 2))
+            for index, (start, end) in enumerate(chunks)
+        ]
+
+    def _transcribe_chunk(self, path, index, start, end, audio):
+        """工作线程：识别一个片段，返回结果记录"""
+        self.rate_limiter.acquire()
+        began = time.perf_counter()
+        record = {"file": path, "chunk": index, "start": round(start, 3), "end": round(end, 3),
+                  "text": "", "confidence": None, "backend": None, "error": None}
+        try:
+            result = self.recognizer_backend.recognize(audio)
+            record.update(text=result.text, confidence=result.confidence, backend=result.backend)
+        except sr.UnknownValueError:
+            pass  # 片段中没有可识别的语音，视为已完成
+        except Exception as e:
+            record["error"] = str(e) or type(e).__name__
+        record["elapsed"] = round(time.perf_counter() - began, 3)
+        return record
+
+    def iter_transcriptions(self, paths, completed=()):
+        """
+        逐个文件切分并并发识别，按完成顺序产出结果记录
+        completed 中的 (文件, 片段序号) 跳过不识别；同时在途的片段数不超过线程数的2倍，长录音不会全部读入队列
+        """
+        completed = set(completed)
+        self.skipped = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="transcribe") as executor:
+            pending = set()
+            for path in collect_audio_files(paths):
+                try:
+                    chunks = self.split_file(path)
+                except (ValueError, OSError, EOFError) as e:
+                    yield {"file": path, "chunk": None, "error": f"读取音频失败：{e}"}
+                    continue
+                for index, start, end, audio in chunks:
+                    if (path, index) in completed:
+                        self.skipped += 1
+                        continue
+                    while len(pending) >= self.max_workers * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            yield future.result()
+                    pending.add(executor.submit(self._transcribe_chunk, path, index, start, end, audio))
+            for future in wait(pending).done:
+                yield future.result()
+
+    def transcribe(self, paths, output_path, resume=True, on_record=None):
+        """
+        转写文件或目录，结果逐条追加写入 output_path（JSON Lines）
+        resume 为 True 时跳过输出文件中已成功完成的片段，只重做未完成或出错的片段
+        返回汇总统计
+        """
+        completed = load_completed(output_path) if resume else set()
+        # 上次中断时最后一行可能不完整，续写前另起一行
+        partial_line = False
+        if resume and os.path.exists(output_path) and os.path.getsize(output_path):
+            with open(output_path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                partial_line = f.read(1) != b'\n'
+        summary = {"files": len(collect_audio_files(paths)), "chunks": 0, "skipped": 0, "transcribed": 0,
+                   "empty": 0, "failed": 0, "audio_seconds": 0.0}
+        began = time.perf_counter()
+
+        with open(output_path, 'a' if resume else 'w', encoding='utf-8') as f:
+            if partial_line:
+                f.write('\n')
+            for record in self.iter_transcriptions(paths, completed):
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                f.flush()
+                if on_record:
+                    on_record(record)
+
+                if record["chunk"] is None or record["error"]:
+                    summary["failed"] += 1
+                    continue
+                summary["chunks"] += 1
+                summary["audio_seconds"] += record["end"] - record["start"]
+                summary["transcribed" if record["text"] else "empty"] += 1
+
+        summary["skipped"] = self.skipped
+        summary["audio_seconds"] = round(summary["audio_seconds"], 2)
+        summary["elapsed_s"] = round(time.perf_counter() - began, 2)
+        summary["recognizer_backend"] = self.recognizer_backend.get_status()
+        logger.info(f"批量转写完成：{summary['chunks']} 个片段，跳过 {summary['skipped']} 个，失败 {summary['failed']} 个")
+        return summary
@@ -0,0 +1,153 @@
+"""
+命令匹配模块
+将声明式命令语法编译为 Aho-Corasick 自动机，单次扫描即可找出所有关键词与修饰词
+"""
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class KeywordAutomaton:
+    """Aho-Corasick 多模式匹配自动机"""
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        self._compiled = False
+
+    def add(self, keyword, payload):
+        """添加关键词及其附带数据（同一关键词可挂多个数据）"""
+        if not keyword:
+            return
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append((keyword, payload))
+        self._compiled = False
+
+    def compile(self):
+        """构建失败指针（BFS），并合并后缀状态的输出"""
+        queue = deque()
+        for state in self._goto[0].values():
+            self._fail[state] = 0
+            queue.append(state)
+
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+        self._compiled = True
+
+    def search(self, text):
+        """
+        扫描文本一次，返回所有命中
+        返回格式：[(结束位置, 关键词, 附带数据), ...]
+        """
+        if not self._compiled:
+            self.compile()
+
+        hits = []
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for keyword, payload in self._output[state]:
+                hits.append((index, keyword, payload))
+        return hits
+
+
+class CommandMatcher:
+    """基于命令语法的直接匹配器"""
+
+    def __init__(self, grammar, confidence=0.9):
+        self.grammar = list(grammar)
+        self.confidence = confidence
+        self.automaton = KeywordAutomaton()
+        self._compile()
+
+    def _compile(self):
+        """将语法规则编译进自动机"""
+        for rule_index, rule in enumerate(self.grammar):
+            for keyword in rule.get('keywords', []):
+                self.automaton.add(keyword.lower(), ('keyword', rule_index, None, None))
+            for slot, values in rule.get('modifiers', {}).items():
+                for value, keywords in values.items():
+                    for keyword in keywords:
+                        self.automaton.add(keyword.lower(), ('modifier', rule_index, slot, value))
+        self.automaton.compile()
+        logger.debug(f"命令语法编译完成：{len(self.grammar)} 条规则")
+
+    def _scan(self, text):
+        """单次扫描，按规则归集命中的关键词与修饰词"""
+        triggered = set()
+        modifiers = {}
+        for _, keyword, (kind, rule_index, slot, value) in self.automaton.search(text):
+            if kind == 'keyword':
+                triggered.add(rule_index)
+                continue
+            # 同一槽位取最长的修饰词，长度相同时取语法中先声明的取值
+            rule_slots = modifiers.setdefault(rule_index, {})
+            current = rule_slots.get(slot)
+            order = self._value_order(rule_index, slot, value)
+            if current is None or (len(keyword), -order) > (len(current[1]), -current[2]):
+                rule_slots[slot] = (value, keyword, order)
+        return triggered, modifiers
+
+    def _value_order(self, rule_index, slot, value):
+        """修饰词取值在语法中的声明顺序"""
+        return list(self.grammar[rule_index]['modifiers'][slot]).index(value)
+
+    def match(self, voice_text):
+        """
+        匹配语音文本
+        返回格式：{"command": "命令类型", "parameters": {...}, "confidence": 0.9}，未匹配返回None
+        """
+        if not voice_text:
+            return None
+
+        text = voice_text.lower().strip()
+        triggered, modifiers = self._scan(text)
+
+        for rule_index in sorted(triggered):
+            rule = self.grammar[rule_index]
+            if rule.get('slots'):
+                # 需要额外参数提取的规则不能直接生效
+                continue
+            resolved = modifiers.get(rule_index, {})
+            required = rule.get('modifiers', {})
+            if any(slot not in resolved for slot in required):
+                continue
+
+            parameters = dict(rule.get('parameters', {}))
+            parameters.update({slot: resolved[slot][0] for slot in required})
+            return {
+                "command": rule['command'],
+                "parameters": parameters,
+                "confidence": self.confidence
+            }
+
+        return None
+
+    def triggered_rules(self, voice_text):
+        """返回命中了关键词的全部规则（按语法顺序，不要求修饰词完整）"""
+        if not voice_text:
+            return []
+
+        triggered, _ = self._scan(voice_text.lower().strip())
+        return [self.grammar[rule_index] for rule_index in sorted(triggered)]
@@ -2,118 +2,340 @@
 指令解析模块
 负责将语音指令解析为可执行的命令
 """
-import re
 import json
+import time
 import logging
-from openai import OpenAI
-from config.settings import COMMAND_TEMPLATES
-from config.api_keys import OPENAI_API_KEY
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from config.settings import (
+    COMMAND_GRAMMAR, DIRECT_MATCH_CONFIDENCE,
+    PARSE_CACHE_SIZE, PARSE_CACHE_TTL, PARSE_CACHE_PATH,
+    LOCAL_INTENT_ENABLED, LOCAL_INTENT_THRESHOLD, LOCAL_INTENT_MARGIN,
+    LOCAL_INTENT_NGRAM_RANGE, INTENT_EXAMPLES, INTENT_CONFLICTING_VERBS,
+    BATCH_MAX_WORKERS, LLM_RATE_LIMIT,
+    LLM_STREAMING, COMMAND_REQUIRED_PARAMETERS,
+    LEARNED_RULES_ENABLED, LEARNED_RULES_PATH, LEARNED_RULE_PROMOTION_THRESHOLD,
+    LEARNED_RULE_HALF_LIFE, LEARNED_RULE_CONFIDENCE, LEARNED_RULE_MIN_CONFIDENCE,
+    LEARNED_RULE_MAX_CANDIDATES, SLOT_MATCH_CONFIDENCE, KNOWN_FOLDERS,
+    COMPOUND_SPLIT_PATTERN, COMPOUND_AGAIN_PATTERN
+)
+from modules.command_matcher import CommandMatcher
+from modules.parse_cache import ParseCache
+from modules.intent_classifier import IntentClassifier
+from modules.llm_backend import LLMBackend
+from modules.learned_rules import LearnedRuleStore
+from modules.slot_extractor import SlotExtractor
+from utils.partial_json import PartialJSONParser
+from utils.rate_limiter import RateLimiter
+from utils.text_utils import normalize_utterance
 
 logger = logging.getLogger(__name__)
 
 class CommandParser:
-    def __init__(self):
-        self.llm_client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
-        self.command_patterns = self._build_command_patterns()
-        
-    def _build_command_patterns(self):
-        """构建命令模式匹配字典"""
-        patterns = {}
-        for command_type, templates in COMMAND_TEMPLATES.items():
-            patterns[command_type] = '|'.join(templates)
-        return patterns
+    def __init__(self, llm_backend=None, parse_cache_path=PARSE_CACHE_PATH, learned_rules_path=LEARNED_RULES_PATH):
+        """
+        Args:
+            parse_cache_path: 解析缓存数据库路径，为空时只缓存在内存中
+            learned_rules_path: 学习规则文件路径，为空时不持久化
+        """
+        # LLM服务地址与模型可配置，便于切换到自建服务或本地模拟服务
+        self.llm_backend = llm_backend or LLMBackend()
+        self.llm_client = self.llm_backend.create_client()
+        self.command_matcher = CommandMatcher(COMMAND_GRAMMAR, confidence=DIRECT_MATCH_CONFIDENCE)
+        self.slot_extractor = SlotExtractor(KNOWN_FOLDERS)
+        self.tier_counts = Counter()  # 各解析层级（direct/slot/local/cache/llm）处理的指令数
+        self._tier_lock = threading.Lock()
+        self.parse_cache = ParseCache(
+            max_size=PARSE_CACHE_SIZE,
+            ttl=PARSE_CACHE_TTL,
+            db_path=parse_cache_path or None
+        )
+        self.intent_classifier = IntentClassifier(
+            INTENT_EXAMPLES,
+            threshold=LOCAL_INTENT_THRESHOLD,
+            margin=LOCAL_INTENT_MARGIN,
+            ngram_range=LOCAL_INTENT_NGRAM_RANGE,
+            conflicting_verbs=INTENT_CONFLICTING_VERBS
+        ) if LOCAL_INTENT_ENABLED else None
+        self.learned_rules = LearnedRuleStore(
+            path=learned_rules_path or None,
+            promotion_threshold=LEARNED_RULE_PROMOTION_THRESHOLD,
+            half_life=LEARNED_RULE_HALF_LIFE,
+            confidence=LEARNED_RULE_CONFIDENCE,
+            min_confidence=LEARNED_RULE_MIN_CONFIDENCE,
+            max_candidates=LEARNED_RULE_MAX_CANDIDATES
+        ) if LEARNED_RULES_ENABLED else None
     
     def parse_voice_command(self, voice_text):
         """
         解析语音指令
         返回格式：{"command": "命令类型", "parameters": {"参数": "值"}, "confidence": 0.9}
         """
+        return self._parse_single(voice_text)
+    
+    def _parse_single(self, voice_text):
+        """解析单条指令（供同步接口内部调用，子类覆盖 parse_voice_command 不影响其他接口）"""
         if not voice_text:
             return {"command": None, "parameters": {}, "confidence": 0, "error": "无语音输入"}
         
         logger.info(f"开始解析指令：{voice_text}")
         
-        # 首先尝试模式匹配
-        direct_match = self._try_direct_match(voice_text)
-        if direct_match:
-            return direct_match
+        # 首先尝试本地解析（模式匹配、本地意图分类）
+        local_result = self._parse_locally(voice_text)
+        if local_result:
+            return local_result
         
-        # 如果模式匹配失败，使用LLM解析
+        # 如果本地解析失败，使用LLM解析
         if self.llm_client:
             return self._parse_with_llm(voice_text)
         else:
             return {"command": None, "parameters": {}, "confidence": 0, "error": "LLM服务未配置"}
     
-    def _try_direct_match(self, voice_text):
-        """尝试直接模式匹配"""
-        voice_text = voice_text.lower().strip()
-        
-        # 音量调节
-        if re.search(r'音量|声音', voice_text):
-            if re.search(r'大|高|增加|调高', voice_text):
-                return {
-                    "command": "adjust_volume",
-                    "parameters": {"action": "increase", "amount": 10},
-                    "confidence": 0.9
-                }
-            elif re.search(r'小|低|减少|调低', voice_text):
-                return {
-                    "command": "adjust_volume",
-                    "parameters": {"action": "decrease", "amount": 10},
-                    "confidence": 0.9
-                }
+    def parse_voice_command_plan(self, voice_text):
+        """
+        解析可能包含多个操作的语音指令（如“把音量调低然后锁屏”）
+        优先按连接词在本地拆分解析，本地无法全部解析时使用一次LLM请求
+        返回格式：[{"command": "命令类型", "parameters": {...}, "confidence": 0.9}, ...]，按执行顺序排列
+        """
+        if not voice_text:
+            return [self._parse_single(voice_text)]
         
-        # 音乐控制
-        if re.search(r'播放音乐|放首歌|听音乐', voice_text):
-            return {
-                "command": "play_music",
-                "parameters": {},
-                "confidence": 0.9
-            }
-        elif re.search(r'暂停音乐|停止播放|暂停播放', voice_text):
-            return {
-                "command": "pause_music",
-                "parameters": {},
-                "confidence": 0.9
-            }
+        segments = self._split_compound(voice_text)
+        if len(segments) <= 1:
+            return [self._parse_single(voice_text)]
         
-        # 系统控制
-        if re.search(r'锁屏|锁定电脑|锁定屏幕', voice_text):
-            return {
-                "command": "lock_screen",
-                "parameters": {},
-                "confidence": 0.9
-            }
+        logger.info(f"开始解析复合指令：{segments}")
+        plan = [self._parse_locally(segment) for segment in segments]
+        if all(plan):
+            return plan
         
-        # 应用启动
-        if re.search(r'打开记事本|启动记事本', voice_text):
-            return {
-                "command": "open_app",
-                "parameters": {"app_name": "notepad"},
-                "confidence": 0.9
-            }
-        elif re.search(r'打开计算器|启动计算器', voice_text):
-            return {
-                "command": "open_app",
-                "parameters": {"app_name": "calculator"},
-                "confidence": 0.9
-            }
-        elif re.search(r'打开文件管理器|打开文件夹|浏览文件', voice_text):
-            return {
-                "command": "open_app",
-                "parameters": {"app_name": "file_explorer"},
-                "confidence": 0.9
-            }
+        if self.llm_client:
+            return self._parse_plan_with_llm(voice_text)
         
-        return None
+        return [
+            result or {"command": None, "parameters": {}, "confidence": 0, "error": f"无法理解的指令：{segment}"}
+            for segment, result in zip(segments, plan)
+        ]
     
-    def _parse_with_llm(self, voice_text):
-        """使用LLM解析复杂指令"""
+    def _split_compound(self, voice_text):
+        """
+        按连接词和标点拆分复合指令
+        单独的“再”只在拆出的各部分都能在本地解析时拆分，“音量再调高一点”之类的单条指令保持完整
+        """
+        segments = []
+        for segment in COMPOUND_SPLIT_PATTERN.split(voice_text):
+            segment = segment.strip()
+            if not segment:
+                continue
+            parts = [part.strip() for part in COMPOUND_AGAIN_PATTERN.split(segment) if part.strip()]
+            if len(parts) > 1 and all(self._match_locally(part)[0] for part in parts):
+                segments.extend(parts)
+            else:
+                segments.append(segment)
+        return segments
+    
+    def _parse_plan_with_llm(self, voice_text):
+        """使用一次LLM请求解析多命令执行计划"""
         try:
-            prompt = f"""
-            请解析以下语音指令并返回可执行的命令：
-            指令：{voice_text}
+            response = self.llm_client.chat.completions.create(
+                timeout=self.llm_backend.request_timeout(),
+                **self._plan_request_options(voice_text)
+            )
+            return self._parse_plan_response(response.choices[0].message.content)
+        except Exception as e:
+            return [self._llm_error(e)]
+    
+    def _plan_request_options(self, voice_text):
+        """构建执行计划的LLM请求参数"""
+        options = self._llm_request_options(voice_text)
+        options["messages"] = [{"role": "user", "content": self._build_plan_prompt(voice_text)}]
+        return options
+    
+    def _parse_plan_response(self, result_text):
+        """解析LLM返回的执行计划文本"""
+        result_text = result_text.strip()
+        logger.info(f"LLM执行计划：{result_text}")
+        
+        start, end = result_text.find("{"), result_text.rfind("}")
+        data = json.loads(result_text[start:end + 1]) if start != -1 else None
+        if isinstance(data, dict) and isinstance(data.get("commands"), list):
+            plan = [item for item in data["commands"] if isinstance(item, dict)]
+        elif isinstance(data, dict) and "command" in data:
+            plan = [data]
+        else:
+            plan = []
+        
+        for item in plan:
+            if not isinstance(item.get("parameters"), dict):
+                item["parameters"] = {}
+        return plan or [{"command": None, "parameters": {}, "confidence": 0, "error": "无法理解的指令"}]
+    
+    def parse_voice_commands(self, texts, max_workers=None, rate_limit=None):
+        """
+        批量解析语音指令（用于离线回放转写日志）
+        相同的指令只解析一次，本地可解析的直接处理，其余并发请求LLM
+        返回格式：[{"text": "原始文本", "result": {...}, "elapsed": 秒}, ...]，与输入顺序一致
+        """
+        texts = list(texts)
+        max_workers = max_workers or BATCH_MAX_WORKERS
+        rate_limiter = RateLimiter(LLM_RATE_LIMIT if rate_limit is None else rate_limit)
+        unique, keys, results, pending = self._prepare_batch(texts, self.llm_client is not None)
+        
+        def parse_remote(key):
+            start = time.perf_counter()
+            result = self._parse_with_llm(unique[key], rate_limiter=rate_limiter)
+            return key, result, time.perf_counter() - start
+        
+        if pending:
+            logger.info(f"批量解析：{len(unique)} 条去重指令，{len(pending)} 条需要LLM解析")
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for key, result, elapsed in executor.map(parse_remote, pending):
+                    results[key] = (result, elapsed)
+        
+        return self._batch_results(texts, keys, results)
+    
+    def _prepare_batch(self, texts, llm_enabled):
+        """
+        按归一化文本去重并在本地解析批量指令
+        返回 (去重后的指令, 每条输入对应的键, 已解析的结果 {键: (结果, 耗时)}, 需要LLM解析的键)
+        """
+        unique = {}
+        keys = []
+        for text in texts:
+            key = normalize_utterance(text) or text
+            keys.append(key)
+            unique.setdefault(key, text)
+        
+        results = {}
+        pending = []
+        for key, text in unique.items():
+            start = time.perf_counter()
+            if not text:
+                result = {"command": None, "parameters": {}, "confidence": 0, "error": "无语音输入"}
+            else:
+                result = self._parse_locally(text)
+            if result is None and llm_enabled:
+                pending.append(key)
+                continue
+            if result is None:
+                result = {"command": None, "parameters": {}, "confidence": 0, "error": "LLM服务未配置"}
+            results[key] = (result, time.perf_counter() - start)
+        return unique, keys, results, pending
+    
+    def _batch_results(self, texts, keys, results):
+        """按输入顺序展开批量解析结果"""
+        return [
+            {"text": text, "result": dict(results[key][0]), "elapsed": results[key][1]}
+            for text, key in zip(texts, keys)
+        ]
+    
+    def _parse_locally(self, voice_text):
+        """本地解析指令（模式匹配、参数提取、本地意图分类），失败返回None"""
+        result, tier = self._match_locally(voice_text)
+        if result:
+            self._record_tier(tier)
+        return result
+    
+    def _match_locally(self, voice_text):
+        """本地解析指令但不记录解析层级，返回 (结果, 层级)，失败返回 (None, None)"""
+        direct_match = self._try_direct_match(voice_text)
+        if direct_match:
+            return self._fill_slots(direct_match, voice_text), "direct"
+        
+        slot_match = self._try_slot_match(voice_text)
+        if slot_match:
+            return slot_match, "slot"
+        
+        local_match = self._try_local_classify(voice_text)
+        if local_match:
+            return self._fill_slots(local_match, voice_text), "local"
+        return None, None
+    
+    def _record_tier(self, tier):
+        """记录指令由哪一解析层级处理"""
+        with self._tier_lock:
+            self.tier_counts[tier] += 1
+    
+    def _try_direct_match(self, voice_text):
+        """尝试直接模式匹配（优先使用自学习规则，其次单次扫描命令语法自动机）"""
+        if self.learned_rules:
+            learned_match = self.learned_rules.match(voice_text)
+            if learned_match:
+                return learned_match
+        
+        return self.command_matcher.match(voice_text)
+    
+    def _fill_slots(self, result, voice_text):
+        """用本地提取的参数补全匹配结果（如音量的具体数值）"""
+        parameters = self.slot_extractor.extract(result["command"], voice_text)
+        if parameters:
+            result = dict(result)
+            result["parameters"] = dict(result.get("parameters", {}), **parameters)
+        return result
+    
+    def _try_slot_match(self, voice_text):
+        """对命中关键词但参数不完整的规则进行本地参数提取"""
+        for rule in self.command_matcher.triggered_rules(voice_text):
+            command = rule['command']
+            if not self.slot_extractor.supports(command):
+                continue
+            
+            extracted = self.slot_extractor.extract(command, voice_text)
+            if not extracted:
+                continue
             
+            parameters = dict(rule.get('parameters', {}), **extracted)
+            required = list(rule.get('slots', [])) + list(rule.get('modifiers', {}))
+            if all(name in parameters for name in required):
+                return {
+                    "command": command,
+                    "parameters": parameters,
+                    "confidence": SLOT_MATCH_CONFIDENCE
+                }
+        return None
+    
+    def _try_local_classify(self, voice_text):
+        """尝试本地意图分类（置信度不足时返回None）"""
+        if not self.intent_classifier:
+            return None
+        return self.intent_classifier.classify(voice_text)
+    
+    def _parse_with_llm(self, voice_text, rate_limiter=None):
+        """使用LLM解析复杂指令（先查询解析缓存）"""
+        cached = self.parse_cache.get(voice_text)
+        if cached:
+            logger.info(f"解析缓存命中：{voice_text}")
+            self._record_tier("cache")
+            self._learn(voice_text, cached)
+            return cached
+        
+        if rate_limiter:
+            rate_limiter.acquire()
+        self._record_tier("llm")
+        result = self._request_llm(voice_text)
+        self.parse_cache.put(voice_text, result)
+        self._learn(voice_text, result)
+        return result
+    
+    def _learn(self, voice_text, result):
+        """
+        记录LLM解析结果的一次使用，用于自学习规则
+        缓存保证同一说法只请求一次LLM，之后的重复说法由缓存返回，同样计入使用次数
+        """
+        if self.learned_rules:
+            self.learned_rules.observe(voice_text, result)
+    
+    def revoke_learned_rule(self, voice_text):
+        """撤销错误的自学习规则，同时清除对应的解析缓存"""
+        self.parse_cache.delete(voice_text)
+        if not self.learned_rules:
+            return False
+        return self.learned_rules.revoke(voice_text)
+    
+    def _command_catalog(self):
+        """LLM提示词中的可用命令说明"""
+        return """
             可用命令类型：
             1. 媒体控制：
                - play_music: 播放音乐
@@ -122,8 +344,8 @@ class CommandParser:
                - previous_song: 上一首歌
             
             2. 系统控制：
-               - adjust_volume: 调节音量 (参数: action: "increase/decrease", amount: 数值)
-               - adjust_brightness: 调节亮度 (参数: action: "increase/decrease", amount: 数值)
+               - adjust_volume: 调节音量 (参数: action: "increase/decrease/set", amount: 数值)
+               - adjust_brightness: 调节亮度 (参数: action: "increase/decrease/set", amount: 数值)
                - lock_screen: 锁定屏幕
             
             3. 应用操作：
@@ -133,37 +355,142 @@ class CommandParser:
             4. 文件操作：
                - open_folder: 打开文件夹 (参数: path: "路径")
                - search_file: 搜索文件 (参数: filename: "文件名")
-            
+            """
+    
+    def _build_llm_prompt(self, voice_text):
+        """构建LLM解析提示词"""
+        return f"""
+            请解析以下语音指令并返回可执行的命令：
+            指令：{voice_text}
+            {self._command_catalog()}
             请返回JSON格式：{{"command": "命令类型", "parameters": {{"参数": "值"}}, "confidence": 0.9}}
             如果无法理解指令，请返回：{{"command": null, "parameters": {{}}, "confidence": 0, "error": "无法理解的指令"}}
             """
-            
+    
+    def _build_plan_prompt(self, voice_text):
+        """构建多命令执行计划的LLM提示词"""
+        return f"""
+            以下语音指令可能包含多个按顺序执行的操作，请拆分并返回执行计划：
+            指令：{voice_text}
+            {self._command_catalog()}
+            请返回JSON格式：{{"commands": [{{"command": "命令类型", "parameters": {{"参数": "值"}}, "confidence": 0.9}}]}}
+            commands 按执行顺序排列；无法理解的部分请返回：{{"command": null, "parameters": {{}}, "confidence": 0, "error": "无法理解的指令"}}
+            """
+    
+    def _llm_request_options(self, voice_text):
+        """构建LLM请求参数"""
+        return {
+            "model": self.llm_backend.model,
+            "messages": [{"role": "user", "content": self._build_llm_prompt(voice_text)}],
+            "temperature": 0.1,
+            "max_tokens": 500
+        }
+    
+    def _parse_llm_response(self, result_text, voice_text):
+        """解析LLM返回的文本"""
+        result_text = result_text.strip()
+        logger.info(f"LLM解析结果：{result_text}")
+        
+        # 尝试解析JSON响应
+        try:
+            return json.loads(result_text)
+        except json.JSONDecodeError:
+            # 如果JSON解析失败，尝试提取命令信息
+            return self._extract_command_from_text(result_text, voice_text)
+    
+    def _llm_error(self, error):
+        """构建LLM解析失败的返回结果"""
+        logger.error(f"LLM解析失败：{error}")
+        return {
+            "command": None,
+            "parameters": {},
+            "confidence": 0,
+            "error": f"LLM解析失败：{str(error)}"
+        }
+    
+    def _request_llm(self, voice_text):
+        """请求LLM解析指令"""
+        if LLM_STREAMING:
+            return self._request_llm_stream(voice_text)
+        
+        try:
             response = self.llm_client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.1,
-                max_tokens=500
+                timeout=self.llm_backend.request_timeout(),
+                **self._llm_request_options(voice_text)
             )
-            
-            result_text = response.choices[0].message.content.strip()
-            logger.info(f"LLM解析结果：{result_text}")
-            
-            # 尝试解析JSON响应
+            return self._parse_llm_response(response.choices[0].message.content, voice_text)
+        except Exception as e:
+            return self._llm_error(e)
+    
+    def _request_llm_stream(self, voice_text):
+        """流式请求LLM，命令与必需参数确定后立即关闭连接"""
+        try:
+            stream = self.llm_client.chat.completions.create(
+                stream=True,
+                timeout=self.llm_backend.request_timeout(),
+                **self._llm_request_options(voice_text)
+            )
+            json_parser = PartialJSONParser()
+            received = []
             try:
-                result = json.loads(result_text)
-                return result
-            except json.JSONDecodeError:
-                # 如果JSON解析失败，尝试提取命令信息
-                return self._extract_command_from_text(result_text, voice_text)
-                
+                for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content or ""
+                    received.append(delta)
+                    json_parser.feed(delta)
+                    if self._is_stream_decided(json_parser):
+                        logger.info(f"LLM流式解析提前结束：{''.join(received)}")
+                        return self._finish_stream_result(json_parser.snapshot)
+            finally:
+                self._close_stream(stream)
+            
+            # 流结束仍未得到完整结果时，按普通文本处理
+            return self._parse_llm_response(''.join(received), voice_text)
         except Exception as e:
-            logger.error(f"LLM解析失败：{e}")
-            return {
-                "command": None,
-                "parameters": {},
-                "confidence": 0,
-                "error": f"LLM解析失败：{str(e)}"
-            }
+            return self._llm_error(e)
+    
+    def _is_stream_decided(self, json_parser):
+        """判断流式输出是否已确定命令及其全部必需参数"""
+        snapshot = json_parser.snapshot
+        if not snapshot or "command" not in snapshot:
+            return False
+        if json_parser.complete or snapshot["command"] is None:
+            return True
+        
+        # 顶层字段都已完整时，参数对象必然已完整
+        if json_parser.snapshot_depth <= 1 and "parameters" in snapshot:
+            return True
+        
+        parameters = snapshot.get("parameters")
+        if not isinstance(parameters, dict):
+            parameters = {}
+        required = COMMAND_REQUIRED_PARAMETERS.get(snapshot["command"], [])
+        return all(name in parameters for name in required)
+    
+    def _finish_stream_result(self, snapshot):
+        """补全提前结束时尚未输出的字段"""
+        result = dict(snapshot)
+        if not isinstance(result.get("parameters"), dict):
+            result["parameters"] = {}
+        if result["command"] is None:
+            result.setdefault("confidence", 0)
+            result.setdefault("error", "无法理解的指令")
+        else:
+            # 置信度通常在参数之后输出，提前结束时使用略低的默认值
+            result.setdefault("confidence", 0.8)
+        return result
+    
+    def _close_stream(self, stream):
+        """关闭LLM流式响应，停止接收后续内容"""
+        try:
+            close = getattr(stream, "close", None)
+            if close:
+                close()
+            elif hasattr(stream, "response"):
+                stream.response.close()
+        except Exception as e:
+            logger.debug(f"关闭LLM流失败：{e}")
     
     def _extract_command_from_text(self, llm_text, original_text):
         """从LLM文本响应中提取命令信息"""
@@ -207,3 +534,20 @@ class CommandParser:
             return False, "命令类型不能为空"
         
         return True, "命令验证通过"
+    
+    def flush(self):
+        """保存尚未写入磁盘的解析器状态"""
+        self.parse_cache.flush()
+        if self.learned_rules:
+            self.learned_rules.flush()
+    
+    def get_status(self):
+        """获取解析器状态"""
+        return {
+            "llm_enabled": self.llm_client is not None,
+            "llm_backend": self.llm_backend.get_status(),
+            "local_intent_enabled": bool(self.intent_classifier and self.intent_classifier.enabled),
+            "parse_cache": self.parse_cache.get_status(),
+            "learned_rules": self.learned_rules.get_status() if self.learned_rules else None,
+            "tiers": dict(self.tier_counts)
+        }
@@ -0,0 +1,141 @@
+"""
+本地意图分类模块
+使用字符n-gram TF-IDF向量与样例库做余弦相似度匹配，在本地解析近似说法
+"""
+import json
+import math
+import logging
+from collections import Counter
+from utils.text_utils import normalize_utterance
+
+logger = logging.getLogger(__name__)
+
+class IntentClassifier:
+    def __init__(self, examples, threshold=0.6, margin=0.05, ngram_range=(1, 3), conflicting_verbs=None):
+        """
+        Args:
+            conflicting_verbs: {命令类型: [与该命令相矛盾的动词]}，说法中出现这些动词时不采用该命令
+                （如“关闭任务管理器”与“打开任务管理器”字符相似度很高，但动作相反）
+        """
+        self.threshold = threshold
+        self.margin = margin
+        self.ngram_range = ngram_range
+        self.conflicting_verbs = conflicting_verbs or {}
+        self.enabled = False
+        self.examples = []
+        self.vocabulary = {}
+
+        try:
+            import numpy as np
+            self._np = np
+        except ImportError:
+            logger.warning("NumPy未安装，本地意图分类已禁用")
+            return
+
+        self._fit(examples)
+
+    def _ngrams(self, text):
+        """提取字符n-gram"""
+        low, high = self.ngram_range
+        grams = []
+        for size in range(low, high + 1):
+            grams.extend(text[i:i + size] for i in range(len(text) - size + 1))
+        return grams
+
+    def _fit(self, examples):
+        """根据样例库构建TF-IDF矩阵"""
+        np = self._np
+        texts = []
+        for example in examples:
+            text = normalize_utterance(example.get('text'))
+            if text and example.get('command'):
+                texts.append(text)
+                self.examples.append(example)
+
+        if not self.examples:
+            logger.warning("意图样例库为空，本地意图分类已禁用")
+            return
+
+        document_frequency = Counter()
+        example_grams = [Counter(self._ngrams(text)) for text in texts]
+        for grams in example_grams:
+            document_frequency.update(grams.keys())
+
+        self.vocabulary = {gram: index for index, gram in enumerate(sorted(document_frequency))}
+        total = len(self.examples)
+        self.idf = np.array([
+            math.log((1 + total) / (1 + document_frequency[gram])) + 1
+            for gram in sorted(document_frequency)
+        ])
+
+        self.matrix = np.zeros((total, len(self.vocabulary)))
+        for row, grams in enumerate(example_grams):
+            for gram, count in grams.items():
+                self.matrix[row, self.vocabulary[gram]] = count
+        self.matrix *= self.idf
+        self.matrix /= np.linalg.norm(self.matrix, axis=1, keepdims=True)
+
+        # 意图标签：命令类型 + 参数，相同标签的样例不参与差距比较
+        labels = [
+            json.dumps([example['command'], example.get('parameters', {})], sort_keys=True)
+            for example in self.examples
+        ]
+        label_index = {label: index for index, label in enumerate(dict.fromkeys(labels))}
+        self.labels = np.array([label_index[label] for label in labels])
+
+        self.enabled = True
+        logger.info(f"本地意图分类器已加载：{total} 条样例，{len(self.vocabulary)} 个特征")
+
+    def _vectorize(self, text):
+        """将文本转换为归一化的TF-IDF向量，无已知特征时返回None"""
+        np = self._np
+        vector = np.zeros(len(self.vocabulary))
+        for gram, count in Counter(self._ngrams(text)).items():
+            index = self.vocabulary.get(gram)
+            if index is not None:
+                vector[index] = count
+        vector *= self.idf
+        norm = np.linalg.norm(vector)
+        if not norm:
+            return None
+        return vector / norm
+
+    def classify(self, voice_text):
+        """
+        分类语音文本
+        返回格式：{"command": "命令类型", "parameters": {...}, "confidence": 相似度}，置信度不足返回None
+        """
+        if not self.enabled:
+            return None
+
+        text = normalize_utterance(voice_text)
+        if not text:
+            return None
+
+        vector = self._vectorize(text)
+        if vector is None:
+            return None
+
+        scores = self.matrix @ vector
+        best = int(scores.argmax())
+        best_score = float(scores[best])
+        if best_score < self.threshold:
+            return None
+
+        others = scores[self.labels != self.labels[best]]
+        runner_up = float(others.max()) if others.size else 0.0
+        if best_score - runner_up < self.margin:
+            logger.debug(f"本地意图分类结果不明确：{best_score:.2f} / {runner_up:.2f}")
+            return None
+
+        example = self.examples[best]
+        conflicts = [verb for verb in self.conflicting_verbs.get(example['command'], []) if verb in text]
+        if conflicts:
+            logger.debug(f"本地意图分类结果与动词“{conflicts[0]}”矛盾：{example['command']}")
+            return None
+
+        return {
+            "command": example['command'],
+            "parameters": dict(example.get('parameters', {})),
+            "confidence": round(best_score, 2)
+        }
@@ -0,0 +1,187 @@
+"""
+自学习规则模块
+将多次由LLM解析出相同结果的说法提升为本地规则，供直接匹配优先使用
+"""
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from utils.text_utils import normalize_utterance
+
+logger = logging.getLogger(__name__)
+
+class LearnedRuleStore:
+    def __init__(self, path=None, promotion_threshold=3, half_life=14 * 24 * 3600,
+                 confidence=0.9, min_confidence=0.5, max_candidates=1000, save_interval=60):
+        self.path = path
+        self.promotion_threshold = promotion_threshold
+        self.half_life = half_life
+        self.confidence = confidence
+        self.min_confidence = min_confidence
+        self.max_candidates = max_candidates
+        self.save_interval = save_interval
+
+        self.rules = {}  # key -> {"result", "confidence", "last_hit", "learned_at", "hits"}
+        self.candidates = OrderedDict()  # key -> {"signature", "result", "count"}
+        self.revoked_keys = set()
+        self._lock = threading.Lock()
+        self._last_save = 0
+        self._dirty = False
+
+        self.learned = 0
+        self.hits = 0
+        self.evictions = 0
+        self.revoked = 0
+
+        if path:
+            self._load()
+
+    def _load(self):
+        """从磁盘加载规则"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.rules = data.get('rules', {})
+            self.revoked_keys = set(data.get('revoked', []))
+            self.candidates = OrderedDict(data.get('candidates', []))
+            logger.info(f"已加载自学习规则：{len(self.rules)} 条")
+        except Exception as e:
+            logger.error(f"加载自学习规则失败：{e}")
+
+    def _save(self, force=True):
+        """保存规则到磁盘（非强制保存时按间隔合并写入）"""
+        if not self.path:
+            return
+        self._dirty = True
+        now = time.time()
+        if not force and now - self._last_save < self.save_interval:
+            return
+        try:
+            rule_dir = os.path.dirname(self.path)
+            if rule_dir and not os.path.exists(rule_dir):
+                os.makedirs(rule_dir)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'rules': self.rules,
+                    'revoked': sorted(self.revoked_keys),
+                    # 待提升的说法按使用顺序保存，重启后继续计数
+                    'candidates': list(self.candidates.items())
+                }, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.path)
+            self._last_save = now
+            self._dirty = False
+        except Exception as e:
+            logger.error(f"保存自学习规则失败：{e}")
+
+    def _decayed_confidence(self, rule, now):
+        """按未使用时长计算衰减后的置信度"""
+        idle = max(0, now - rule['last_hit'])
+        return rule['confidence'] * 0.5 ** (idle / self.half_life)
+
+    def match(self, voice_text):
+        """查询自学习规则，未命中或规则已衰减淘汰时返回None"""
+        key = normalize_utterance(voice_text)
+        if not key:
+            return None
+
+        with self._lock:
+            rule = self.rules.get(key)
+            if rule is None:
+                return None
+
+            now = time.time()
+            confidence = self._decayed_confidence(rule, now)
+            if confidence < self.min_confidence:
+                del self.rules[key]
+                self.evictions += 1
+                logger.info(f"自学习规则已衰减淘汰：{key}")
+                self._save()
+                return None
+
+            # 命中后置信度恢复为初始值，重新开始衰减
+            rule['last_hit'] = now
+            rule['hits'] = rule.get('hits', 0) + 1
+            self.hits += 1
+            self._save(force=False)
+
+            result = json.loads(json.dumps(rule['result']))
+            result['confidence'] = round(confidence, 2)
+            return result
+
+    def observe(self, voice_text, result):
+        """记录一次LLM解析结果的使用，同一说法多次得到相同结果后提升为规则"""
+        key = normalize_utterance(voice_text)
+        if not key or not result or not result.get("command"):
+            return
+
+        rule_result = {"command": result["command"], "parameters": result.get("parameters") or {}}
+        signature = json.dumps(rule_result, sort_keys=True, ensure_ascii=False)
+
+        with self._lock:
+            if key in self.rules or key in self.revoked_keys:
+                return
+
+            candidate = self.candidates.get(key)
+            if candidate is None or candidate['signature'] != signature:
+                # 结果不一致时重新计数
+                candidate = {"signature": signature, "result": rule_result, "count": 0}
+            candidate['count'] += 1
+            self.candidates[key] = candidate
+            self.candidates.move_to_end(key)
+
+            if candidate['count'] >= self.promotion_threshold:
+                del self.candidates[key]
+                now = time.time()
+                self.rules[key] = {
+                    "result": rule_result,
+                    "confidence": self.confidence,
+                    "last_hit": now,
+                    "learned_at": now,
+                    "hits": 0
+                }
+                self.learned += 1
+                logger.info(f"新增自学习规则：{voice_text} -> {rule_result}")
+                self._save()
+
+            while len(self.candidates) > self.max_candidates:
+                self.candidates.popitem(last=False)
+            self._save(force=False)
+
+    def revoke(self, voice_text):
+        """撤销规则，并阻止该说法再次被学习；返回是否撤销了已有规则"""
+        key = normalize_utterance(voice_text)
+        if not key:
+            return False
+
+        with self._lock:
+            removed = self.rules.pop(key, None) is not None
+            self.candidates.pop(key, None)
+            self.revoked_keys.add(key)
+            if removed:
+                self.revoked += 1
+                logger.info(f"已撤销自学习规则：{voice_text}")
+            self._save()
+            return removed
+
+    def flush(self):
+        """将尚未写入的命中记录保存到磁盘"""
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def get_status(self):
+        """获取自学习规则状态"""
+        with self._lock:
+            return {
+                "rules": len(self.rules),
+                "candidates": len(self.candidates),
+                "learned": self.learned,
+                "hits": self.hits,
+                "evictions": self.evictions,
+                "revoked": self.revoked
+            }
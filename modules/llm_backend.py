@@ -0,0 +1,72 @@
+"""
+LLM后端模块
+封装OpenAI兼容的聊天补全服务配置（地址、模型、超时），可指向本地模拟服务进行压测
+"""
+import logging
+import httpx
+from openai import OpenAI, AsyncOpenAI
+from config.settings import (
+    LLM_BASE_URL, LLM_MODEL, LLM_TIMEOUT, LLM_CONNECT_TIMEOUT, LLM_MAX_RETRIES
+)
+from config.api_keys import OPENAI_API_KEY
+
+logger = logging.getLogger(__name__)
+
+# 本地或自建服务通常不校验密钥，但OpenAI客户端要求必须提供
+PLACEHOLDER_API_KEY = "not-needed"
+
+class LLMBackend:
+    def __init__(self, api_key=OPENAI_API_KEY, base_url=LLM_BASE_URL, model=LLM_MODEL,
+                 timeout=LLM_TIMEOUT, connect_timeout=LLM_CONNECT_TIMEOUT, max_retries=LLM_MAX_RETRIES):
+        self.api_key = api_key or (PLACEHOLDER_API_KEY if base_url else None)
+        self.base_url = base_url
+        self.model = model
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_retries = max_retries
+
+    @property
+    def enabled(self):
+        """是否已配置可用的LLM服务"""
+        return bool(self.api_key)
+
+    def request_timeout(self, timeout=None):
+        """构建请求超时配置"""
+        return httpx.Timeout(timeout or self.timeout, connect=self.connect_timeout)
+
+    def _client_options(self, max_retries):
+        return {
+            "api_key": self.api_key,
+            "base_url": self.base_url,
+            "timeout": self.request_timeout(),
+            "max_retries": self.max_retries if max_retries is None else max_retries
+        }
+
+    def _connection_limits(self):
+        # 批量与对冲请求会并发访问同一服务，保留足够的长连接以复用
+        return httpx.Limits(max_connections=100, max_keepalive_connections=20)
+
+    def create_client(self, max_retries=None):
+        """创建同步客户端，未配置时返回None"""
+        if not self.enabled:
+            return None
+        logger.info(f"LLM后端：{self.base_url or 'OpenAI'}，模型：{self.model}")
+        http_client = httpx.Client(timeout=self.request_timeout(), limits=self._connection_limits())
+        return OpenAI(http_client=http_client, **self._client_options(max_retries))
+
+    def create_async_client(self, max_retries=None):
+        """创建异步客户端，未配置时返回None"""
+        if not self.enabled:
+            return None
+        http_client = httpx.AsyncClient(timeout=self.request_timeout(), limits=self._connection_limits())
+        return AsyncOpenAI(http_client=http_client, **self._client_options(max_retries))
+
+    def get_status(self):
+        """获取后端配置"""
+        return {
+            "base_url": self.base_url or "https://api.openai.com/v1",
+            "model": self.model,
+            "timeout": self.timeout,
+            "connect_timeout": self.connect_timeout,
+            "max_retries": self.max_retries
+        }
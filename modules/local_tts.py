@@ -0,0 +1,357 @@
+"""
+本地语音合成模块
+未配置云端语音合成时使用的常驻本地引擎，避免每条播报都启动一个进程或重新加载引擎：
+- espeak / espeak-ng 以 --stdin 方式常驻，文本逐行经管道写入，合成的音频经标准输出送回，由本地播放器播放（可打断）
+- pyttsx3 引擎在专用线程中只初始化一次，依次播报
+引擎异常退出时在下一条播报前自动重启，并统计每条播报从提交到开始出声的耗时
+"""
+import os
+import time
+import queue
+import shutil
+import struct
+import logging
+import platform
+import threading
+import subprocess
+import importlib.util
+from collections import deque
+from config.settings import LOCAL_TTS_ENGINE, LOCAL_TTS_VOICE, LOCAL_TTS_RATE, LOCAL_TTS_END_SILENCE
+
+logger = logging.getLogger(__name__)
+
+
+def find_espeak():
+    """返回 espeak-ng 或 espeak 的路径，未安装时返回None"""
+    return shutil.which('espeak-ng') or shutil.which('espeak')
+
+
+class LocalTTSEngine:
+    """
+    本地语音合成引擎接口
+    speak(text, stop_event, on_start) 阻塞至播报结束或被 stop_event 打断，开始出声时调用 on_start；
+    返回是否播报成功，引擎不可用时返回False
+    """
+    name = None
+
+    def __init__(self, latency_samples=100):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=latency_samples)
+        self.utterances = 0
+        self.failures = 0
+        self.restarts = 0
+
+    def start(self):
+        """预先启动引擎（可选），首条播报不必等待引擎加载"""
+
+    def speak(self, text, stop_event=None, on_start=None):
+        submitted = time.perf_counter()
+
+        def started():
+            with self._lock:
+                self._latencies.append(time.perf_counter() - submitted)
+            if on_start:
+                on_start()
+
+        try:
+            spoken = self._speak(text, stop_event, started)
+        except Exception as e:
+            logger.error(f"本地语音合成失败：{e}")
+            spoken = False
+        with self._lock:
+            self.utterances += 1
+            if not spoken and not (stop_event is not None and stop_event.is_set()):
+                self.failures += 1
+        return spoken
+
+    def _speak(self, text, stop_event, on_start):
+        raise NotImplementedError
+
+    def close(self):
+        """停止引擎"""
+
+    def get_status(self):
+        """获取引擎统计：每条播报从提交到开始出声的耗时即本地合成的单条开销"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            return {
+                "engine": self.name,
+                "utterances": self.utterances,
+                "failures": self.failures,
+                "restarts": self.restarts,
+                "avg_start_latency_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else None,
+                "p95_start_latency_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 2)
+                if latencies else None
+            }
+
+
+class EspeakProcess(LocalTTSEngine):
+    """常驻的 espeak / espeak-ng 进程：--stdin 逐行读取文本，--stdout 输出WAV音频流"""
+    name = 'espeak'
+
+    def __init__(self, player, executable=None, voice=LOCAL_TTS_VOICE, rate=LOCAL_TTS_RATE,
+                 end_silence=LOCAL_TTS_END_SILENCE, command=None, first_audio_timeout=5.0):
+        """
+        Args:
+            player: 播放合成音频的 AudioPlayer
+            voice: 发音人，为空时 espeak-ng 使用 cmn（普通话），espeak 使用 zh
+            end_silence: 收到音频后多久没有新数据视为该条播报结束（秒）
+            command: 自定义引擎命令（须支持逐行读取标准输入、向标准输出写WAV流）
+        """
+        super().__init__()
+        self.player = player
+        if command is None:
+            executable = executable or find_espeak()
+            if not executable:
+                raise RuntimeError("未找到 espeak 或 espeak-ng")
+            if not voice:
+                voice = 'cmn' if os.path.basename(executable).startswith('espeak-ng') else 'zh'
+            command = [executable, '-v', voice, '-s', str(rate), '--stdin', '--stdout']
+        self.command = command
+        self.end_silence = end_silence
+        self.first_audio_timeout = first_audio_timeout
+        self.process = None
+        self.audio_format = (2, 1, 22050)  # 从WAV文件头更新
+        self._audio = queue.Queue()
+        self._speak_lock = threading.Lock()
+
+    def start(self):
+        with self._speak_lock:
+            self._ensure_process()
+
+    def _ensure_process(self):
+        """启动引擎进程，已退出时重启（调用方持有 _speak_lock）"""
+        if self.process is not None and self.process.poll() is None:
+            return
+        if self.process is not None:
+            self.restarts += 1
+            logger.warning(f"本地语音合成进程已退出（{self.process.returncode}），正在重启")
+            self._close_pipes(self.process)
+        self._audio = queue.Queue()
+        self.process = subprocess.Popen(
+            self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0
+        )
+        reader = threading.Thread(target=self._read_audio, args=(self.process, self._audio),
+                                  name="espeak-reader", daemon=True)
+        reader.start()
+
+    def _read_audio(self, process, audio):
+        """读取线程：去掉WAV文件头，按采样对齐后把音频放入队列；进程退出时放入None"""
+        header = b''
+        pending = b''
+        parsed = False
+        try:
+            while True:
+                data = os.read(process.stdout.fileno(), 4096)
+                if not data:
+                    break
+                if not parsed:
+                    header += data
+                    data_index = header.find(b'data')
+                    if header.startswith(b'RIFF') and (data_index < 0 or len(header) < data_index + 8):
+                        continue  # 文件头尚未读完
+                    if header.startswith(b'RIFF'):
+                        channels, rate = struct.unpack_from('<HI', header, 22)
+                        bits = struct.unpack_from('<H', header, 34)[0]
+                        self.audio_format = (bits // 8, channels, rate)
+                        data = header[data_index + 8:]
+                    else:
+                        data = header
+                    parsed = True
+                data = pending + data
+                frame = self.audio_format[0] * self.audio_format[1]
+                cut = len(data) - len(data) % frame
+                pending = data[cut:]
+                if cut:
+                    audio.put(data[:cut])
+        except OSError:
+            pass
+        audio.put(None)
+
+    def _drain(self):
+        """丢弃上一条播报（被打断时）剩余的音频"""
+        while True:
+            try:
+                if self._audio.get(timeout=self.end_silence) is None:
+                    return
+            except queue.Empty:
+                return
+
+    def _speak(self, text, stop_event, on_start):
+        line = ' '.join(text.split())
+        if not line:
+            return True
+        with self._speak_lock:
+            for attempt in range(2):
+                self._ensure_process()
+                try:
+                    self.process.stdin.write(line.encode('utf-8') + b'\n')
+                    self.process.stdin.flush()
+                    break
+                except OSError:
+                    # 进程已退出或不再读取输入，结束后重启
+                    self.process.kill()
+                    self.process.wait()
+                    if attempt:
+                        raise RuntimeError("本地语音合成进程无法写入")
+
+            try:
+                first = self._audio.get(timeout=self.first_audio_timeout)
+            except queue.Empty:
+                raise RuntimeError("本地语音合成超时")
+            if first is None:
+                # 进程在合成时退出，等它结束，下一条播报前重启
+                self.process.wait()
+                return False
+
+            def pieces():
+                yield first
+                while True:
+                    try:
+                        pcm = self._audio.get(timeout=self.end_silence)
+                    except queue.Empty:
+                        return
+                    if pcm is None:
+                        return
+                    yield pcm
+
+            sample_width, channels, rate = self.audio_format
+            spoken = self.player.play_pcm(pieces(), sample_width, channels, rate, stop_event, on_start)
+            if not spoken:
+                self._drain()
+            return spoken
+
+    @staticmethod
+    def _close_pipes(process):
+        for pipe in (process.stdin, process.stdout):
+            try:
+                pipe.close()
+            except OSError:
+                pass
+
+    def close(self):
+        with self._speak_lock:
+            if self.process is None:
+                return
+            if self.process.poll() is None:
+                try:
+                    self.process.stdin.close()
+                    self.process.wait(2)
+                except (OSError, subprocess.TimeoutExpired):
+                    self.process.kill()
+                    self.process.wait()
+            self._close_pipes(self.process)
+            self.process = None
+
+    def get_status(self):
+        status = super().get_status()
+        status["pid"] = self.process.pid if self.process is not None and self.process.poll() is None else None
+        return status
+
+
+class Pyttsx3Engine(LocalTTSEngine):
+    """在专用线程中常驻的 pyttsx3 引擎（只初始化一次，出错时重新初始化）"""
+    name = 'pyttsx3'
+
+    def __init__(self, rate=LOCAL_TTS_RATE):
+        super().__init__()
+        self.rate = rate
+        self._requests = queue.Queue()
+        self._thread = None
+        self._engine = None
+        self._current = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="pyttsx3-engine", daemon=True)
+            self._thread.start()
+
+    def _init_engine(self):
+        import pyttsx3
+        engine = pyttsx3.init()
+        engine.setProperty('rate', self.rate)
+        engine.connect('started-utterance', self._on_utterance_started)
+        return engine
+
+    def _on_utterance_started(self, name):
+        if self._current is not None:
+            self._current[2]()
+
+    def _run(self):
+        """引擎线程：依次播报提交的文本"""
+        while True:
+            request = self._requests.get()
+            if request is None:
+                return
+            text, done, on_start, result = request
+            try:
+                if self._engine is None:
+                    self._engine = self._init_engine()
+                self._current = request
+                self._engine.say(text)
+                self._engine.runAndWait()
+                result.append(True)
+            except ImportError:
+                logger.warning("pyttsx3未安装")
+                result.append(False)
+            except Exception as e:
+                logger.error(f"pyttsx3播报失败，重新初始化引擎：{e}")
+                self._engine = None
+                self.restarts += 1
+                result.append(False)
+            finally:
+                self._current = None
+                done.set()
+
+    def _speak(self, text, stop_event, on_start):
+        self.start()
+        done = threading.Event()
+        result = []
+        self._requests.put((text, done, on_start, result))
+        while not done.wait(0.05):
+            if stop_event is not None and stop_event.is_set() and self._engine is not None:
+                self._engine.stop()
+                done.wait(1)
+                return False
+        return bool(result and result[0])
+
+    def close(self):
+        self._requests.put(None)
+
+
+class SayCommand(LocalTTSEngine):
+    """macOS say 命令（没有常驻模式，每条播报一个进程；以参数列表传入文本，不经过shell）"""
+    name = 'say'
+
+    def _speak(self, text, stop_event, on_start):
+        process = subprocess.Popen(['say', text])
+        on_start()
+        while process.poll() is None:
+            if stop_event is not None and stop_event.wait(0.05):
+                process.terminate()
+                return False
+        return process.returncode == 0
+
+
+def create_local_tts_engine(player, name=LOCAL_TTS_ENGINE):
+    """
+    按配置创建本地语音合成引擎：auto 时 Linux 优先 espeak，其他平台使用 pyttsx3（macOS 未安装时使用 say）
+    没有可用引擎时返回None
+    """
+    if name == 'none':
+        return None
+    system = platform.system()
+    has_pyttsx3 = importlib.util.find_spec('pyttsx3') is not None
+    try:
+        if name == 'espeak' or (name == 'auto' and system == 'Linux' and find_espeak()):
+            return EspeakProcess(player)
+        if name == 'pyttsx3' or (name == 'auto' and has_pyttsx3):
+            return Pyttsx3Engine()
+        if name == 'say' or (name == 'auto' and system == 'Darwin'):
+            return SayCommand()
+    except RuntimeError as e:
+        logger.warning(f"本地语音合成引擎不可用：{e}")
+        return None
+    if name != 'auto':
+        logger.warning(f"不支持的本地语音合成引擎：{name}")
+    return None
@@ -0,0 +1,92 @@
+"""
+环境噪声校准模块
+按输入设备保存校准得到的能量阈值，启动时直接复用，无需每次阻塞采样环境噪声；
+运行中空闲时的动态阈值定期写回，使阈值随一天中房间噪声的变化而更新
+"""
+import os
+import json
+import time
+import logging
+import threading
+import speech_recognition as sr
+
+logger = logging.getLogger(__name__)
+
+
+def microphone_device_key(microphone):
+    """返回标识输入设备的键（设备序号与名称），无法获取名称时使用序号；虚拟音频源使用其 device_key"""
+    if not isinstance(microphone, sr.Microphone):
+        return getattr(microphone, 'device_key', None) or type(microphone).__name__
+    index = getattr(microphone, 'device_index', None)
+    try:
+        audio = microphone.get_pyaudio().PyAudio()
+        try:
+            if index is None:
+                info = audio.get_default_input_device_info()
+            else:
+                info = audio.get_device_info_by_index(index)
+        finally:
+            audio.terminate()
+        return f"{'default' if index is None else index}:{info.get('name')}"
+    except Exception:
+        return 'default' if index is None else str(index)
+
+
+class NoiseCalibrationStore:
+    def __init__(self, path=None, max_age=7 * 24 * 3600, save_interval=60):
+        """
+        Args:
+            path: 校准结果文件路径，为空时只在内存中保存
+            max_age: 校准结果的有效期（秒），过期后启动时重新校准
+            save_interval: 运行中写回阈值的最短间隔（秒）
+        """
+        self.path = path
+        self.max_age = max_age
+        self.save_interval = save_interval
+        self.devices = {}  # 设备键 -> {"energy_threshold", "updated"}
+        self._lock = threading.Lock()
+        self._last_save = 0
+        self.saves = 0
+        if path:
+            self._load()
+
+    def _load(self):
+        """从磁盘加载校准结果"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.devices = json.load(f).get('devices', {})
+        except Exception as e:
+            logger.error(f"加载噪声校准结果失败：{e}")
+
+    def _save(self):
+        if not self.path:
+            return
+        try:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({'devices': self.devices}, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.path)
+            self._last_save = time.time()
+            self.saves += 1
+        except Exception as e:
+            logger.error(f"保存噪声校准结果失败：{e}")
+
+    def get(self, device_key):
+        """返回设备未过期的能量阈值，没有时返回None"""
+        with self._lock:
+            entry = self.devices.get(device_key)
+        if not entry or time.time() - entry.get('updated', 0) > self.max_age:
+            return None
+        return entry.get('energy_threshold')
+
+    def update(self, device_key, energy_threshold, force=False):
+        """记录设备的能量阈值（非强制时按间隔合并写盘）"""
+        with self._lock:
+            self.devices[device_key] = {'energy_threshold': round(energy_threshold, 2), 'updated': time.time()}
+            if force or time.time() - self._last_save >= self.save_interval:
+                self._save()
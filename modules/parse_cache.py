@@ -0,0 +1,182 @@
+"""
+解析结果缓存模块
+以归一化后的语音文本为键，缓存LLM解析结果（LRU + TTL，可选SQLite持久化）
+"""
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from utils.text_utils import normalize_utterance
+
+logger = logging.getLogger(__name__)
+
+class ParseCache:
+    def __init__(self, max_size=512, ttl=7 * 24 * 3600, db_path=None, access_flush_size=32):
+        """
+        Args:
+            access_flush_size: 命中时的访问时间先记录在内存中，累计到该数量（或调用flush/close）时批量写入磁盘
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.db_path = db_path
+        self.access_flush_size = access_flush_size
+        self._entries = OrderedDict()  # key -> (created_at, result)
+        self._pending_access = {}  # key -> 尚未写入磁盘的最近访问时间
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if db_path:
+            self._open_db(db_path)
+
+    def _open_db(self, db_path):
+        """打开磁盘缓存并加载未过期的条目"""
+        try:
+            db_dir = os.path.dirname(db_path)
+            if db_dir and not os.path.exists(db_dir):
+                os.makedirs(db_dir)
+
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS parse_cache ("
+                "key TEXT PRIMARY KEY, result TEXT NOT NULL, "
+                "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._db.execute("DELETE FROM parse_cache WHERE created_at < ?", (time.time() - self.ttl,))
+            rows = self._db.execute(
+                "SELECT key, result, created_at FROM parse_cache ORDER BY last_access DESC LIMIT ?",
+                (self.max_size,)
+            ).fetchall()
+            self._db.commit()
+
+            # 按访问时间从旧到新插入，保持LRU顺序
+            for key, result, created_at in reversed(rows):
+                self._entries[key] = (created_at, json.loads(result))
+            logger.info(f"解析缓存已加载：{len(self._entries)} 条")
+        except Exception as e:
+            logger.error(f"解析缓存数据库打开失败，仅使用内存缓存：{e}")
+            self._db = None
+
+    def _db_execute(self, sql, params):
+        """执行磁盘缓存写操作，失败时只记录日志"""
+        if not self._db:
+            return
+        try:
+            self._db.execute(sql, params)
+            self._db.commit()
+        except Exception as e:
+            logger.error(f"解析缓存写入失败：{e}")
+
+    def get(self, voice_text):
+        """查询缓存，未命中或已过期返回None"""
+        key = normalize_utterance(voice_text)
+        if not key:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            created_at, result = entry
+            now = time.time()
+            if now - created_at > self.ttl:
+                del self._entries[key]
+                self.evictions += 1
+                self.misses += 1
+                self._db_execute("DELETE FROM parse_cache WHERE key = ?", (key,))
+                return None
+
+            # 访问时间批量写入磁盘，重启后仍按最近访问顺序加载与淘汰
+            self._entries.move_to_end(key)
+            self.hits += 1
+            if self._db:
+                self._pending_access[key] = now
+                if len(self._pending_access) >= self.access_flush_size:
+                    self._flush_access()
+            return json.loads(json.dumps(result))
+
+    def _flush_access(self):
+        """将命中的访问时间批量写入磁盘（调用方持有锁）"""
+        if not self._db or not self._pending_access:
+            self._pending_access.clear()
+            return
+        try:
+            self._db.executemany(
+                "UPDATE parse_cache SET last_access = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self._pending_access.items()]
+            )
+            self._db.commit()
+        except Exception as e:
+            logger.error(f"解析缓存写入失败：{e}")
+        self._pending_access.clear()
+
+    def flush(self):
+        """写入尚未保存的访问时间"""
+        with self._lock:
+            self._flush_access()
+
+    def put(self, voice_text, result):
+        """写入缓存，只缓存成功解析出命令的结果"""
+        key = normalize_utterance(voice_text)
+        if not key or not result or not result.get("command"):
+            return
+
+        with self._lock:
+            now = time.time()
+            self._entries[key] = (now, json.loads(json.dumps(result)))
+            self._entries.move_to_end(key)
+            self._pending_access.pop(key, None)
+            self._db_execute(
+                "INSERT OR REPLACE INTO parse_cache (key, result, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(result, ensure_ascii=False), now, now)
+            )
+
+            while len(self._entries) > self.max_size:
+                old_key, _ = self._entries.popitem(last=False)
+                self._pending_access.pop(old_key, None)
+                self.evictions += 1
+                self._db_execute("DELETE FROM parse_cache WHERE key = ?", (old_key,))
+
+    def delete(self, voice_text):
+        """删除指定说法的缓存"""
+        key = normalize_utterance(voice_text)
+        with self._lock:
+            self._pending_access.pop(key, None)
+            if self._entries.pop(key, None) is not None:
+                self._db_execute("DELETE FROM parse_cache WHERE key = ?", (key,))
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._pending_access.clear()
+            self._db_execute("DELETE FROM parse_cache", ())
+
+    def close(self):
+        """关闭磁盘缓存"""
+        with self._lock:
+            self._flush_access()
+            if self._db:
+                self._db.close()
+                self._db = None
+
+    def get_status(self):
+        """获取缓存状态"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0,
+                "persistent": self._db is not None
+            }
@@ -0,0 +1,275 @@
+"""
+语音识别后端模块
+统一整句识别接口：Azure云端识别、本地识别服务、Vosk本地离线识别（限定指令词表），以及本地优先、低置信度时再请求云端的混合模式
+"""
+import json
+import time
+import socket
+import logging
+import threading
+import requests
+from collections import namedtuple
+import speech_recognition as sr
+from config.settings import (
+    SAMPLE_RATE, RECOGNIZER_BACKEND, OFFLINE_MODEL_PATH, HYBRID_CONFIDENCE_THRESHOLD,
+    OFFLINE_GRAMMAR_PHRASES, STREAMING_SERVER_ADDRESS, UPLOAD_ENCODING, OPUS_BITRATE
+)
+from config.api_keys import AZURE_SPEECH_KEY, AZURE_SPEECH_REGION
+from modules.audio_encoding import AudioEncoder
+from modules.streaming_recognizer import FRAME_HEADER
+
+logger = logging.getLogger(__name__)
+
+RecognitionResult = namedtuple('RecognitionResult', ['text', 'confidence', 'backend'])
+
+
+class RecognizerBackend:
+    """
+    整句识别后端接口
+    recognize(audio) 返回 RecognitionResult；无法理解时抛出 sr.UnknownValueError，服务不可用时抛出 sr.RequestError
+    """
+    name = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+        self.total_time = 0.0
+
+    def recognize(self, audio):
+        start = time.perf_counter()
+        try:
+            return self._recognize(audio)
+        except (sr.UnknownValueError, sr.RequestError):
+            with self._lock:
+                self.failures += 1
+            raise
+        finally:
+            with self._lock:
+                self.requests += 1
+                self.total_time += time.perf_counter() - start
+
+    def _recognize(self, audio):
+        raise NotImplementedError
+
+    def get_status(self):
+        """获取识别统计"""
+        with self._lock:
+            return {
+                "backend": self.name,
+                "requests": self.requests,
+                "failures": self.failures,
+                "avg_latency_ms": round(self.total_time / self.requests * 1000, 2) if self.requests else None
+            }
+
+
+class AzureRecognizerBackend(RecognizerBackend):
+    """Azure语音服务短音频REST接口整句识别（支持WAV与Ogg/Opus上传）"""
+    name = 'azure'
+    url = "https://{region}.stt.speech.microsoft.com/speech/recognition/conversation/cognitiveservices/v1"
+
+    def __init__(self, key=AZURE_SPEECH_KEY, region=AZURE_SPEECH_REGION, language='zh-CN', encoder=None, timeout=10):
+        super().__init__()
+        self.key = key
+        self.region = region
+        self.language = language
+        self.timeout = timeout
+        self.encoder = encoder or AudioEncoder(UPLOAD_ENCODING, SAMPLE_RATE, OPUS_BITRATE)
+        if self.encoder.encoding == 'flac':
+            # 短音频接口只接受WAV(PCM)与Ogg/Opus
+            logger.warning("Azure语音识别不支持FLAC上传，改用WAV")
+            self.encoder = AudioEncoder('wav', self.encoder.sample_rate)
+        self._session = requests.Session()
+
+    def _recognize(self, audio):
+        data = self.encoder.encode(audio)
+        try:
+            response = self._session.post(
+                self.url.format(region=self.region),
+                params={"language": self.language, "format": "detailed"},
+                headers={
+                    "Ocp-Apim-Subscription-Key": self.key or "",
+                    "Content-Type": self.encoder.content_type,
+                    "Accept": "application/json"
+                },
+                data=data,
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+            result = response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise sr.RequestError(f"recognition request failed: {e}")
+        self.encoder.record_sent(len(data), self.encoder.raw_size(audio))
+
+        if result.get("RecognitionStatus") != "Success" or not result.get("NBest"):
+            raise sr.UnknownValueError()
+        best = result["NBest"][0]
+        if not best.get("Display"):
+            raise sr.UnknownValueError()
+        return RecognitionResult(best["Display"], best.get("Confidence"), self.name)
+
+    def get_status(self):
+        status = super().get_status()
+        status["upload"] = self.encoder.get_status()
+        return status
+
+
+class SocketRecognizerBackend(RecognizerBackend):
+    """
+    通过本地识别服务（如 tools/fake_speech_server.py）整句识别
+    使用与流式识别相同的socket协议，整段音频按上传编码压缩后作为一帧发送
+    """
+    name = 'socket'
+
+    def __init__(self, address=STREAMING_SERVER_ADDRESS, language='zh-CN', encoder=None, timeout=10):
+        super().__init__()
+        host, port = address.rsplit(':', 1)
+        self.address = (host, int(port))
+        self.language = language
+        self.timeout = timeout
+        self.encoder = encoder or AudioEncoder(UPLOAD_ENCODING, SAMPLE_RATE, OPUS_BITRATE)
+
+    def _recognize(self, audio):
+        data = self.encoder.encode(audio)
+        header = {
+            "sample_rate": self.encoder.sample_rate,
+            "sample_width": 2,
+            "language": self.language,
+            "encoding": self.encoder.encoding
+        }
+        finals = []
+        try:
+            with socket.create_connection(self.address, timeout=self.timeout) as sock:
+                sock.sendall(json.dumps(header).encode('utf-8') + b'\n'
+                             + FRAME_HEADER.pack(len(data)) + data + FRAME_HEADER.pack(0))
+                with sock.makefile('r', encoding='utf-8') as lines:
+                    for line in lines:
+                        message = json.loads(line) if line.strip() else {}
+                        if message.get("type") == "error":
+                            raise sr.RequestError(message.get("message", "语音识别服务错误"))
+                        if message.get("type") == "final" and message.get("text"):
+                            finals.append(message["text"])
+        except (OSError, ValueError) as e:
+            raise sr.RequestError(f"recognition connection failed: {e}")
+        self.encoder.record_sent(len(data), self.encoder.raw_size(audio))
+
+        if not finals:
+            raise sr.UnknownValueError()
+        return RecognitionResult(''.join(finals), None, self.name)
+
+    def get_status(self):
+        status = super().get_status()
+        status["upload"] = self.encoder.get_status()
+        return status
+
+
+class OfflineRecognizerBackend(RecognizerBackend):
+    """
+    基于Vosk的本地离线识别
+    只在限定的指令词表内解码（按字切分，模型词表必然包含），短指令无需网络往返
+    """
+    name = 'offline'
+
+    def __init__(self, model_path=OFFLINE_MODEL_PATH, phrases=OFFLINE_GRAMMAR_PHRASES, sample_rate=SAMPLE_RATE):
+        super().__init__()
+        self.model_path = model_path
+        self.sample_rate = sample_rate
+        self.enabled = False
+        self._model = None
+        # 词表外的说法解码为[unk]，据此判定为低置信度
+        self._grammar = json.dumps([' '.join(phrase) for phrase in phrases] + ['[unk]'], ensure_ascii=False)
+
+        try:
+            import vosk
+            vosk.SetLogLevel(-1)
+            self._vosk = vosk
+            self._model = vosk.Model(model_path)
+            self.enabled = True
+            logger.info(f"离线识别模型加载成功：{model_path}")
+        except ImportError:
+            logger.warning("Vosk未安装，离线语音识别已禁用")
+        except Exception as e:
+            logger.warning(f"离线识别模型加载失败（{model_path}）：{e}")
+
+    def _recognize(self, audio):
+        if not self.enabled:
+            raise sr.RequestError("离线识别模型不可用")
+
+        # 识别器不可跨线程共享，每次识别单独创建（限定词表时开销很小）
+        recognizer = self._vosk.KaldiRecognizer(self._model, self.sample_rate, self._grammar)
+        recognizer.SetWords(True)
+        recognizer.AcceptWaveform(audio.get_raw_data(convert_rate=self.sample_rate, convert_width=2))
+        result = json.loads(recognizer.FinalResult())
+
+        words = result.get('result') or []
+        text = ''.join(word['word'] for word in words if word['word'] != '[unk]')
+        if not text:
+            raise sr.UnknownValueError()
+        if any(word['word'] == '[unk]' for word in words):
+            confidence = 0.0
+        else:
+            confidence = sum(word.get('conf', 0) for word in words) / len(words)
+        return RecognitionResult(text, round(confidence, 3), self.name)
+
+
+class HybridRecognizerBackend(RecognizerBackend):
+    """本地识别置信度达到阈值时直接采用，否则请求云端；云端不可用时退回本地结果"""
+    name = 'hybrid'
+
+    def __init__(self, local, cloud, threshold=HYBRID_CONFIDENCE_THRESHOLD):
+        super().__init__()
+        self.local = local
+        self.cloud = cloud
+        self.threshold = threshold
+        self.local_answers = 0
+        self.cloud_escalations = 0
+
+    def _recognize(self, audio):
+        local_result = None
+        try:
+            local_result = self.local.recognize(audio)
+            if local_result.confidence is not None and local_result.confidence >= self.threshold:
+                with self._lock:
+                    self.local_answers += 1
+                return local_result
+        except (sr.UnknownValueError, sr.RequestError):
+            pass
+
+        with self._lock:
+            self.cloud_escalations += 1
+        try:
+            return self.cloud.recognize(audio)
+        except sr.RequestError:
+            if local_result:
+                logger.warning(f"云端识别不可用，使用本地识别结果：{local_result.text}")
+                return local_result
+            raise
+
+    def get_status(self):
+        status = super().get_status()
+        with self._lock:
+            status.update({
+                "local_answers": self.local_answers,
+                "cloud_escalations": self.cloud_escalations,
+                "local": self.local.get_status(),
+                "cloud": self.cloud.get_status()
+            })
+        return status
+
+
+def create_recognizer_backend(name=RECOGNIZER_BACKEND):
+    """根据配置创建识别后端"""
+    if name == 'azure':
+        return AzureRecognizerBackend()
+    if name == 'socket':
+        return SocketRecognizerBackend()
+    if name == 'offline':
+        return OfflineRecognizerBackend()
+    if name == 'hybrid':
+        local = OfflineRecognizerBackend()
+        cloud = AzureRecognizerBackend()
+        if not local.enabled:
+            logger.warning("离线识别不可用，混合模式仅使用云端识别")
+            return cloud
+        return HybridRecognizerBackend(local, cloud)
+    raise ValueError(f"不支持的识别后端：{name}")
@@ -0,0 +1,160 @@
+"""
+参数提取模块
+在本地解析数值、百分比、调节方式、常用文件夹与文件名，使带参数的指令无需请求LLM
+"""
+import os
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+CHINESE_DIGITS = {'零': 0, '〇': 0, '一': 1, '二': 2, '两': 2, '三': 3, '四': 4,
+                  '五': 5, '六': 6, '七': 7, '八': 8, '九': 9}
+CHINESE_UNITS = {'十': 10, '百': 100}
+
+NUMBER_PATTERN = re.compile(r'(百分之)?([0-9]+|[零〇一二两三四五六七八九十百]+)\s*([%％])?')
+QUOTED_PATTERN = re.compile(r'[“"「『‘\']([^”"」』’\']+)[”"」』’\']')
+FILENAME_PATTERNS = [
+    re.compile(r'(?:搜索|查找|找)(?:一下)?(?:文件)?(?:名为|名叫|叫做|叫)(.+?)(?:的)?(?:文件)?$'),
+    re.compile(r'(?:搜索|查找|找)(?:一下)?文件(.+)$'),
+    re.compile(r'(?:搜索|查找|找)(?:一下)?(.+?)(?:这个|那个)?文件$'),
+]
+# 逗号之后的客套或收尾短句（如“，谢谢”“，可以吗”）不属于文件名
+COURTESY_CLAUSE_PATTERN = re.compile(
+    r'[，,]\s*(?:谢谢|多谢|感谢|好吗|好不好|可以吗|行吗|麻烦了|麻烦你了|拜托了|辛苦了)[^，,]*$'
+)
+
+# 紧跟在“一点”“一些”等量词前的数字不是参数值
+NUMBER_STOP_SUFFIXES = ('点', '些', '下', '会')
+
+LEVEL_WORDS = [('最大', 100), ('最高', 100), ('最亮', 100), ('最小', 0), ('最低', 0), ('最暗', 0), ('静音', 0)]
+LEVEL_SUBJECT_PATTERN = re.compile(r'音量|声音|亮度|屏幕')
+ABSOLUTE_WORDS = ['设置为', '设置到', '设置成', '调整到', '调整为', '调到', '调至', '调成', '设为', '设成', '到']
+INCREASE_WORDS = ['调高', '调大', '调亮', '提高', '增加', '加大', '大', '高', '亮']
+DECREASE_WORDS = ['调低', '调小', '调暗', '降低', '减少', '减小', '小', '低', '暗']
+OPEN_WORDS = ['打开', '浏览', '进入', '看看', '去']
+
+
+def parse_chinese_number(text):
+    """解析中文或阿拉伯数字，无法解析时返回None"""
+    if not text:
+        return None
+    if text.isdigit():
+        return int(text)
+
+    total = 0
+    current = None
+    for char in text:
+        if char in CHINESE_DIGITS:
+            current = CHINESE_DIGITS[char] if current is None else current * 10 + CHINESE_DIGITS[char]
+        elif char in CHINESE_UNITS:
+            total += (1 if current is None else current) * CHINESE_UNITS[char]
+            current = None
+        else:
+            return None
+    return total + (current or 0)
+
+
+class SlotExtractor:
+    def __init__(self, known_folders=None):
+        self.known_folders = known_folders or {}
+        # 较长的文件夹名优先匹配
+        self._folder_names = sorted(self.known_folders, key=len, reverse=True)
+        self.extractors = {
+            'adjust_volume': self._extract_level,
+            'adjust_brightness': self._extract_level,
+            'open_folder': self._extract_folder,
+            'search_file': self._extract_filename,
+        }
+
+    def supports(self, command):
+        """是否支持该命令的参数提取"""
+        return command in self.extractors
+
+    def extract(self, command, voice_text):
+        """
+        提取命令参数
+        返回提取到的参数字典，未提取到任何参数时返回None
+        """
+        extractor = self.extractors.get(command)
+        if not extractor or not voice_text:
+            return None
+        parameters = extractor(voice_text.strip())
+        return parameters or None
+
+    def _extract_number(self, text):
+        """提取第一个有效数值，返回 (数值, 起始位置)"""
+        for match in NUMBER_PATTERN.finditer(text):
+            number_text = match.group(2)
+            suffix = text[match.end():match.end() + 1]
+            if not number_text.isdigit() and not match.group(1) and not match.group(3) \
+                    and suffix in NUMBER_STOP_SUFFIXES:
+                continue
+            value = parse_chinese_number(number_text)
+            if value is not None:
+                return max(0, min(100, value)), match.start()
+        return None, None
+
+    def _extract_level(self, text):
+        """提取音量/亮度的调节方式与数值"""
+        for word, value in LEVEL_WORDS:
+            if word in text:
+                return {"action": "set", "amount": value}
+
+        amount, position = self._extract_number(text)
+        prefix = text if position is None else text[:position]
+
+        if amount is not None and any(word in prefix for word in ABSOLUTE_WORDS):
+            return {"action": "set", "amount": amount}
+
+        # 去掉“亮度”等调节对象，避免其中的“亮”被当作调节方向
+        action = self._find_direction(LEVEL_SUBJECT_PATTERN.sub('', text))
+        if action and amount is not None:
+            return {"action": action, "amount": amount}
+        if action:
+            return {"action": action}
+        if amount is not None:
+            # 只说了数值（如“音量三十”）按绝对值处理
+            return {"action": "set", "amount": amount}
+        return {}
+
+    def _find_direction(self, text):
+        """查找相对调节方向，取最长的匹配词"""
+        best = None
+        for action, words in (('increase', INCREASE_WORDS), ('decrease', DECREASE_WORDS)):
+            for word in words:
+                if word in text and (best is None or len(word) > len(best[1])):
+                    best = (action, word)
+        return best[0] if best else None
+
+    def _extract_folder(self, text):
+        """提取常用文件夹或引号中的路径"""
+        quoted = QUOTED_PATTERN.search(text)
+        if quoted:
+            return {"path": os.path.expanduser(quoted.group(1).strip())}
+
+        if not any(word in text for word in OPEN_WORDS):
+            return {}
+
+        for name in self._folder_names:
+            if name in text:
+                return {"path": os.path.expanduser(self.known_folders[name])}
+        return {}
+
+    def _extract_filename(self, text):
+        """提取引号中的文件名或“搜索名为XX的文件”中的文件名"""
+        quoted = QUOTED_PATTERN.search(text)
+        if quoted:
+            return {"filename": quoted.group(1).strip()}
+
+        text = re.sub(r'[，。！？,.!?\s]+$', '', text)
+        text = COURTESY_CLAUSE_PATTERN.sub('', text)
+        text = re.sub(r'[，。！？,.!?\s]+$', '', text)
+        text = re.sub(r'[吧呢啊]+$', '', text)
+        for pattern in FILENAME_PATTERNS:
+            match = pattern.search(text)
+            if match:
+                filename = match.group(1).strip(' 的')
+                if filename:
+                    return {"filename": filename}
+        return {}
@@ -0,0 +1,191 @@
+"""
+语音播报调度模块
+由单个常驻播放线程按优先级依次播报：高优先级打断低优先级，同类播报合并为最新一条，超过截止时间仍未开始的播报丢弃
+"""
+import re
+import time
+import heapq
+import logging
+import itertools
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+def speech_key(text):
+    """默认的合并键：数字归一化后的文本，如“音量已调节至50%”与“音量已调节至60%”视为同类播报"""
+    return re.sub(r'\d+(\.\d+)?', '#', text)
+
+
+class SpeechItem:
+    """一条待播报的文本"""
+
+    def __init__(self, text, priority, key, deadline):
+        self.text = text
+        self.priority = priority
+        self.key = key
+        self.deadline = deadline  # time.monotonic() 时刻，为空表示不过期
+        self.enqueued_at = time.monotonic()
+        self.started_at = None  # 开始输出音频的时刻，由播放函数调用 mark_started() 记录
+        self.cancelled = threading.Event()
+
+    def mark_started(self):
+        if self.started_at is None:
+            self.started_at = time.monotonic()
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+class SpeechScheduler:
+    def __init__(self, handler, name="speech", latency_samples=100):
+        """
+        Args:
+            handler: 播放一条播报的函数 handler(item)，在播放线程中调用；应在 item.cancelled 置位后尽快返回
+            latency_samples: 统计“入队到开始出声”延迟时保留的最近样本数
+        """
+        self.handler = handler
+        self.name = name
+        self._heap = []  # (优先级, 序号, SpeechItem)
+        self._queued = {}  # 合并键 -> 排队中的 SpeechItem
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+        self.current = None
+        self._latencies = deque(maxlen=latency_samples)
+
+        self.enqueued = 0
+        self.played = 0
+        self.coalesced = 0
+        self.preempted = 0
+        self.expired = 0
+
+    def start(self):
+        """启动播放线程"""
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._work, name=f"{self.name}-player", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2):
+        """停止播放线程，丢弃排队的播报"""
+        self.clear()
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def put(self, text, priority=1, key=None, deadline=None):
+        """
+        提交播报，priority 越小越优先；返回 SpeechItem，与正在播放的内容完全相同时返回None
+        - 排队中有相同合并键的播报时，用新播报替换
+        - 新播报优先级更高、或与正在播放的是同类但内容已更新时，打断当前播放
+        deadline: 入队后多少秒内仍未开始播放则丢弃
+        """
+        key = speech_key(text) if key is None else key
+        item = SpeechItem(text, priority, key, time.monotonic() + deadline if deadline else None)
+        with self._condition:
+            current = self.current
+            if current is not None and not current.cancelled.is_set() and current.key == key \
+                    and current.text == text:
+                self.coalesced += 1
+                return None
+
+            replaced = self._queued.pop(key, None)
+            if replaced is not None:
+                replaced.cancel()
+                self.coalesced += 1
+            if current is not None and not current.cancelled.is_set() and (
+                    priority < current.priority or current.key == key):
+                current.cancel()
+                self.preempted += 1
+
+            heapq.heappush(self._heap, (priority, next(self._sequence), item))
+            self._queued[key] = item
+            self.enqueued += 1
+            self._condition.notify_all()
+        return item
+
+    def _next_item(self):
+        """取出下一条有效的播报（调用方持有锁），跳过已被替换与已过期的条目"""
+        while self._heap:
+            _, _, item = heapq.heappop(self._heap)
+            if item.cancelled.is_set():
+                continue
+            if self._queued.get(item.key) is item:
+                del self._queued[item.key]
+            if item.deadline is not None and time.monotonic() > item.deadline:
+                self.expired += 1
+                logger.debug(f"播报已过期，丢弃：{item.text}")
+                continue
+            return item
+        return None
+
+    def _work(self):
+        """播放线程：依次取出播报并播放，播报之间不插入额外的间隔"""
+        while True:
+            with self._condition:
+                item = None
+                while self._running and item is None:
+                    item = self._next_item()
+                    if item is None:
+                        self._condition.wait()
+                if not self._running:
+                    return
+                self.current = item
+
+            try:
+                self.handler(item)
+            except Exception as e:
+                logger.error(f"{self.name} 播报异常：{e}")
+            finally:
+                with self._condition:
+                    self.current = None
+                    if item.started_at is not None:
+                        self.played += 1
+                        self._latencies.append(item.started_at - item.enqueued_at)
+                    self._condition.notify_all()
+
+    def clear(self):
+        """丢弃排队的播报并打断正在播放的播报"""
+        with self._condition:
+            for _, _, item in self._heap:
+                item.cancel()
+            self._heap.clear()
+            self._queued.clear()
+            if self.current is not None:
+                self.current.cancel()
+
+    def join(self, timeout=None):
+        """等待队列清空且没有正在播放的播报，返回是否已清空"""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._queued and self.current is None, timeout=timeout
+            )
+
+    @property
+    def is_speaking(self):
+        return self.current is not None
+
+    def get_status(self):
+        """获取调度状态"""
+        with self._condition:
+            latencies = sorted(self._latencies)
+            return {
+                "depth": len(self._queued),
+                "speaking": self.current is not None,
+                "enqueued": self.enqueued,
+                "played": self.played,
+                "coalesced": self.coalesced,
+                "preempted": self.preempted,
+                "expired": self.expired,
+                "avg_start_latency_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else None,
+                "p95_start_latency_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 2)
+                if latencies else None
+            }
@@ -0,0 +1,174 @@
+"""
+流式语音识别模块
+边说边推送音频帧，通过回调返回中间结果与最终结果；识别服务位于统一接口之后，便于替换为本地服务
+"""
+import json
+import socket
+import struct
+import logging
+import threading
+from config.settings import (
+    SAMPLE_RATE, STREAMING_RECOGNIZER, STREAMING_SERVER_ADDRESS, STREAMING_END_SILENCE_MS
+)
+from config.api_keys import AZURE_SPEECH_KEY, AZURE_SPEECH_REGION
+
+logger = logging.getLogger(__name__)
+
+# socket 识别服务协议：
+# 客户端先发送一行JSON头（采样率、采样宽度、语言），之后每帧音频以4字节大端长度前缀发送，长度为0表示音频结束；
+# 服务端按行返回JSON：{"type": "interim"|"final", "text": "..."} 或 {"type": "error", "message": "..."}
+FRAME_HEADER = struct.Struct('>I')
+
+
+class StreamingRecognizer:
+    """
+    流式识别器接口
+    on_result(text, is_final): 中间结果 is_final=False，最终结果 is_final=True
+    on_error(message): 识别服务错误或无法理解
+    """
+
+    def start(self, on_result, on_error, sample_rate=SAMPLE_RATE, sample_width=2):
+        """建立识别会话"""
+        raise NotImplementedError
+
+    def push_audio(self, frame):
+        """推送一帧PCM音频"""
+        raise NotImplementedError
+
+    def stop(self):
+        """结束音频流并关闭会话，尚未结束的语句会给出最终结果"""
+        raise NotImplementedError
+
+
+class AzureStreamingRecognizer(StreamingRecognizer):
+    """基于Azure语音SDK推送流的连续识别"""
+
+    def __init__(self, key=AZURE_SPEECH_KEY, region=AZURE_SPEECH_REGION, language='zh-CN',
+                 end_silence_ms=STREAMING_END_SILENCE_MS):
+        self.key = key
+        self.region = region
+        self.language = language
+        self.end_silence_ms = end_silence_ms
+        self._stream = None
+        self._recognizer = None
+
+    def start(self, on_result, on_error, sample_rate=SAMPLE_RATE, sample_width=2):
+        import azure.cognitiveservices.speech as speechsdk
+
+        speech_config = speechsdk.SpeechConfig(subscription=self.key, region=self.region)
+        speech_config.speech_recognition_language = self.language
+        # 缩短语句结束的静音判定时长，使最终结果在停止说话后尽快返回
+        speech_config.set_property(
+            speechsdk.PropertyId.Speech_SegmentationSilenceTimeoutMs, str(self.end_silence_ms)
+        )
+
+        stream_format = speechsdk.audio.AudioStreamFormat(
+            samples_per_second=sample_rate, bits_per_sample=sample_width * 8, channels=1
+        )
+        self._stream = speechsdk.audio.PushAudioInputStream(stream_format=stream_format)
+        self._recognizer = speechsdk.SpeechRecognizer(
+            speech_config=speech_config,
+            audio_config=speechsdk.audio.AudioConfig(stream=self._stream)
+        )
+
+        def recognizing(evt):
+            if evt.result.text:
+                on_result(evt.result.text, False)
+
+        def recognized(evt):
+            if evt.result.reason == speechsdk.ResultReason.RecognizedSpeech and evt.result.text:
+                on_result(evt.result.text, True)
+            elif evt.result.reason == speechsdk.ResultReason.NoMatch:
+                on_error("无法理解，请重试")
+
+        def canceled(evt):
+            if evt.reason == speechsdk.CancellationReason.Error:
+                on_error(f"语音识别服务错误：{evt.cancellation_details.error_details}")
+
+        self._recognizer.recognizing.connect(recognizing)
+        self._recognizer.recognized.connect(recognized)
+        self._recognizer.canceled.connect(canceled)
+        self._recognizer.start_continuous_recognition()
+        logger.info("Azure流式识别已启动")
+
+    def push_audio(self, frame):
+        self._stream.write(frame)
+
+    def stop(self):
+        if self._stream:
+            self._stream.close()
+            self._stream = None
+        if self._recognizer:
+            self._recognizer.stop_continuous_recognition()
+            self._recognizer = None
+
+
+class SocketStreamingRecognizer(StreamingRecognizer):
+    """连接本地流式识别服务（如 tools/fake_speech_server.py）的识别器"""
+
+    def __init__(self, address=STREAMING_SERVER_ADDRESS, language='zh-CN', timeout=5):
+        host, port = address.rsplit(':', 1)
+        self.address = (host, int(port))
+        self.language = language
+        self.timeout = timeout
+        self._sock = None
+        self._reader = None
+        self._send_lock = threading.Lock()
+
+    def start(self, on_result, on_error, sample_rate=SAMPLE_RATE, sample_width=2):
+        self._sock = socket.create_connection(self.address, timeout=self.timeout)
+        self._sock.settimeout(None)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        header = {"sample_rate": sample_rate, "sample_width": sample_width, "language": self.language}
+        self._sock.sendall(json.dumps(header).encode('utf-8') + b'\n')
+
+        self._reader = threading.Thread(target=self._read_results, args=(on_result, on_error), daemon=True)
+        self._reader.start()
+        logger.info(f"流式识别服务已连接：{self.address[0]}:{self.address[1]}")
+
+    def _read_results(self, on_result, on_error):
+        """读取服务端返回的识别结果"""
+        try:
+            with self._sock.makefile('r', encoding='utf-8') as lines:
+                for line in lines:
+                    if not line.strip():
+                        continue
+                    message = json.loads(line)
+                    if message.get("type") == "error":
+                        on_error(message.get("message", "语音识别服务错误"))
+                    elif message.get("text"):
+                        on_result(message["text"], message.get("type") == "final")
+        except (OSError, ValueError) as e:
+            if self._sock:
+                on_error(f"语音识别服务错误：{e}")
+
+    def push_audio(self, frame):
+        if not frame:
+            return
+        with self._send_lock:
+            self._sock.sendall(FRAME_HEADER.pack(len(frame)) + frame)
+
+    def stop(self):
+        if not self._sock:
+            return
+        sock, self._sock = self._sock, None
+        try:
+            with self._send_lock:
+                sock.sendall(FRAME_HEADER.pack(0))
+            # 等待服务端返回尚未结束语句的最终结果
+            if self._reader:
+                self._reader.join(timeout=self.timeout)
+        except OSError:
+            pass
+        finally:
+            sock.close()
+            self._reader = None
+
+
+def create_streaming_recognizer(name=STREAMING_RECOGNIZER):
+    """根据配置创建流式识别器"""
+    if name == 'azure':
+        return AzureStreamingRecognizer()
+    if name == 'socket':
+        return SocketStreamingRecognizer()
+    raise ValueError(f"不支持的流式识别器：{name}")
@@ -129,13 +129,18 @@ class SystemExecutor:
                 elif action == "decrease":
                     for _ in range(amount // 2):  # 每次减少2%
                         subprocess.run(["powershell", "-Command", "[Audio]::Volume -= 0.02"], shell=True)
+                elif action == "set":
+                    subprocess.run(["powershell", "-Command", f"[Audio]::Volume = {amount / 100}"], shell=True)
+                    return {"success": True, "message": f"音量已调节至{amount}%"}
                 
                 return {"success": True, "message": f"音量已{action}"}
             
             elif self.platform == "Darwin":
                 # macOS音量控制
                 current_volume = self._get_current_volume_mac()
-                if action == "increase":
+                if action == "set":
+                    new_volume = max(0, min(100, amount))
+                elif action == "increase":
                     new_volume = min(100, current_volume + amount)
                 else:
                     new_volume = max(0, current_volume - amount)
@@ -161,7 +166,9 @@ class SystemExecutor:
                 return {"success": False, "message": "Windows亮度控制需要额外配置"}
             
             elif self.platform == "Darwin":
-                # macOS亮度控制
+                # macOS亮度控制（通过按键模拟，只支持相对调节）
+                if action == "set":
+                    return {"success": False, "message": "暂不支持将亮度设置为指定数值"}
                 if action == "increase":
                     os.system("osascript -e 'tell application \"System Events\" to key code 144'")  # F2键
                 else:
@@ -269,10 +276,8 @@ class SystemExecutor:
                     return {"success": True, "message": "正在打开文件管理器"}
             
             elif self.platform == "Darwin":
-                if folder_path:
-                    subprocess.Popen(["open", folder_path])
-                else:
-                    subprocess.Popen(["open", "/"])
+                # 未指定路径（如只说了“打开文件夹”）时打开用户主目录，与Windows打开文件管理器一致
+                subprocess.Popen(["open", folder_path or os.path.expanduser("~")])
                 return {"success": True, "message": "正在打开文件夹"}
             
             else:
@@ -0,0 +1,152 @@
+"""
+语音合成后端模块
+合成得到音频数据而不直接播放，由调用方缓存并在本地播放：完整合成返回WAV，流式合成边合成边产出PCM
+"""
+import io
+import re
+import time
+import wave
+import logging
+import threading
+from config.settings import TTS_VOICE, TTS_OUTPUT_FORMAT, TTS_STREAM_FORMAT
+from config.api_keys import AZURE_SPEECH_KEY, AZURE_SPEECH_REGION
+
+logger = logging.getLogger(__name__)
+
+
+class TTSBackend:
+    """
+    语音合成后端接口
+    synthesize(text) 返回WAV格式的音频数据，失败时抛出 RuntimeError
+    synthesize_stream(text) 逐段产出 stream_format 格式的PCM，第一段在合成服务返回首批音频时即产出
+    voice 与 output_format 用于区分缓存的音频
+    """
+    name = None
+    voice = None
+    output_format = None
+    stream_format = (2, 1, 16000)  # 流式输出的PCM格式：(采样宽度, 声道数, 采样率)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+        self.total_time = 0.0
+        self.stream_requests = 0
+        self.first_audio_time = 0.0  # 流式合成从请求到产出第一段音频的累计耗时
+
+    def synthesize(self, text):
+        start = time.perf_counter()
+        try:
+            return self._synthesize(text)
+        except Exception:
+            with self._lock:
+                self.failures += 1
+            raise
+        finally:
+            with self._lock:
+                self.requests += 1
+                self.total_time += time.perf_counter() - start
+
+    def _synthesize(self, text):
+        raise NotImplementedError
+
+    def synthesize_stream(self, text):
+        start = time.perf_counter()
+        first = True
+        try:
+            for pcm in self._synthesize_stream(text):
+                if first:
+                    first = False
+                    with self._lock:
+                        self.first_audio_time += time.perf_counter() - start
+                yield pcm
+        except Exception:
+            with self._lock:
+                self.failures += 1
+            raise
+        finally:
+            with self._lock:
+                self.stream_requests += 1
+
+    def _synthesize_stream(self, text):
+        """默认实现：完整合成后一次产出（WAV格式需与 stream_format 一致）"""
+        with wave.open(io.BytesIO(self._synthesize(text)), 'rb') as wav:
+            yield wav.readframes(wav.getnframes())
+
+    def get_status(self):
+        """获取合成统计"""
+        with self._lock:
+            return {
+                "backend": self.name,
+                "voice": self.voice,
+                "requests": self.requests,
+                "failures": self.failures,
+                "avg_latency_ms": round(self.total_time / self.requests * 1000, 2) if self.requests else None,
+                "stream_requests": self.stream_requests,
+                "avg_first_audio_ms": round(self.first_audio_time / self.stream_requests * 1000, 2)
+                if self.stream_requests else None
+            }
+
+
+def pcm_format(format_name):
+    """从Azure输出格式名（如 Raw16Khz16BitMonoPcm、Raw22050Hz16BitMonoPcm）解析PCM格式"""
+    match = re.search(r'(\d+)(K?)hz(\d+)Bit(Mono|Stereo)', format_name, re.IGNORECASE)
+    if not match:
+        raise ValueError(f"不支持的合成输出格式：{format_name}")
+    rate = int(match.group(1)) * (1000 if match.group(2) else 1)
+    return int(match.group(3)) // 8, 1 if match.group(4).lower() == 'mono' else 2, rate
+
+
+class AzureTTSBackend(TTSBackend):
+    """Azure语音合成，输出到内存（不使用SDK的默认扬声器）"""
+    name = 'azure'
+    stream_read_size = 3200  # 流式读取的块大小（字节），16kHz单声道约100毫秒
+
+    def __init__(self, key=AZURE_SPEECH_KEY, region=AZURE_SPEECH_REGION, voice=TTS_VOICE,
+                 output_format=TTS_OUTPUT_FORMAT, stream_format=TTS_STREAM_FORMAT):
+        super().__init__()
+        import azure.cognitiveservices.speech as speechsdk
+        self._speechsdk = speechsdk
+        self.voice = voice
+        self.output_format = output_format
+        self.stream_format = pcm_format(stream_format)
+        # audio_config=None：合成结果只保存在内存中；完整合成输出WAV，流式合成输出无文件头的PCM
+        self.synthesizer = speechsdk.SpeechSynthesizer(
+            speech_config=self._speech_config(key, region, output_format), audio_config=None
+        )
+        self.stream_synthesizer = speechsdk.SpeechSynthesizer(
+            speech_config=self._speech_config(key, region, stream_format), audio_config=None
+        )
+
+    def _speech_config(self, key, region, output_format):
+        speech_config = self._speechsdk.SpeechConfig(subscription=key, region=region)
+        speech_config.speech_synthesis_voice_name = self.voice
+        speech_config.set_speech_synthesis_output_format(self._speechsdk.SpeechSynthesisOutputFormat[output_format])
+        return speech_config
+
+    def _synthesize(self, text):
+        result = self.synthesizer.speak_text_async(text).get()
+        if result.reason != self._speechsdk.ResultReason.SynthesizingAudioCompleted:
+            raise RuntimeError(f"语音合成失败：{result.reason}")
+        return result.audio_data
+
+    def _synthesize_stream(self, text):
+        # start_speaking_text_async 在开始收到音频时即返回，之后从 AudioDataStream 边合成边读取
+        result = self.stream_synthesizer.start_speaking_text_async(text).get()
+        stream = self._speechsdk.AudioDataStream(result)
+        buffer = bytes(self.stream_read_size)
+        completed = False
+        try:
+            while True:
+                filled = stream.read_data(buffer)
+                if not filled:
+                    break
+                yield buffer[:filled]
+            if stream.status == self._speechsdk.StreamStatus.Canceled:
+                details = stream.cancellation_details
+                raise RuntimeError(f"语音合成失败：{details.reason if details else 'Canceled'}")
+            completed = True
+        finally:
+            if not completed:
+                # 播报被打断，停止仍在进行的合成
+                self.stream_synthesizer.stop_speaking_async()
@@ -0,0 +1,154 @@
+"""
+合成音频缓存模块
+以（文本、发音人、输出格式）的哈希为键在磁盘上保存合成的音频，总大小超过上限时淘汰最久未播放的条目；
+命中时直接读取本地文件播放，无需请求合成服务
+"""
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def tts_cache_key(text, voice, output_format):
+    """返回合成音频的缓存键（SHA-256十六进制）"""
+    return hashlib.sha256(f"{voice}\n{output_format}\n{text}".encode('utf-8')).hexdigest()
+
+
+class TTSCache:
+    suffix = '.wav'
+
+    def __init__(self, directory=None, max_bytes=50 * 1024 * 1024):
+        """
+        Args:
+            directory: 缓存目录，为空时只在内存中缓存
+            max_bytes: 缓存总大小上限（字节）
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # 键 -> 字节数，按最近使用排序
+        self._memory = {}  # 未设置目录时：键 -> 音频数据
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if directory:
+            self._load()
+
+    def _load(self):
+        """扫描缓存目录，按文件修改时间（即最近播放时间）恢复LRU顺序"""
+        try:
+            if not os.path.exists(self.directory):
+                os.makedirs(self.directory)
+            files = []
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if name.endswith('.tmp'):
+                    os.remove(path)  # 上次写入中断留下的临时文件
+                elif name.endswith(self.suffix):
+                    stat = os.stat(path)
+                    files.append((stat.st_mtime, name[:-len(self.suffix)], stat.st_size))
+            for _, key, size in sorted(files):
+                self._entries[key] = size
+                self.total_bytes += size
+            self._evict()
+            logger.info(f"合成音频缓存已加载：{len(self._entries)} 条，{self.total_bytes // 1024}KB")
+        except Exception as e:
+            logger.error(f"合成音频缓存目录不可用，仅使用内存缓存：{e}")
+            self.directory = None
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def _evict(self):
+        """淘汰最久未使用的条目直到总大小不超过上限（调用方持有锁）"""
+        while self.total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+            if self.directory:
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+            else:
+                self._memory.pop(key, None)
+
+    def contains(self, text, voice, output_format):
+        """是否已缓存（不计入命中统计，不改变LRU顺序）"""
+        with self._lock:
+            return tts_cache_key(text, voice, output_format) in self._entries
+
+    def get(self, text, voice, output_format):
+        """返回缓存的音频数据，未命中返回None"""
+        key = tts_cache_key(text, voice, output_format)
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if not self.directory:
+                self.hits += 1
+                return self._memory[key]
+
+        try:
+            path = self._path(key)
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)  # 记录最近播放时间，重启后保持LRU顺序
+        except OSError:
+            # 文件被外部删除
+            with self._lock:
+                size = self._entries.pop(key, None)
+                if size is not None:
+                    self.total_bytes -= size
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, text, voice, output_format, data):
+        """保存合成的音频（写临时文件后替换，中断时不留下不完整的条目）"""
+        if not data or len(data) > self.max_bytes:
+            return
+        key = tts_cache_key(text, voice, output_format)
+        if self.directory:
+            try:
+                temp_path = f"{self._path(key)}.{threading.get_ident()}.tmp"
+                with open(temp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(temp_path, self._path(key))
+            except OSError as e:
+                logger.error(f"合成音频缓存写入失败：{e}")
+                return
+
+        with self._lock:
+            self.total_bytes -= self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self.total_bytes += len(data)
+            if not self.directory:
+                self._memory[key] = data
+            self._evict()
+
+    def get_status(self):
+        """获取缓存统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "persistent": bool(self.directory)
+            }
@@ -0,0 +1,103 @@
+"""
+语音活动检测模块
+按帧计算能量、过零率与频谱平坦度（NumPy向量化），丢弃不含语音的音频段，避免关门声、键盘声等噪声触发识别请求
+"""
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+class VoiceActivityDetector:
+    def __init__(self, sample_rate=16000, frame_ms=30, energy_threshold_db=-45, zcr_range=(0.01, 0.35),
+                 flatness_threshold=0.4, min_speech_ms=150, max_frequency=4000):
+        self.sample_rate = sample_rate
+        self.frame_ms = frame_ms
+        self.frame_length = int(sample_rate * frame_ms / 1000)
+        self.energy_threshold_db = energy_threshold_db
+        self.zcr_range = zcr_range
+        self.flatness_threshold = flatness_threshold
+        self.min_speech_frames = max(1, int(round(min_speech_ms / frame_ms)))
+        self.max_frequency = max_frequency
+        self.enabled = False
+        self._lock = threading.Lock()
+
+        self.frames_total = 0
+        self.frames_speech = 0
+        self.frames_dropped = 0
+        self.segments_total = 0
+        self.segments_dropped = 0
+
+        try:
+            import numpy as np
+            self._np = np
+        except ImportError:
+            logger.warning("NumPy未安装，语音活动检测已禁用")
+            return
+
+        self._window = np.hanning(self.frame_length).astype(np.float32)
+        # 频谱平坦度只统计语音能量集中的频段
+        frequencies = np.fft.rfftfreq(self.frame_length, 1 / sample_rate)
+        self._band = (frequencies >= 100) & (frequencies <= max_frequency)
+        self.enabled = True
+
+    def _frames(self, pcm):
+        """将16位PCM切分为帧矩阵（丢弃末尾不足一帧的部分）"""
+        np = self._np
+        samples = np.frombuffer(pcm, dtype='<i2').astype(np.float32) / 32768.0
+        count = len(samples) // self.frame_length
+        return samples[:count * self.frame_length].reshape(count, self.frame_length)
+
+    def frame_features(self, pcm):
+        """计算每帧的能量（dBFS）、过零率与频谱平坦度"""
+        np = self._np
+        frames = self._frames(pcm)
+        if not len(frames):
+            empty = np.zeros(0, dtype=np.float32)
+            return empty, empty, empty
+
+        energy_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+        signs = frames >= 0
+        zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+
+        spectrum = np.abs(np.fft.rfft(frames * self._window, axis=1)[:, self._band]) ** 2 + 1e-12
+        flatness = np.exp(np.mean(np.log(spectrum), axis=1)) / np.mean(spectrum, axis=1)
+        return energy_db, zcr, flatness
+
+    def classify(self, pcm):
+        """逐帧判断是否为语音，返回布尔数组"""
+        energy_db, zcr, flatness = self.frame_features(pcm)
+        low, high = self.zcr_range
+        # 语音帧：足够响亮、过零率适中（排除低频嗡声与宽带噪声）、频谱有明显的谐波结构
+        return (energy_db >= self.energy_threshold_db) & (zcr >= low) & (zcr <= high) \
+            & (flatness <= self.flatness_threshold)
+
+    def is_speech(self, pcm):
+        """判断音频段是否包含语音（语音帧累计时长达到min_speech_ms），并更新统计"""
+        if not self.enabled:
+            return True
+
+        speech_frames = self.classify(pcm)
+        total = len(speech_frames)
+        speech = int(speech_frames.sum())
+        contains_speech = speech >= self.min_speech_frames
+
+        with self._lock:
+            self.frames_total += total
+            self.frames_speech += speech
+            self.segments_total += 1
+            if not contains_speech:
+                self.frames_dropped += total
+                self.segments_dropped += 1
+        return contains_speech
+
+    def get_status(self):
+        """获取语音活动检测统计"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "frames_total": self.frames_total,
+                "frames_speech": self.frames_speech,
+                "frames_dropped": self.frames_dropped,
+                "segments_total": self.segments_total,
+                "segments_dropped": self.segments_dropped
+            }
@@ -0,0 +1,160 @@
+"""
+虚拟麦克风模块
+按实时或加速的速度回放WAV文件或脚本化的音频片段（含静音间隔），作为音频源接入与真实麦克风相同的采集流程，
+用于无声卡环境下的无界面运行、回放录制的会话以及可复现的端到端延迟测试
+"""
+import time
+import threading
+import speech_recognition as sr
+from config.settings import SAMPLE_RATE, CHUNK_SIZE
+
+
+def load_wav_pcm(path, sample_rate=SAMPLE_RATE):
+    """读取音频文件（WAV/FLAC/AIFF）并转换为指定采样率的16位单声道PCM"""
+    with sr.AudioFile(path) as source:
+        audio = sr.Recognizer().record(source)
+    return audio.get_raw_data(convert_rate=sample_rate, convert_width=2)
+
+
+class VirtualMicrophone(sr.AudioSource):
+    def __init__(self, script, sample_rate=SAMPLE_RATE, chunk_size=CHUNK_SIZE, speed=1.0, tail_silence=2.0):
+        """
+        Args:
+            script: 片段列表，每项为 {"wav": 路径} / {"pcm": 16位PCM} / {"silence": 秒数}，
+                    片段可带 "transcript"（期望识别文本）与 "name"；也可直接写路径字符串或静音秒数
+            speed: 回放速度倍数，1为实时，大于1为加速，0为不限速
+            tail_silence: 脚本结束后再输出的静音时长（秒），之后标记回放完成并持续输出静音
+        """
+        self.script = list(script)
+        self.SAMPLE_RATE = sample_rate
+        self.SAMPLE_WIDTH = 2
+        self.CHUNK = chunk_size
+        self.device_key = "virtual"
+        self.speed = speed
+        self.stream = self
+        self.finished = threading.Event()
+        self.clips = []
+
+        # 片段按顺序排成时间线：(PCM或None, 字节数, 片段信息)
+        self._segments = []
+        position = 0
+        for item in script:
+            if isinstance(item, (int, float)):
+                item = {"silence": item}
+            elif isinstance(item, str):
+                item = {"wav": item}
+            if "silence" in item:
+                size = int(item["silence"] * sample_rate) * 2
+                self._segments.append((None, size, None))
+            else:
+                pcm = item["pcm"] if "pcm" in item else load_wav_pcm(item["wav"], sample_rate)
+                clip = {
+                    "name": item.get("name") or item.get("wav") or f"clip-{len(self.clips) + 1}",
+                    "transcript": item.get("transcript"),
+                    "start_s": position / 2 / sample_rate,
+                    "end_s": (position + len(pcm)) / 2 / sample_rate,
+                    "started_at": None,
+                    "ended_at": None,
+                    "pcm": pcm
+                }
+                self.clips.append(clip)
+                self._segments.append((pcm, len(pcm), clip))
+                size = len(pcm)
+            position += size
+        self._segments.append((None, int(tail_silence * sample_rate) * 2, None))
+        self.duration = position / 2 / sample_rate + tail_silence
+
+        self._lock = threading.Lock()
+        self._segment_index = 0
+        self._offset = 0
+        self._audio_time = 0.0
+        self._started = None
+
+    @classmethod
+    def from_wav_files(cls, paths, transcripts=None, gap=1.0, lead_in=1.5, **kwargs):
+        """依次回放多个音频文件，文件之间插入gap秒静音；开头的lead_in秒静音供环境噪声校准使用"""
+        transcripts = list(transcripts or [])
+        script = [lead_in]
+        for index, path in enumerate(paths):
+            script.append({"wav": path, "transcript": transcripts[index] if index < len(transcripts) else None})
+            script.append(gap)
+        return cls(script, **kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def read(self, size):
+        """读取size个采样（与PyAudio流的read接口一致），按回放速度节流"""
+        with self._lock:
+            wanted = size * 2
+            parts = []
+            started, ended = [], []
+            while wanted and self._segment_index < len(self._segments):
+                pcm, length, clip = self._segments[self._segment_index]
+                take = min(wanted, length - self._offset)
+                parts.append(pcm[self._offset:self._offset + take] if pcm is not None else bytes(take))
+                if clip is not None and self._offset == 0:
+                    started.append(clip)
+                self._offset += take
+                wanted -= take
+                if self._offset >= length:
+                    if clip is not None:
+                        ended.append(clip)
+                    self._segment_index += 1
+                    self._offset = 0
+            if wanted:
+                parts.append(bytes(wanted))
+            finished = self._segment_index >= len(self._segments)
+            delay = self._pace(size)
+
+        # 在锁外节流，等待期间不阻塞其他读取方与状态查询
+        if delay > 0:
+            time.sleep(delay)
+        # 时间戳在节流之后记录，即片段首/尾采样实际送出的时刻
+        now = time.perf_counter()
+        for clip in started:
+            clip["started_at"] = now
+        for clip in ended:
+            clip["ended_at"] = now
+        if finished:
+            self.finished.set()
+        return b''.join(parts)
+
+    def _pace(self, size):
+        """
+        按音频时长计算需要等待的时间（调用方持有锁，在锁外等待）；
+        回放结束后的静音在加速回放时按回放速度输出，实时、减速或不限速时按实时速度输出，避免空转
+        """
+        seconds = size / self.SAMPLE_RATE
+        if self.finished.is_set():
+            return seconds / max(self.speed, 1.0)
+        if self._started is None:
+            self._started = time.perf_counter()
+        self._audio_time += seconds
+        if self.speed <= 0:
+            return 0
+        return self._started + self._audio_time / self.speed - time.perf_counter()
+
+    def close(self):
+        pass
+
+    def find_clip(self, pcm):
+        """返回完整包含在一段音频中的脚本片段（用于模拟识别），没有时返回None"""
+        for clip in self.clips:
+            if clip["pcm"] and clip["pcm"] in pcm:
+                return clip
+        return None
+
+    def get_status(self):
+        """获取回放进度"""
+        with self._lock:
+            return {
+                "speed": self.speed,
+                "duration_s": round(self.duration, 3),
+                "position_s": round(self._audio_time, 3),
+                "clips": len(self.clips),
+                "finished": self.finished.is_set()
+            }
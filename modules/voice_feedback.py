@@ -5,174 +5,321 @@
 import logging
 import threading
 import time
-import tempfile
-import os
-from config.api_keys import AZURE_SPEECH_KEY, AZURE_SPEECH_REGION
+import queue
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
+from config.api_keys import AZURE_SPEECH_KEY
+from config.settings import (
+    TTS_CACHE_DIR, TTS_CACHE_MAX_BYTES, TTS_PREWARM_PHRASES, TTS_QUEUE_DEADLINE, TTS_STREAMING, TTS_PIPELINE_DEPTH,
+    TTS_CHUNK_MIN_CHARS
+)
+from modules.audio_player import AudioPlayer
+from modules.local_tts import create_local_tts_engine
+from modules.speech_scheduler import SpeechScheduler
+from modules.tts_backend import AzureTTSBackend
+from modules.tts_cache import TTSCache
+from utils.audio_utils import pcm_to_wav, wav_to_pcm
+from utils.text_utils import split_sentences
 
 logger = logging.getLogger(__name__)
 
+WELCOME_TEXT = "语音控制助手已启动，请说出您的指令"
+GOODBYE_TEXT = "语音控制助手已关闭，再见"
+
+
 class VoiceFeedback:
-    def __init__(self):
-        self.tts_enabled = bool(AZURE_SPEECH_KEY)
-        self.is_speaking = False
-        self.speech_queue = []
-        self.speech_thread = None
+    def __init__(self, tts_backend=None, player=None, tts_cache=None, prewarm_phrases=None,
+                 streaming=TTS_STREAMING, pipeline_depth=TTS_PIPELINE_DEPTH, chunk_min_chars=TTS_CHUNK_MIN_CHARS,
+                 local_tts=None):
+        """
+        Args:
+            tts_backend: 语音合成后端，为空时按配置创建Azure语音合成
+            local_tts: 未配置语音合成后端时使用的本地合成引擎，为空时按配置创建
+            player: 本地音频播放器
+            tts_cache: 合成音频缓存，为空时按配置创建
+            prewarm_phrases: 启动时在后台预先合成的播报，为空时使用欢迎语、告别语与配置中的固定播报
+            streaming: 是否分段流式合成（未命中缓存的播报边合成边播放）
+            pipeline_depth: 流式合成时最多提前合成的分段数
+            chunk_min_chars: 分段的最短字数
+        """
+        self.tts_backend = tts_backend
+        self.prewarm_thread = None
+        self.streaming = streaming
+        self.pipeline_depth = max(1, pipeline_depth)
+        self.chunk_min_chars = chunk_min_chars
+        self._synthesis_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts-synthesis")
+        # 流式播报统计
+        self._stats_lock = threading.Lock()
+        self.streamed_messages = 0
+        self.streamed_chunks = 0
+        self.stream_first_audio_time = 0.0  # 开始合成到第一段音频出声的累计耗时
+        self.stream_stall_time = 0.0  # 出声后等待后续音频的累计耗时
+        self.stream_underruns = 0
+        # 从开始合成到得到音频的累计耗时，分命中缓存与请求合成服务两种情况
+        self.cache_synthesis_time = 0.0
+        self.network_synthesis_time = 0.0
+        
+        if self.tts_backend is None:
+            if AZURE_SPEECH_KEY:
+                try:
+                    self.tts_backend = AzureTTSBackend()
+                    logger.info("语音合成服务初始化成功")
+                except ImportError:
+                    logger.warning("Azure语音服务库未安装，将使用文本反馈")
+                except Exception as e:
+                    logger.error(f"语音合成服务初始化失败：{e}")
+            else:
+                logger.warning("语音合成服务未配置")
+        self.tts_enabled = self.tts_backend is not None
+        self.player = player or AudioPlayer()
+        self.local_tts = None
+        if not self.tts_enabled:
+            self.local_tts = local_tts or create_local_tts_engine(self.player)
+            if self.local_tts is not None:
+                try:
+                    # 预先启动引擎，第一条播报不必等待引擎加载
+                    self.local_tts.start()
+                    logger.info(f"使用本地语音合成：{self.local_tts.name}")
+                except Exception as e:
+                    logger.error(f"本地语音合成引擎启动失败：{e}")
+                    self.local_tts = None
+            if self.local_tts is None:
+                logger.warning("没有可用的语音合成，将使用文本反馈")
+        self.tts_cache = tts_cache if tts_cache is not None else TTSCache(TTS_CACHE_DIR or None, TTS_CACHE_MAX_BYTES)
+        self.scheduler = SpeechScheduler(self._synthesize_and_play)
+        self.scheduler.start()
         
         if self.tts_enabled:
-            try:
-                import azure.cognitiveservices.speech as speechsdk
-                self.speech_config = speechsdk.SpeechConfig(
-                    subscription=AZURE_SPEECH_KEY,
-                    region=AZURE_SPEECH_REGION
-                )
-                self.speech_config.speech_synthesis_voice_name = "zh-CN-XiaoxiaoNeural"
-                self.synthesizer = speechsdk.SpeechSynthesizer(
-                    speech_config=self.speech_config
-                )
-                logger.info("语音合成服务初始化成功")
-            except ImportError:
-                logger.warning("Azure语音服务库未安装，将使用文本反馈")
-                self.tts_enabled = False
-            except Exception as e:
-                logger.error(f"语音合成服务初始化失败：{e}")
-                self.tts_enabled = False
-        else:
-            logger.warning("语音合成服务未配置，将使用文本反馈")
+            if prewarm_phrases is None:
+                prewarm_phrases = [WELCOME_TEXT, GOODBYE_TEXT] + list(TTS_PREWARM_PHRASES)
+            self.prewarm(prewarm_phrases)
     
-    def speak(self, text, priority=1):
+    def speak(self, text, priority=1, key=None, deadline=None):
         """
-        语音反馈
-        priority: 1=高优先级（立即播放），2=普通优先级（排队播放）
+        语音反馈（加入播报队列，由播放线程依次播放）
+        priority: 1=高优先级（打断正在播放的普通播报），2=普通优先级
+        key: 合并键，同类播报只播最新一条，默认为数字归一化后的文本
+        deadline: 入队后多少秒内仍未开始播放则丢弃，默认为 TTS_QUEUE_DEADLINE
         """
         if not text:
             return
         
         logger.info(f"语音反馈：{text}")
         
-        if priority == 1:
-            # 高优先级，立即播放
-            self._speak_immediately(text)
-        else:
-            # 普通优先级，加入队列
-            self._add_to_queue(text)
-    
-    def _speak_immediately(self, text):
-        """立即播放语音"""
-        if self.tts_enabled:
-            try:
-                # 停止当前播放
-                if self.is_speaking:
-                    self._stop_current_speech()
-                
-                # 启动新的语音合成
-                self.speech_thread = threading.Thread(
-                    target=self._synthesize_and_play,
-                    args=(text,)
-                )
-                self.speech_thread.daemon = True
-                self.speech_thread.start()
-                
-            except Exception as e:
-                logger.error(f"语音播放失败：{e}")
-                self._fallback_feedback(text)
-        else:
+        if not self.tts_enabled and self.local_tts is None:
+            # 没有可用的语音合成时直接输出文本
             self._fallback_feedback(text)
+            return
+        self.scheduler.put(text, priority, key, TTS_QUEUE_DEADLINE if deadline is None else deadline)
+    
+    @property
+    def is_speaking(self):
+        return self.scheduler.is_speaking
     
-    def _add_to_queue(self, text):
-        """添加语音到播放队列"""
-        self.speech_queue.append(text)
+    def _cached_audio(self, text):
+        """返回缓存的合成音频（WAV），未命中返回None"""
+        began = time.perf_counter()
+        audio = self.tts_cache.get(text, self.tts_backend.voice, self.tts_backend.output_format)
+        if audio is not None:
+            self.cache_synthesis_time += time.perf_counter() - began
+        return audio
+    
+    def _synthesize(self, text):
+        """返回文本的合成音频：优先读取缓存，未命中时请求合成服务并写入缓存"""
+        audio = self._cached_audio(text)
+        if audio is not None:
+            return audio
         
-        # 如果没有正在播放，开始播放队列
-        if not self.is_speaking:
-            self._process_speech_queue()
+        began = time.perf_counter()
+        backend = self.tts_backend
+        audio = backend.synthesize(text)
+        self.network_synthesis_time += time.perf_counter() - began
+        self.tts_cache.put(text, backend.voice, backend.output_format, audio)
+        return audio
     
-    def _process_speech_queue(self):
-        """处理语音播放队列"""
-        if not self.speech_queue:
+    def prewarm(self, phrases):
+        """在后台线程中预先合成尚未缓存的播报"""
+        backend = self.tts_backend
+        pending = [
+            text for text in dict.fromkeys(phrases)
+            if text and not self.tts_cache.contains(text, backend.voice, backend.output_format)
+        ]
+        if not pending:
             return
         
-        if self.speech_thread and self.speech_thread.is_alive():
-            return
+        def run():
+            for text in pending:
+                try:
+                    # 启动后已播报过的（如欢迎语）不再重复合成
+                    if not self.tts_cache.contains(text, backend.voice, backend.output_format):
+                        self.tts_cache.put(text, backend.voice, backend.output_format, backend.synthesize(text))
+                except Exception as e:
+                    logger.warning(f"预合成语音失败：{text}：{e}")
+                    return
+            logger.info(f"已预合成 {len(pending)} 条固定播报")
         
-        text = self.speech_queue.pop(0)
-        self.speech_thread = threading.Thread(
-            target=self._synthesize_and_play,
-            args=(text,)
-        )
-        self.speech_thread.daemon = True
-        self.speech_thread.start()
-    
-    def _synthesize_and_play(self, text):
-        """合成并播放语音"""
+        self.prewarm_thread = threading.Thread(target=run, name="tts-prewarm")
+        self.prewarm_thread.daemon = True
+        self.prewarm_thread.start()
+    
+    def _synthesize_and_play(self, item):
+        """播放线程：合成（或读取缓存的）音频并在本地播放一条播报，被打断时尽快返回"""
+        text = item.text
         try:
-            self.is_speaking = True
+            if not self.tts_enabled:
+                self._system_tts(item)
+                return
             
-            if self.tts_enabled:
-                # 使用Azure TTS服务
-                result = self.synthesizer.speak_text_async(text).get()
-                
-                import azure.cognitiveservices.speech as speechsdk
-                if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
-                    logger.debug("语音合成完成")
-                else:
-                    logger.error(f"语音合成失败：{result.reason}")
-                    self._fallback_feedback(text)
+            if self.streaming:
+                audio = self._cached_audio(text)
+                if audio is None:
+                    self._stream_and_play(item)
+                    return
             else:
-                # 使用系统TTS
-                self._system_tts(text)
-            
-            # 播放完成后处理队列中的下一个
-            time.sleep(0.5)  # 短暂延迟
-            self.is_speaking = False
-            
-            if self.speech_queue:
-                self._process_speech_queue()
+                try:
+                    audio = self._synthesize(text)
+                except RuntimeError as e:
+                    logger.error(str(e))
+                    audio = None
+            if item.cancelled.is_set():
+                return
+            if audio is not None:
+                self.player.play(audio, stop_event=item.cancelled, on_start=item.mark_started)
+            if audio is None or not self.player.available:
+                item.mark_started()
+                self._fallback_feedback(text)
                 
         except Exception as e:
             logger.error(f"语音合成播放失败：{e}")
-            self.is_speaking = False
+            item.mark_started()
             self._fallback_feedback(text)
     
-    def _stop_current_speech(self):
-        """停止当前语音播放"""
+    def _stream_and_play(self, item):
+        """
+        分段流式合成并播放：合成线程按分段顺序合成，最多比播放提前 pipeline_depth 段；
+        播放线程从第一段返回的首批音频开始出声，出声时间不随播报长度增加
+        """
+        sentences = split_sentences(item.text, self.chunk_min_chars)
+        segments = queue.Queue(maxsize=self.pipeline_depth)
+        finished = threading.Event()
+        
+        def stopped():
+            return finished.is_set() or item.cancelled.is_set()
+        
+        began = time.perf_counter()
+        first_audio = []
+        
+        def on_start():
+            item.mark_started()
+            first_audio.append(time.perf_counter() - began)
+        
+        self._synthesis_executor.submit(self._produce_segments, sentences, segments, stopped)
+        sample_width, channels, rate = self.tts_backend.stream_format
+        stall = [0.0, 0]
         try:
-            if hasattr(self, 'synthesizer') and self.synthesizer:
-                self.synthesizer.stop_speaking_async()
-            self.is_speaking = False
-        except Exception as e:
-            logger.error(f"停止语音播放失败：{e}")
+            self.player.play_pcm(
+                self._consume_segments(segments, stopped, stall), sample_width, channels, rate,
+                stop_event=item.cancelled, on_start=on_start
+            )
+        finally:
+            finished.set()
+        
+        if first_audio:
+            with self._stats_lock:
+                self.streamed_messages += 1
+                self.streamed_chunks += len(sentences)
+                self.stream_first_audio_time += first_audio[0]
+                self.stream_stall_time += stall[0]
+                self.stream_underruns += stall[1]
+        elif not self.player.available and not item.cancelled.is_set():
+            item.mark_started()
+            self._fallback_feedback(item.text)
     
-    def _system_tts(self, text):
-        """使用系统TTS"""
-        try:
-            import platform
-            system = platform.system()
-            
-            if system == "Windows":
-                # Windows系统TTS
-                import pyttsx3
-                engine = pyttsx3.init()
-                engine.say(text)
-                engine.runAndWait()
-                
-            elif system == "Darwin":  # macOS
-                # macOS系统TTS
-                os.system(f"say '{text}'")
-                
-            elif system == "Linux":
-                # Linux系统TTS
-                os.system(f"espeak '{text}'")
-                
-            else:
-                logger.warning(f"不支持的系统TTS：{system}")
-                self._fallback_feedback(text)
+    @staticmethod
+    def _put_until(target, entry, stopped):
+        """放入有界队列，队列满时等待空位直到 stopped() 为真；返回是否放入"""
+        while not stopped():
+            try:
+                target.put(entry, timeout=0.05)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    @staticmethod
+    def _get_until(source, stopped):
+        """从队列取出一项，等待期间 stopped() 为真时返回None"""
+        while not stopped():
+            try:
+                return source.get(timeout=0.05)
+            except queue.Empty:
+                continue
+        return None
+    
+    def _produce_segments(self, sentences, segments, stopped):
+        """合成线程：依次合成各分段，音频边到达边放入该分段的队列；完整合成的分段写入缓存"""
+        backend = self.tts_backend
+        for sentence in sentences:
+            pieces = queue.Queue()
+            if not self._put_until(segments, (sentence, pieces), stopped):
+                return
+            try:
+                cached = self._cached_audio(sentence)
+                if cached is not None:
+                    pcm, audio_format = wav_to_pcm(cached)
+                    if audio_format == tuple(backend.stream_format):
+                        pieces.put(pcm)
+                        continue
                 
-        except ImportError:
-            logger.warning("系统TTS库未安装")
-            self._fallback_feedback(text)
-        except Exception as e:
-            logger.error(f"系统TTS失败：{e}")
-            self._fallback_feedback(text)
+                received = []
+                with closing(backend.synthesize_stream(sentence)) as stream:
+                    for pcm in stream:
+                        if stopped():
+                            return
+                        pieces.put(pcm)
+                        received.append(pcm)
+                if received:
+                    self.tts_cache.put(sentence, backend.voice, backend.output_format,
+                                       pcm_to_wav(b''.join(received), *backend.stream_format))
+            except Exception as e:
+                logger.error(f"分段合成失败：{sentence}：{e}")
+                pieces.put(e)
+            finally:
+                pieces.put(None)
+        self._put_until(segments, None, stopped)
+    
+    def _consume_segments(self, segments, stopped, stall):
+        """播放线程：按顺序产出各分段的音频；合成失败的分段改为文本反馈"""
+        playing = False
+        while True:
+            entry = self._get_until(segments, stopped)
+            if entry is None:
+                return
+            sentence, pieces = entry
+            while True:
+                waited = time.perf_counter()
+                pcm = self._get_until(pieces, stopped)
+                if playing:
+                    # 已经出声后仍需等待音频，说明合成跟不上播放
+                    delay = time.perf_counter() - waited
+                    stall[0] += delay
+                    if delay > 0.05:
+                        stall[1] += 1
+                if pcm is None:
+                    break
+                if isinstance(pcm, Exception):
+                    self._fallback_feedback(sentence)
+                    break
+                playing = True
+                yield pcm
+    
+    def _system_tts(self, item):
+        """使用常驻的本地语音合成引擎播报，引擎不可用时改为文本反馈"""
+        if self.local_tts is not None and self.local_tts.speak(item.text, item.cancelled, item.mark_started):
+            return
+        if not item.cancelled.is_set():
+            item.mark_started()
+            self._fallback_feedback(item.text)
     
     def _fallback_feedback(self, text):
         """备用反馈方式（文本输出）"""
@@ -191,34 +338,75 @@ class VoiceFeedback:
             error_msg = result.get("message", "命令执行失败")
             self.speak(f"抱歉，{error_msg}", priority=1)
     
+    def speak_command_results(self, results):
+        """汇总播报多条命令的执行结果"""
+        if not results:
+            self.speak("命令执行失败")
+            return
+        
+        messages = []
+        for result in results:
+            if result and result.get("success"):
+                messages.append(result.get("message", "命令执行成功"))
+            else:
+                messages.append((result or {}).get("message", "命令执行失败"))
+        
+        if all(result and result.get("success") for result in results):
+            self.speak("；".join(messages), priority=1)
+        else:
+            self.speak(f"部分指令未完成：{'；'.join(messages)}", priority=1)
+    
     def speak_error(self, error_message):
         """播报错误信息"""
         self.speak(f"出现错误：{error_message}", priority=1)
     
     def speak_welcome(self):
         """播报欢迎信息"""
-        welcome_text = "语音控制助手已启动，请说出您的指令"
-        self.speak(welcome_text, priority=1)
+        self.speak(WELCOME_TEXT, priority=1)
     
     def speak_goodbye(self):
         """播报告别信息"""
-        goodbye_text = "语音控制助手已关闭，再见"
-        self.speak(goodbye_text, priority=1)
+        self.speak(GOODBYE_TEXT, priority=1)
     
     def clear_queue(self):
-        """清空语音播放队列"""
-        self.speech_queue.clear()
-        self._stop_current_speech()
+        """清空语音播放队列并停止当前播报"""
+        self.scheduler.clear()
     
     def test_speech(self):
         """测试语音功能"""
         test_text = "语音反馈功能测试，如果您能听到这段话，说明语音合成工作正常"
         self.speak(test_text, priority=1)
     
+    def _streaming_status(self):
+        """流式播报统计：分段流水线深度、平均分段数、开始合成到出声的耗时、出声后的卡顿"""
+        with self._stats_lock:
+            messages = self.streamed_messages
+            return {
+                "enabled": self.streaming,
+                "pipeline_depth": self.pipeline_depth,
+                "messages": messages,
+                "avg_chunks": round(self.streamed_chunks / messages, 2) if messages else None,
+                "avg_first_audio_ms": round(self.stream_first_audio_time / messages * 1000, 2) if messages else None,
+                "avg_stall_ms": round(self.stream_stall_time / messages * 1000, 2) if messages else None,
+                "underruns": self.stream_underruns
+            }
+    
     def get_status(self):
         """获取语音反馈状态"""
+        cache_status = self.tts_cache.get_status()
+        scheduler_status = self.scheduler.get_status()
         return {
             "tts_enabled": self.tts_enabled,
             "is_speaking": self.is_speaking,
-            "queue_length": len(self.speech_queue)
+            "queue_length": scheduler_status["depth"],
+            "scheduler": scheduler_status,
+            "tts_backend": self.tts_backend.get_status() if self.tts_backend else None,
+            "local_tts": self.local_tts.get_status() if self.local_tts else None,
+            "tts_cache": cache_status,
+            "avg_cached_synthesis_ms": round(self.cache_synthesis_time / cache_status["hits"] * 1000, 2)
+            if cache_status["hits"] else None,
+            "avg_network_synthesis_ms": round(self.network_synthesis_time / cache_status["misses"] * 1000, 2)
+            if cache_status["misses"] else None,
+            "streaming": self._streaming_status(),
+            "player": self.player.get_status()
         }
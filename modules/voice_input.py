@@ -6,87 +6,349 @@ import speech_recognition as sr
 import threading
 import time
 import logging
-from config.settings import SAMPLE_RATE, CHUNK_SIZE
-from config.api_keys import AZURE_SPEECH_KEY, AZURE_SPEECH_REGION
+from config.settings import (
+    SAMPLE_RATE, CHUNK_SIZE, RECOGNITION_MODE, AUDIO_PRE_ROLL_MS, AUDIO_BUFFER_SECONDS, PHRASE_TIME_LIMIT,
+    NOISE_CALIBRATION_PATH, NOISE_CALIBRATION_MAX_AGE, NOISE_CALIBRATION_SAVE_INTERVAL,
+    VAD_ENABLED, VAD_FRAME_MS, VAD_ENERGY_THRESHOLD_DB, VAD_ZCR_RANGE,
+    VAD_FLATNESS_THRESHOLD, VAD_MIN_SPEECH_MS,
+    RECOGNITION_QUEUE_SIZE, RECOGNITION_WORKERS, RECOGNITION_OVERFLOW_POLICY, RECOGNITION_BLOCK_TIMEOUT,
+    WAKE_WORD_ENABLED, WAKE_WORD_TEMPLATE_DIR, WAKE_WORD_THRESHOLD, WAKE_WORD_NEAR_MISS_THRESHOLD,
+    WAKE_WORD_COMMAND_WINDOW
+)
+from modules.audio_capture import AudioCapture
+from modules.batch_transcriber import BatchTranscriber
+from modules.noise_calibration import NoiseCalibrationStore, microphone_device_key
+from modules.recognizer_backend import create_recognizer_backend
+from modules.streaming_recognizer import create_streaming_recognizer
+from modules.vad import VoiceActivityDetector
+from modules.wake_word import WakeWordSpotter
+from utils.audio_utils import pcm_rms, adapt_energy_threshold
+from utils.work_queue import BoundedWorkQueue
 
 logger = logging.getLogger(__name__)
 
 class VoiceInputModule:
-    def __init__(self):
+    def __init__(self, recognition_mode=RECOGNITION_MODE, streaming_recognizer=None, recognizer_backend=None,
+                 audio_source=None):
+        """audio_source: 替代麦克风的音频源（如 VirtualMicrophone），未指定时打开系统默认麦克风"""
         self.recognizer = sr.Recognizer()
-        self.microphone = sr.Microphone()
+        self.recognizer_backend = recognizer_backend or create_recognizer_backend()
+        self.microphone = audio_source or sr.Microphone(chunk_size=CHUNK_SIZE)
         self.is_listening = False
-        self.stop_listening = None
+        self.capture = AudioCapture(
+            self.microphone,
+            self.recognizer,
+            pre_roll_ms=AUDIO_PRE_ROLL_MS,
+            buffer_seconds=AUDIO_BUFFER_SECONDS,
+            phrase_time_limit=PHRASE_TIME_LIMIT,
+            on_threshold_update=self._save_energy_threshold
+        )
+        self.noise_calibration = NoiseCalibrationStore(
+            NOISE_CALIBRATION_PATH or None,
+            max_age=NOISE_CALIBRATION_MAX_AGE,
+            save_interval=NOISE_CALIBRATION_SAVE_INTERVAL
+        )
+        self.device_key = None
+        self.microphone_ready = False
+        self.calibration_source = None
+        self.setup_time = None
         self.callback_function = None
+        self.interim_callback = None
+        self.recognition_mode = recognition_mode
+        self.streaming_recognizer = streaming_recognizer  # 未指定时按配置创建
+        self.stream_thread = None
+        self.recognition_queue = BoundedWorkQueue(
+            self._process_queued_item,
+            max_size=RECOGNITION_QUEUE_SIZE,
+            workers=RECOGNITION_WORKERS,
+            overflow_policy=RECOGNITION_OVERFLOW_POLICY,
+            block_timeout=RECOGNITION_BLOCK_TIMEOUT,
+            name="recognition"
+        )
+        self.vad = VoiceActivityDetector(
+            sample_rate=SAMPLE_RATE,
+            frame_ms=VAD_FRAME_MS,
+            energy_threshold_db=VAD_ENERGY_THRESHOLD_DB,
+            zcr_range=VAD_ZCR_RANGE,
+            flatness_threshold=VAD_FLATNESS_THRESHOLD,
+            min_speech_ms=VAD_MIN_SPEECH_MS
+        ) if VAD_ENABLED else None
+        self.wake_word = None
+        self.wake_word_window = WAKE_WORD_COMMAND_WINDOW
+        if WAKE_WORD_ENABLED:
+            self.wake_word = WakeWordSpotter(
+                sample_rate=SAMPLE_RATE,
+                threshold=WAKE_WORD_THRESHOLD,
+                near_miss_threshold=WAKE_WORD_NEAR_MISS_THRESHOLD
+            )
+            if not self.wake_word.load_templates(WAKE_WORD_TEMPLATE_DIR):
+                logger.warning(f"未找到唤醒词模板（{WAKE_WORD_TEMPLATE_DIR}），唤醒词模式未启用")
         
         # 配置语音识别参数
         self.recognizer.energy_threshold = 300
         self.recognizer.dynamic_energy_threshold = True
         self.recognizer.pause_threshold = 0.8
         
-    def setup_microphone(self):
-        """初始化麦克风"""
+    def setup_microphone(self, recalibrate=False):
+        """
+        初始化麦克风
+        该设备有未过期的校准结果时直接复用能量阈值，否则阻塞采样1秒环境噪声进行校准；
+        运行中阈值由空闲时的实时音频持续校准
+        """
+        start = time.perf_counter()
         try:
+            if self.device_key is None:
+                self.device_key = microphone_device_key(self.microphone)
+            cached = None if recalibrate else self.noise_calibration.get(self.device_key)
             with self.microphone as source:
-                self.recognizer.adjust_for_ambient_noise(source, duration=1)
-            logger.info("麦克风初始化成功")
+                if cached is None:
+                    self.recognizer.adjust_for_ambient_noise(source, duration=1)
+                    self.noise_calibration.update(self.device_key, self.recognizer.energy_threshold, force=True)
+                else:
+                    self.recognizer.energy_threshold = cached
+            self.calibration_source = 'measured' if cached is None else 'cached'
+            self.setup_time = time.perf_counter() - start
+            self.microphone_ready = True
+            logger.info(f"麦克风初始化成功（{self.device_key}，能量阈值 {self.recognizer.energy_threshold:.0f}，"
+                        f"{'已校准环境噪声' if cached is None else '使用已保存的校准结果'}）")
             return True
         except Exception as e:
             logger.error(f"麦克风初始化失败：{e}")
             return False
     
-    def start_listening(self, callback=None):
-        """开始监听语音输入"""
-        if not self.setup_microphone():
+    def _save_energy_threshold(self, threshold):
+        """空闲时动态校准的阈值写回校准结果（按间隔合并写盘）"""
+        if self.device_key is not None:
+            self.noise_calibration.update(self.device_key, threshold)
+    
+    def start_listening(self, callback=None, interim_callback=None):
+        """
+        开始监听语音输入
+        callback(text, error_message=None): 最终识别结果或错误
+        interim_callback(text): 流式识别的中间结果（仅streaming模式）
+        """
+        # 启动流程中已初始化过麦克风时不再重复校准
+        if not self.microphone_ready and not self.setup_microphone():
             return False
             
         self.callback_function = callback
+        self.interim_callback = interim_callback
         self.is_listening = True
         
-        def audio_callback(recognizer, audio):
-            try:
-                if not self.is_listening:
-                    return
-                    
-                # 使用Azure语音识别
-                text = recognizer.recognize_azure(
-                    audio, 
-                    key=AZURE_SPEECH_KEY, 
-                    location=AZURE_SPEECH_REGION,
-                    language='zh-CN'
-                )
-                
-                if text and self.callback_function:
-                    logger.info(f"识别到语音：{text}")
-                    self.callback_function(text)
-                    
-            except sr.UnknownValueError:
-                logger.debug("语音识别：无法理解音频内容")
-                if self.callback_function:
-                    self.callback_function(None, "无法理解，请重试")
-            except sr.RequestError as e:
-                logger.error(f"语音识别服务错误：{e}")
-                if self.callback_function:
-                    self.callback_function(None, f"语音识别服务错误：{e}")
-            except Exception as e:
-                logger.error(f"语音处理异常：{e}")
+        if self.recognition_mode == 'streaming':
+            return self._start_streaming()
+        
+        # 录音线程只负责把音频放入有界队列，识别、解析与执行由工作线程完成，录音不会被下游延迟阻塞
+        self.recognition_queue.start()
+        
+        if self.wake_word and self.wake_word.ready:
+            return self._start_wake_word_listening()
         
         try:
-            self.stop_listening = self.recognizer.listen_in_background(
-                self.microphone, audio_callback, phrase_time_limit=10
-            )
+            # 采集线程把音频写入预分配的环形缓冲区，切分出的语句（含预录音）放入识别队列
+            self.capture.start(self._queue_audio)
             logger.info("开始监听语音输入")
             return True
         except Exception as e:
             logger.error(f"启动语音监听失败：{e}")
             return False
     
+    def _queue_audio(self, audio):
+        """采集线程回调：把一条语句放入识别队列"""
+        if self.is_listening:
+            self._enqueue_audio(audio, False)
+    
+    def _enqueue_audio(self, audio, after_wake_word):
+        """
+        在采集线程中先做语音活动检测，只有含语音的音频段才放入识别队列，
+        噪声段不占用队列名额、不会挤掉排队中的指令。返回是否入队
+        """
+        if not self._contains_speech(audio):
+            logger.debug("语音活动检测：音频段不含语音，已丢弃")
+            return False
+        self.recognition_queue.put(('audio', audio, after_wake_word))
+        return True
+    
+    def _process_queued_item(self, item):
+        """
+        工作线程：识别队列中的音频（唤醒后的指令未识别到文本时记为误唤醒），
+        或把流式识别的最终结果/错误交给回调
+        """
+        kind = item[0]
+        if kind == 'audio':
+            _, audio, after_wake_word = item
+            if not self._recognize_audio(audio) and after_wake_word:
+                self.wake_word.record_false_accept()
+        elif self.callback_function:
+            _, text, error_message = item
+            if error_message:
+                self.callback_function(None, error_message)
+            else:
+                self.callback_function(text)
+    
+    def _recognize_audio(self, audio):
+        """识别一段音频并通过回调返回结果，返回是否识别到文本"""
+        try:
+            # 使用配置的识别后端（云端/离线/混合）
+            text = self.recognizer_backend.recognize(audio).text
+            
+            if text and self.callback_function:
+                logger.info(f"识别到语音：{text}")
+                self.callback_function(text)
+            return bool(text)
+                
+        except sr.UnknownValueError:
+            logger.debug("语音识别：无法理解音频内容")
+            if self.callback_function:
+                self.callback_function(None, "无法理解，请重试")
+        except sr.RequestError as e:
+            logger.error(f"语音识别服务错误：{e}")
+            if self.callback_function:
+                self.callback_function(None, f"语音识别服务错误：{e}")
+        except Exception as e:
+            logger.error(f"语音处理异常：{e}")
+        return False
+    
+    def _start_wake_word_listening(self):
+        """启动唤醒词模式：本地持续检测唤醒词，唤醒后只识别指令窗口内的音频"""
+        self.wake_word.reset(self.microphone.SAMPLE_RATE)
+        self.stream_thread = threading.Thread(target=self._listen_for_wake_word, daemon=True)
+        self.stream_thread.start()
+        logger.info("开始监听语音输入（唤醒词模式）")
+        return True
+    
+    def _listen_for_wake_word(self):
+        """读取麦克风音频：未唤醒时交给唤醒词检测，唤醒后收集指令音频直到停顿或窗口结束"""
+        try:
+            with self.microphone as source:
+                seconds_per_chunk = source.CHUNK / source.SAMPLE_RATE
+                while self.is_listening:
+                    frame = source.stream.read(source.CHUNK)
+                    if not self.wake_word.process(frame):
+                        if self.recognizer.dynamic_energy_threshold:
+                            energy = pcm_rms(frame, source.SAMPLE_WIDTH)
+                            if energy <= self.recognizer.energy_threshold:
+                                self._save_energy_threshold(
+                                    adapt_energy_threshold(self.recognizer, energy, seconds_per_chunk)
+                                )
+                        continue
+                    
+                    # 唤醒后未说话或只录到噪声都记为误唤醒
+                    audio = self._record_command(source, seconds_per_chunk)
+                    if audio is None or not self._enqueue_audio(audio, True):
+                        self.wake_word.record_false_accept()
+                    self.wake_word.reset(source.SAMPLE_RATE)
+        except Exception as e:
+            logger.error(f"唤醒词监听异常：{e}")
+    
+    def _record_command(self, source, seconds_per_chunk):
+        """唤醒后录制指令：说话后停顿超过pause_threshold或达到窗口时长时结束，未说话返回None"""
+        frames = []
+        elapsed = 0.0
+        silence = 0.0
+        heard_speech = False
+        while self.is_listening and elapsed < self.wake_word_window:
+            frame = source.stream.read(source.CHUNK)
+            frames.append(frame)
+            elapsed += seconds_per_chunk
+            if pcm_rms(frame, source.SAMPLE_WIDTH) > self.recognizer.energy_threshold:
+                heard_speech = True
+                silence = 0.0
+            elif heard_speech:
+                silence += seconds_per_chunk
+                if silence > self.recognizer.pause_threshold:
+                    break
+        if not heard_speech:
+            logger.info("唤醒后未检测到指令")
+            return None
+        return sr.AudioData(b''.join(frames), source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+    
+    def _contains_speech(self, audio):
+        """使用语音活动检测判断音频段是否包含语音"""
+        if not self.vad or not self.vad.enabled:
+            return True
+        return self.vad.is_speech(audio.get_raw_data(convert_rate=self.vad.sample_rate, convert_width=2))
+    
+    def _start_streaming(self):
+        """
+        启动流式识别：采集线程持续推送音频帧，最终结果与错误经识别队列由工作线程交给回调，
+        较慢的指令处理不会阻塞识别器的接收线程
+        """
+        self.recognition_queue.start()
+        try:
+            if self.streaming_recognizer is None:
+                self.streaming_recognizer = create_streaming_recognizer()
+            self.streaming_recognizer.start(
+                self._on_stream_result,
+                self._on_stream_error,
+                sample_rate=self.microphone.SAMPLE_RATE,
+                sample_width=self.microphone.SAMPLE_WIDTH
+            )
+        except Exception as e:
+            logger.error(f"启动流式识别失败：{e}")
+            self.is_listening = False
+            self.recognition_queue.stop()
+            return False
+        
+        self.stream_thread = threading.Thread(target=self._stream_audio, daemon=True)
+        self.stream_thread.start()
+        logger.info("开始监听语音输入（流式识别）")
+        return True
+    
+    def _stream_audio(self):
+        """从麦克风读取音频帧并推送给流式识别器"""
+        recognizer = self.streaming_recognizer
+        try:
+            with self.microphone as source:
+                while self.is_listening:
+                    frame = source.stream.read(source.CHUNK)
+                    recognizer.push_audio(frame)
+        except Exception as e:
+            logger.error(f"流式音频采集异常：{e}")
+            if self.is_listening:
+                self.recognition_queue.put(('result', None, f"语音识别服务错误：{e}"))
+        finally:
+            recognizer.stop()
+    
+    def _on_stream_result(self, text, is_final):
+        """处理流式识别结果"""
+        if not self.is_listening or not text:
+            return
+        if is_final:
+            logger.info(f"识别到语音：{text}")
+            self.recognition_queue.put(('result', text, None))
+            return
+        
+        # 中间结果只用于显示，直接回调（不占用识别队列，避免挤掉排队的最终结果）
+        logger.debug(f"中间识别结果：{text}")
+        try:
+            if self.interim_callback:
+                self.interim_callback(text)
+        except Exception as e:
+            logger.error(f"语音处理异常：{e}")
+    
+    def _on_stream_error(self, message):
+        """处理流式识别错误"""
+        if message.startswith("无法理解"):
+            logger.debug("语音识别：无法理解音频内容")
+        else:
+            logger.error(message)
+        if self.is_listening:
+            self.recognition_queue.put(('result', None, message))
+    
     def stop_listening_input(self):
         """停止监听语音输入"""
         self.is_listening = False
-        if self.stop_listening:
-            self.stop_listening(wait_for_stop=False)
+        if self.capture.is_running:
+            self.capture.stop()
             logger.info("停止监听语音输入")
+        if self.stream_thread:
+            self.stream_thread.join(timeout=2)
+            self.stream_thread = None
+            logger.info("停止监听语音输入")
+        self.recognition_queue.stop()
+        if self.microphone_ready and self.device_key is not None:
+            self.noise_calibration.update(self.device_key, self.recognizer.energy_threshold, force=True)
     
     def recognize_audio_file(self, audio_file_path):
         """识别音频文件中的语音"""
@@ -94,17 +356,17 @@ class VoiceInputModule:
             with sr.AudioFile(audio_file_path) as source:
                 audio = self.recognizer.record(source)
             
-            text = self.recognizer.recognize_azure(
-                audio,
-                key=AZURE_SPEECH_KEY,
-                location=AZURE_SPEECH_REGION,
-                language='zh-CN'
-            )
+            text = self.recognizer_backend.recognize(audio).text
             return text
         except Exception as e:
             logger.error(f"音频文件识别失败：{e}")
             return None
     
+    def transcribe_files(self, paths, output_path, resume=True, **options):
+        """批量转写录音文件或目录，结果写入JSON Lines，返回汇总统计（options 见 BatchTranscriber）"""
+        transcriber = BatchTranscriber(recognizer_backend=self.recognizer_backend, **options)
+        return transcriber.transcribe(paths, output_path, resume=resume)
+    
     def test_microphone(self):
         """测试麦克风是否正常工作"""
         try:
@@ -112,14 +374,27 @@ class VoiceInputModule:
                 print("正在测试麦克风，请说话...")
                 audio = self.recognizer.listen(source, timeout=5)
                 
-            text = self.recognizer.recognize_azure(
-                audio,
-                key=AZURE_SPEECH_KEY,
-                location=AZURE_SPEECH_REGION,
-                language='zh-CN'
-            )
+            text = self.recognizer_backend.recognize(audio).text
             print(f"测试成功，识别结果：{text}")
             return True
         except Exception as e:
             print(f"麦克风测试失败：{e}")
             return False
+    
+    def get_status(self):
+        """获取语音输入状态"""
+        return {
+            "is_listening": self.is_listening,
+            "recognition_mode": self.recognition_mode,
+            "recognizer_backend": self.recognizer_backend.get_status(),
+            "calibration": {
+                "device": self.device_key,
+                "source": self.calibration_source,
+                "energy_threshold": round(self.recognizer.energy_threshold, 1),
+                "setup_time_ms": round(self.setup_time * 1000, 1) if self.setup_time is not None else None
+            },
+            "capture": self.capture.get_status(),
+            "queue": self.recognition_queue.get_status(),
+            "vad": self.vad.get_status() if self.vad else None,
+            "wake_word": self.wake_word.get_status() if self.wake_word else None
+        }
@@ -0,0 +1,260 @@
+"""
+唤醒词检测模块
+在本地对麦克风音频流做关键词检测：增量计算MFCC特征，与录制的唤醒词模板做子序列DTW匹配，
+只在有声音时才进行匹配，可在笔记本CPU上持续运行
+"""
+import os
+import time
+import wave
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+class WakeWordSpotter:
+    def __init__(self, sample_rate=16000, threshold=0.25, near_miss_threshold=0.35, energy_threshold_db=-50,
+                 check_interval_ms=100, retry_window=3.0, refractory=1.0, frame_ms=25, hop_ms=10,
+                 num_filters=26, num_coefficients=13):
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.near_miss_threshold = near_miss_threshold
+        self.energy_threshold_db = energy_threshold_db
+        self.retry_window = retry_window
+        self.refractory = refractory
+        self.frame_ms = frame_ms
+        self.hop_ms = hop_ms
+        self.num_filters = num_filters
+        self.num_coefficients = num_coefficients
+        self.check_interval = max(1, int(check_interval_ms / hop_ms))
+        self.enabled = False
+        self.templates = []
+        self._lock = threading.Lock()
+
+        # 计数与CPU开销统计
+        self.detections = 0
+        self.false_accepts = 0
+        self.false_rejects = 0
+        self.near_misses = 0
+        self.checks = 0
+        self.cpu_time = 0.0
+        self.audio_time = 0.0
+        self._started = time.perf_counter()
+        self._last_near_miss = None
+        self._last_detection = None
+
+        try:
+            import numpy as np
+            self._np = np
+        except ImportError:
+            logger.warning("NumPy未安装，唤醒词检测已禁用")
+            return
+
+        self.enabled = True
+        self._filterbanks = {}
+        self.reset(sample_rate)
+
+    def reset(self, sample_rate=None):
+        """清空音频缓冲（切换音频源或采样率时调用）"""
+        if sample_rate:
+            self.sample_rate = sample_rate
+        self._frame_length = int(self.sample_rate * self.frame_ms / 1000)
+        self._hop_length = int(self.sample_rate * self.hop_ms / 1000)
+        self._pending = self._np.zeros(0, dtype=self._np.float32) if self.enabled else None
+        max_frames = max((len(template) for template in self.templates), default=100)
+        # 匹配窗口为最长模板的2倍，允许说得较慢
+        self._features = deque(maxlen=max_frames * 2)
+        self._energies = deque(maxlen=self.check_interval)
+        self._frames_since_check = 0
+
+    def _mel_filterbank(self, sample_rate, fft_size):
+        """构建三角形梅尔滤波器组（按采样率缓存）"""
+        np = self._np
+        key = (sample_rate, fft_size)
+        if key not in self._filterbanks:
+            def hz_to_mel(hz):
+                return 2595 * np.log10(1 + hz / 700)
+
+            def mel_to_hz(mel):
+                return 700 * (10 ** (mel / 2595) - 1)
+
+            # 统一使用 0~8000Hz 频段，使不同采样率下的特征可比
+            high = min(8000, sample_rate / 2)
+            mel_points = np.linspace(hz_to_mel(0), hz_to_mel(high), self.num_filters + 2)
+            bins = np.floor((fft_size + 1) * mel_to_hz(mel_points) / sample_rate).astype(int)
+            filterbank = np.zeros((self.num_filters, fft_size // 2 + 1), dtype=np.float32)
+            for index in range(1, self.num_filters + 1):
+                left, center, right = bins[index - 1], bins[index], bins[index + 1]
+                if center > left:
+                    filterbank[index - 1, left:center] = (np.arange(left, center) - left) / (center - left)
+                if right > center:
+                    filterbank[index - 1, center:right] = (right - np.arange(center, right)) / (right - center)
+            n = np.arange(self.num_filters)
+            dct = np.cos(np.pi / self.num_filters * (n + 0.5)[None, :] * np.arange(self.num_coefficients)[:, None])
+            self._filterbanks[key] = (filterbank, dct.astype(np.float32))
+        return self._filterbanks[key]
+
+    def _mfcc(self, samples, sample_rate):
+        """计算MFCC特征（去掉c0，不受音量影响），返回 (特征矩阵, 每帧能量dB)"""
+        np = self._np
+        frame_length = int(sample_rate * self.frame_ms / 1000)
+        hop_length = int(sample_rate * self.hop_ms / 1000)
+        count = 1 + (len(samples) - frame_length) // hop_length if len(samples) >= frame_length else 0
+        if count <= 0:
+            return np.zeros((0, self.num_coefficients - 1), dtype=np.float32), np.zeros(0)
+
+        indices = np.arange(frame_length)[None, :] + hop_length * np.arange(count)[:, None]
+        frames = samples[indices] * np.hamming(frame_length).astype(np.float32)
+        energy_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+
+        fft_size = 1 << (frame_length - 1).bit_length()
+        filterbank, dct = self._mel_filterbank(sample_rate, fft_size)
+        power = np.abs(np.fft.rfft(frames, fft_size, axis=1)) ** 2
+        log_mel = np.log(power @ filterbank.T + 1e-10)
+        return (log_mel @ dct.T)[:, 1:], energy_db
+
+    def _normalize(self, features):
+        """倒谱均值归一化"""
+        return features - features.mean(axis=0)
+
+    def add_template(self, pcm, sample_rate=None):
+        """添加一段唤醒词录音（16位单声道PCM）作为匹配模板"""
+        if not self.enabled:
+            return False
+        np = self._np
+        samples = np.frombuffer(pcm, dtype='<i2').astype(np.float32) / 32768.0
+        features, energy_db = self._mfcc(samples, sample_rate or self.sample_rate)
+        # 去掉模板首尾的静音
+        voiced = np.nonzero(energy_db >= self.energy_threshold_db)[0]
+        if len(voiced) < 10:
+            logger.warning("唤醒词模板过短或音量过低，已忽略")
+            return False
+        features = features[voiced[0]:voiced[-1] + 1]
+        self.templates.append(self._normalize(features))
+        self.reset()
+        return True
+
+    def load_templates(self, directory):
+        """从目录加载WAV格式的唤醒词模板，返回加载数量"""
+        if not self.enabled or not directory or not os.path.isdir(directory):
+            return 0
+        loaded = 0
+        for name in sorted(os.listdir(directory)):
+            if not name.lower().endswith('.wav'):
+                continue
+            try:
+                with wave.open(os.path.join(directory, name), 'rb') as wav:
+                    if wav.getsampwidth() != 2 or wav.getnchannels() != 1:
+                        logger.warning(f"唤醒词模板需为16位单声道WAV：{name}")
+                        continue
+                    if self.add_template(wav.readframes(wav.getnframes()), wav.getframerate()):
+                        loaded += 1
+            except (OSError, wave.Error) as e:
+                logger.warning(f"加载唤醒词模板失败（{name}）：{e}")
+        logger.info(f"已加载唤醒词模板：{loaded} 个")
+        return loaded
+
+    @property
+    def ready(self):
+        """是否可以进行唤醒词检测"""
+        return self.enabled and bool(self.templates)
+
+    def _match(self, window):
+        """子序列DTW：返回模板在窗口任意位置出现的最小平均距离"""
+        np = self._np
+        window = self._normalize(window)
+        window = window / (np.linalg.norm(window, axis=1, keepdims=True) + 1e-8)
+        best = np.inf
+        for template in self.templates:
+            if len(template) > len(window) * 2:
+                continue
+            unit = template / (np.linalg.norm(template, axis=1, keepdims=True) + 1e-8)
+            cost = 1 - unit @ window.T  # 余弦距离矩阵（模板帧 × 窗口帧）
+            # 允许从窗口任意位置开始；每个模板帧前进0~2个窗口帧，逐行向量化计算
+            total = cost[0].copy()
+            for row in cost[1:]:
+                previous = total
+                shifted1 = np.concatenate(([np.inf], previous[:-1]))
+                shifted2 = np.concatenate(([np.inf, np.inf], previous[:-2]))
+                total = row + np.minimum(np.minimum(previous, shifted1), shifted2)
+            best = min(best, float(total.min()) / len(template))
+        return best
+
+    def process(self, pcm):
+        """
+        处理一段麦克风音频（16位单声道PCM），检测到唤醒词时返回True
+        只有最近一段时间内有声音时才进行DTW匹配
+        """
+        if not self.ready:
+            return False
+
+        np = self._np
+        start = time.thread_time()
+        detected = False
+        try:
+            samples = np.frombuffer(pcm, dtype='<i2').astype(np.float32) / 32768.0
+            self.audio_time += len(samples) / self.sample_rate
+            self._pending = np.concatenate((self._pending, samples))
+
+            features, energy_db = self._mfcc(self._pending, self.sample_rate)
+            if len(features):
+                consumed = len(features) * self._hop_length
+                self._pending = self._pending[consumed:]
+                self._features.extend(features)
+                self._energies.extend(energy_db)
+                self._frames_since_check += len(features)
+
+            if self._frames_since_check >= self.check_interval and len(self._features) >= 10:
+                self._frames_since_check = 0
+                if max(self._energies) >= self.energy_threshold_db:
+                    self.checks += 1
+                    detected = self._score(self._match(np.array(self._features)))
+        finally:
+            self.cpu_time += time.thread_time() - start
+        return detected
+
+    def _score(self, distance):
+        """根据匹配距离判定是否唤醒，并统计疑似漏检（时间按已处理的音频时长计）"""
+        now = self.audio_time
+        if distance <= self.threshold:
+            if self._last_detection is not None and now - self._last_detection < self.refractory:
+                return False
+            with self._lock:
+                self.detections += 1
+                # 险些命中后用户很快重说并被检测到，视为一次漏检
+                if self._last_near_miss is not None and now - self._last_near_miss <= self.retry_window:
+                    self.false_rejects += 1
+                self._last_near_miss = None
+            self._last_detection = now
+            self._features.clear()
+            logger.info(f"检测到唤醒词（距离 {distance:.3f}）")
+            return True
+
+        if distance <= self.near_miss_threshold:
+            if self._last_near_miss is None or now - self._last_near_miss > self.refractory:
+                with self._lock:
+                    self.near_misses += 1
+            self._last_near_miss = now
+        return False
+
+    def record_false_accept(self):
+        """唤醒后的指令窗口内没有识别到指令，记为一次误唤醒"""
+        with self._lock:
+            self.false_accepts += 1
+
+    def get_status(self):
+        """获取检测统计与CPU开销"""
+        with self._lock:
+            wall_time = time.perf_counter() - self._started
+            return {
+                "enabled": self.enabled,
+                "templates": len(self.templates),
+                "detections": self.detections,
+                "false_accepts": self.false_accepts,
+                "false_rejects": self.false_rejects,
+                "near_misses": self.near_misses,
+                "checks": self.checks,
+                "cpu_time_s": round(self.cpu_time, 4),
+                "real_time_factor": round(self.cpu_time / self.audio_time, 4) if self.audio_time else None,
+                "cpu_percent": round(self.cpu_time / wall_time * 100, 2) if wall_time else None
+            }
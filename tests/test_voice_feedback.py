@@ -0,0 +1,474 @@
+"""
+语音反馈模块测试
+"""
+import unittest
+import sys
+import os
+import io
+import time
+import wave
+import shutil
+import tempfile
+import threading
+from types import SimpleNamespace
+from unittest import mock
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from modules.audio_player import AudioPlayer
+from modules.local_tts import EspeakProcess, Pyttsx3Engine
+from modules.speech_scheduler import SpeechScheduler
+from modules.tts_backend import TTSBackend
+from modules.tts_cache import TTSCache, tts_cache_key
+from modules.voice_feedback import VoiceFeedback
+
+SAMPLE_RATE = 16000
+
+
+def make_wav(text, sample_rate=SAMPLE_RATE):
+    """生成一段时长随文本长度变化的静音WAV（每字20毫秒）"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(bytes(len(text) * sample_rate // 50 * 2))
+    return buffer.getvalue()
+
+
+class FakeTTSBackend(TTSBackend):
+    """模拟合成后端：记录请求，按设定延迟返回WAV"""
+    name = 'fake'
+    voice = 'zh-CN-Test'
+    output_format = 'Riff16Khz16BitMonoPcm'
+
+    def __init__(self, latency=0.0):
+        super().__init__()
+        self.latency = latency
+        self.texts = []
+
+    def _synthesize(self, text):
+        if self.latency:
+            time.sleep(self.latency)
+        self.texts.append(text)
+        return make_wav(text)
+
+
+class StreamingTTSBackend(FakeTTSBackend):
+    """模拟流式合成：首批音频延迟 first_latency 秒返回，之后每个字一段、每段延迟 piece_latency 秒"""
+
+    def __init__(self, first_latency=0.05, piece_latency=0.01):
+        super().__init__()
+        self.first_latency = first_latency
+        self.piece_latency = piece_latency
+
+    def _synthesize_stream(self, text):
+        self.texts.append(text)
+        time.sleep(self.first_latency)
+        for index, char in enumerate(text):
+            if index:
+                time.sleep(self.piece_latency)
+            yield char.encode('utf-8').ljust(SAMPLE_RATE // 50 * 2, b'\0')
+
+
+class FakePlayer:
+    """模拟播放器：记录播放的音频；gate 未放行时播放第一段后暂停"""
+
+    def __init__(self):
+        self.available = True
+        self.played = []
+        self.pcm = []
+        self.streams = []  # 每次 play_pcm 播放的 (音频, 采样率)
+        self.done = threading.Event()
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def play(self, wav_data, stop_event=None, on_start=None):
+        if on_start:
+            on_start()
+        self.played.append(wav_data)
+        self.done.set()
+        return True
+
+    def play_pcm(self, pieces, sample_width, channels, rate, stop_event=None, on_start=None):
+        stream = bytearray()
+        self.streams.append((stream, rate))
+        for pcm in pieces:
+            if not stream and on_start:
+                on_start()
+            stream.extend(pcm)
+            self.pcm.append(pcm)
+            self.gate.wait(5)
+            if stop_event is not None and stop_event.is_set():
+                return False
+        self.done.set()
+        return True
+
+    def stop(self):
+        pass
+
+    def get_status(self):
+        return {"played": len(self.played)}
+
+
+class TestTTSCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_key_includes_voice_and_format(self):
+        """同一文本换发音人或格式不命中"""
+        cache = TTSCache()
+        cache.put("屏幕已锁定", "voice-a", "wav", b"a" * 10)
+        self.assertEqual(cache.get("屏幕已锁定", "voice-a", "wav"), b"a" * 10)
+        self.assertIsNone(cache.get("屏幕已锁定", "voice-b", "wav"))
+        self.assertIsNone(cache.get("屏幕已锁定", "voice-a", "mp3"))
+
+    def test_evicts_least_recently_used(self):
+        """超过大小上限时淘汰最久未播放的条目"""
+        cache = TTSCache(self.directory, max_bytes=300)
+        for text in ("一", "二", "三"):
+            cache.put(text, "v", "wav", b"x" * 100)
+        cache.get("一", "v", "wav")
+        cache.put("四", "v", "wav", b"x" * 100)
+
+        self.assertIsNotNone(cache.get("一", "v", "wav"))
+        self.assertIsNone(cache.get("二", "v", "wav"))
+        self.assertEqual(cache.get_status()["evictions"], 1)
+        self.assertEqual(cache.get_status()["bytes"], 300)
+        self.assertEqual(len([name for name in os.listdir(self.directory) if name.endswith('.wav')]), 3)
+
+    def test_persists_across_restarts(self):
+        """重启后从磁盘恢复条目与LRU顺序"""
+        cache = TTSCache(self.directory, max_bytes=300)
+        for text in ("一", "二", "三"):
+            cache.put(text, "v", "wav", text.encode('utf-8') * 30)
+        # 最近播放时间：二 < 三 < 一
+        for text, played_at in (("二", 1001), ("三", 1002), ("一", 1003)):
+            path = os.path.join(self.directory, tts_cache_key(text, "v", "wav") + ".wav")
+            os.utime(path, (played_at, played_at))
+
+        reloaded = TTSCache(self.directory, max_bytes=300)
+        self.assertEqual(reloaded.get("一", "v", "wav"), "一".encode('utf-8') * 30)
+        reloaded.put("四", "v", "wav", b"x" * 90)
+        # “二”最久未播放，被淘汰
+        self.assertIsNone(reloaded.get("二", "v", "wav"))
+        self.assertIsNotNone(reloaded.get("三", "v", "wav"))
+
+
+class TestVoiceFeedbackCache(unittest.TestCase):
+    def make_feedback(self, backend, phrases=()):
+        feedback = VoiceFeedback(tts_backend=backend, player=FakePlayer(), tts_cache=TTSCache(),
+                                 prewarm_phrases=phrases)
+        if feedback.prewarm_thread:
+            feedback.prewarm_thread.join(5)
+        return feedback
+
+    def test_cache_hit_skips_synthesis(self):
+        """同一文本第二次播报直接使用缓存的音频"""
+        backend = FakeTTSBackend(latency=0.05)
+        feedback = self.make_feedback(backend)
+
+        first = feedback._synthesize("音乐已暂停")
+        began = time.perf_counter()
+        second = feedback._synthesize("音乐已暂停")
+        elapsed = time.perf_counter() - began
+
+        self.assertEqual(first, second)
+        self.assertEqual(backend.texts, ["音乐已暂停"])
+        self.assertLess(elapsed, 0.05)
+        status = feedback.get_status()
+        self.assertEqual(status["tts_cache"]["hits"], 1)
+        self.assertIsNotNone(status["avg_cached_synthesis_ms"])
+
+    def test_prewarm_synthesizes_fixed_phrases_in_background(self):
+        """启动时在后台预合成固定播报，之后播报无需请求合成服务"""
+        backend = FakeTTSBackend()
+        feedback = self.make_feedback(backend, ["语音控制助手已启动，请说出您的指令", "屏幕已锁定", "屏幕已锁定"])
+        self.assertEqual(backend.texts, ["语音控制助手已启动，请说出您的指令", "屏幕已锁定"])
+
+        feedback.speak_welcome()
+        self.assertTrue(feedback.player.done.wait(2))
+        self.assertEqual(len(backend.texts), 2)
+        self.assertEqual(feedback.player.played, [make_wav("语音控制助手已启动，请说出您的指令")])
+
+    def test_synthesis_failure_falls_back_to_text(self):
+        """合成失败时改为文本反馈"""
+        class FailingBackend(FakeTTSBackend):
+            def _synthesize(self, text):
+                raise RuntimeError("语音合成失败：Canceled")
+
+        feedback = self.make_feedback(FailingBackend())
+        fallback = []
+        feedback._fallback_feedback = fallback.append
+        feedback.speak("锁屏失败")
+        self.assertTrue(feedback.scheduler.join(2))
+        self.assertEqual(fallback, ["锁屏失败"])
+        self.assertEqual(feedback.get_status()["tts_backend"]["failures"], 1)
+
+
+class TestStreamingSynthesis(unittest.TestCase):
+    def make_feedback(self, backend, **kwargs):
+        return VoiceFeedback(tts_backend=backend, player=FakePlayer(), tts_cache=TTSCache(), prewarm_phrases=(),
+                             **kwargs)
+
+    def speak_and_wait(self, feedback, text):
+        feedback.player.done.clear()
+        feedback.speak(text)
+        self.assertTrue(feedback.player.done.wait(5))
+        self.assertTrue(feedback.scheduler.join(2))
+
+    def test_first_audio_independent_of_length(self):
+        """长播报按标点分段，第一段返回首批音频即开始播放"""
+        long_text = "找不到应用程序：记事本。请检查应用名称是否正确，或者在设置中添加应用路径，然后再试一次！"
+        short_feedback = self.make_feedback(StreamingTTSBackend())
+        long_feedback = self.make_feedback(StreamingTTSBackend())
+        self.speak_and_wait(short_feedback, "屏幕已锁定")
+        self.speak_and_wait(long_feedback, long_text)
+
+        short_status = short_feedback.get_status()["streaming"]
+        long_status = long_feedback.get_status()["streaming"]
+        self.assertEqual(long_status["avg_chunks"], 4)
+        # 完整合成长播报需要0.6秒以上，首批音频的时间与短播报相当
+        self.assertLess(long_status["avg_first_audio_ms"], short_status["avg_first_audio_ms"] + 40)
+        self.assertEqual(b''.join(pcm.rstrip(b'\0') for pcm in long_feedback.player.pcm).decode('utf-8'),
+                         long_text)
+
+    def test_pipeline_depth_limits_lookahead(self):
+        """合成最多比播放提前 pipeline_depth 段"""
+        backend = StreamingTTSBackend(first_latency=0, piece_latency=0)
+        feedback = self.make_feedback(backend, pipeline_depth=2, chunk_min_chars=2)
+        feedback.player.gate.clear()
+        feedback.speak("第一段，第二段，第三段，第四段，第五段")
+        time.sleep(0.3)
+        # 正在播放第一段，第二、三段已合成
+        self.assertEqual(backend.texts, ["第一段，", "第二段，", "第三段，"])
+
+        feedback.player.gate.set()
+        self.assertTrue(feedback.player.done.wait(5))
+        self.assertEqual(len(backend.texts), 5)
+        self.assertEqual(feedback.get_status()["streaming"]["pipeline_depth"], 2)
+
+    def test_streamed_segments_are_cached(self):
+        """流式合成的分段写入缓存，再次播报时不再请求合成服务"""
+        backend = StreamingTTSBackend(first_latency=0, piece_latency=0)
+        feedback = self.make_feedback(backend)
+        text = "音量已调节至50%，亮度已经调高了"
+        self.speak_and_wait(feedback, text)
+        self.speak_and_wait(feedback, text)
+        self.assertEqual(backend.texts, ["音量已调节至50%，", "亮度已经调高了"])
+        # 第二次每个分段从缓存一次读出
+        self.assertEqual(len(feedback.player.pcm), len(text) + 2)
+        self.assertEqual(b''.join(feedback.player.pcm[len(text):]), b''.join(feedback.player.pcm[:len(text)]))
+
+
+class TestSpeechScheduler(unittest.TestCase):
+    def setUp(self):
+        self.played = []
+        self.playing = threading.Event()
+        self.release = threading.Event()
+        self.scheduler = SpeechScheduler(self.play)
+        self.scheduler.start()
+
+    def tearDown(self):
+        self.release.set()
+        self.scheduler.stop()
+
+    def play(self, item):
+        """模拟播放：开始出声后一直播放，直到放行或被打断"""
+        item.mark_started()
+        self.played.append(item.text)
+        self.playing.set()
+        while not self.release.is_set() and not item.cancelled.is_set():
+            time.sleep(0.005)
+
+    def test_coalesces_superseded_messages(self):
+        """连续的同类播报只保留最新一条，与正在播放的相同播报不重复"""
+        self.scheduler.put("正在打开记事本")
+        self.assertTrue(self.playing.wait(2))
+        self.assertIsNone(self.scheduler.put("正在打开记事本"))
+        for volume in (50, 60, 70, 80):
+            self.scheduler.put(f"音量已调节至{volume}%")
+        self.assertEqual(self.scheduler.get_status()["depth"], 1)
+
+        self.release.set()
+        self.assertTrue(self.scheduler.join(2))
+        self.assertEqual(self.played, ["正在打开记事本", "音量已调节至80%"])
+        status = self.scheduler.get_status()
+        self.assertEqual(status["coalesced"], 4)
+        self.assertEqual(status["played"], 2)
+        self.assertIsNotNone(status["p95_start_latency_ms"])
+
+    def test_higher_priority_preempts(self):
+        """高优先级播报打断正在播放的普通播报，同级播报依次播放"""
+        self.scheduler.put("正在搜索文件：报告", priority=2)
+        self.assertTrue(self.playing.wait(2))
+        self.scheduler.put("屏幕已锁定", priority=1)
+        self.scheduler.put("音乐已暂停", priority=1)
+        time.sleep(0.1)
+        self.assertEqual(self.played, ["正在搜索文件：报告", "屏幕已锁定"])
+
+        self.release.set()
+        self.assertTrue(self.scheduler.join(2))
+        self.assertEqual(self.played, ["正在搜索文件：报告", "屏幕已锁定", "音乐已暂停"])
+        self.assertEqual(self.scheduler.get_status()["preempted"], 1)
+
+    def test_drops_expired_messages(self):
+        """超过截止时间仍未开始播放的播报被丢弃"""
+        self.scheduler.put("正在打开记事本")
+        self.assertTrue(self.playing.wait(2))
+        self.scheduler.put("开始播放音乐", deadline=0.05)
+        self.scheduler.put("屏幕已锁定", deadline=5)
+        time.sleep(0.1)
+
+        self.release.set()
+        self.assertTrue(self.scheduler.join(2))
+        self.assertEqual(self.played, ["正在打开记事本", "屏幕已锁定"])
+        self.assertEqual(self.scheduler.get_status()["expired"], 1)
+
+    def test_clear_stops_playback(self):
+        """清空队列时打断当前播报并丢弃排队的播报"""
+        self.scheduler.put("正在打开记事本")
+        self.assertTrue(self.playing.wait(2))
+        self.scheduler.put("屏幕已锁定")
+        self.scheduler.clear()
+        self.assertTrue(self.scheduler.join(2))
+        self.assertEqual(self.played, ["正在打开记事本"])
+
+
+# 模拟 espeak --stdin --stdout：首次输出WAV文件头，之后每读到一行输出每字20毫秒的音频；读到“崩溃”时退出
+FAKE_ESPEAK = r'''
+import sys, struct, time
+rate = 22050
+out = sys.stdout.buffer
+header = (b"RIFF" + struct.pack("<I", 0x7ffff024) + b"WAVEfmt " + struct.pack("<IHHIIHH", 16, 1, 1, rate, rate * 2, 2, 16)
+          + b"data" + struct.pack("<I", 0x7ffff000))
+for line in sys.stdin.buffer:
+    text = line.decode("utf-8").strip()
+    if text == "崩溃":
+        sys.exit(3)
+    audio = header + struct.pack("<h", len(text)) * (len(text) * rate // 50)
+    header = b""
+    # 分两次输出，切分点不在采样边界上
+    out.write(audio[:len(audio) // 2 | 1])
+    out.flush()
+    time.sleep(0.01)
+    out.write(audio[len(audio) // 2 | 1:])
+    out.flush()
+'''
+
+
+class TestLocalTTS(unittest.TestCase):
+    def setUp(self):
+        handle, self.script = tempfile.mkstemp(suffix='.py')
+        with os.fdopen(handle, 'w', encoding='utf-8') as f:
+            f.write(FAKE_ESPEAK)
+        self.player = FakePlayer()
+        self.engine = EspeakProcess(self.player, command=[sys.executable, self.script], end_silence=0.1)
+
+    def tearDown(self):
+        self.engine.close()
+        os.remove(self.script)
+
+    def test_persistent_process_speaks_each_line(self):
+        """同一个常驻进程依次播报多条文本，文本中的引号不影响播报"""
+        texts = ["屏幕已锁定", "他说'你好' \"再见\"", "音乐已暂停"]
+        self.engine.start()
+        pid = self.engine.process.pid
+        for text in texts:
+            self.assertTrue(self.engine.speak(text))
+
+        self.assertEqual(self.engine.process.pid, pid)
+        self.assertEqual([len(stream) for stream, _ in self.player.streams],
+                         [len(text) * 22050 // 50 * 2 for text in texts])
+        self.assertEqual(self.player.streams[1][0][:2], bytes([len(texts[1]), 0]))
+        self.assertEqual(self.player.streams[0][1], 22050)
+        status = self.engine.get_status()
+        self.assertEqual(status["utterances"], 3)
+        self.assertEqual(status["restarts"], 0)
+        self.assertIsNotNone(status["p95_start_latency_ms"])
+
+    def test_restarts_after_crash(self):
+        """进程异常退出后，下一条播报前自动重启"""
+        self.assertTrue(self.engine.speak("开始播放音乐"))
+        self.assertFalse(self.engine.speak("崩溃"))
+        self.assertTrue(self.engine.speak("音乐已暂停"))
+        status = self.engine.get_status()
+        self.assertEqual(status["restarts"], 1)
+        self.assertEqual(status["failures"], 1)
+
+    def test_voice_feedback_uses_local_engine(self):
+        """未配置云端合成时由本地引擎播报"""
+        feedback = VoiceFeedback(player=self.player, tts_cache=TTSCache(), local_tts=self.engine)
+        self.assertFalse(feedback.tts_enabled)
+        feedback.speak("正在打开文件夹")
+        self.assertTrue(self.player.done.wait(5))
+        self.assertTrue(feedback.scheduler.join(2))
+        status = feedback.get_status()
+        self.assertEqual(status["local_tts"]["utterances"], 1)
+        self.assertEqual(status["scheduler"]["played"], 1)
+
+    def test_pyttsx3_engine_initialized_once(self):
+        """pyttsx3 引擎只初始化一次"""
+        spoken = []
+        engine = SimpleNamespace(
+            setProperty=lambda name, value: None,
+            connect=lambda topic, callback: setattr(engine, 'callback', callback),
+            say=lambda text: spoken.append(text),
+            runAndWait=lambda: engine.callback(None),
+            stop=lambda: None
+        )
+        fake_pyttsx3 = SimpleNamespace(init=mock.Mock(return_value=engine))
+        with mock.patch.dict(sys.modules, {'pyttsx3': fake_pyttsx3}):
+            local_tts = Pyttsx3Engine()
+            self.assertTrue(local_tts.speak("屏幕已锁定"))
+            self.assertTrue(local_tts.speak("音乐已暂停"))
+            local_tts.close()
+        self.assertEqual(fake_pyttsx3.init.call_count, 1)
+        self.assertEqual(spoken, ["屏幕已锁定", "音乐已暂停"])
+        self.assertEqual(local_tts.get_status()["utterances"], 2)
+
+
+class TestAudioPlayer(unittest.TestCase):
+    def test_plays_and_reuses_stream(self):
+        """按WAV格式打开输出流，相同格式的音频复用同一个流"""
+        opened = []
+
+        class FakeStream:
+            def __init__(self, **kwargs):
+                self.kwargs = kwargs
+                self.written = bytearray()
+                opened.append(self)
+
+            def write(self, data):
+                self.written.extend(data)
+
+            def close(self):
+                pass
+
+        class FakePyAudio:
+            def get_format_from_width(self, width):
+                return width
+
+            def open(self, **kwargs):
+                return FakeStream(**kwargs)
+
+            def terminate(self):
+                pass
+
+        player = AudioPlayer()
+        player._pyaudio = FakePyAudio()
+        self.assertTrue(player.play(make_wav("屏幕已锁定")))
+        self.assertTrue(player.play(make_wav("音乐已暂停")))
+
+        self.assertEqual(len(opened), 1)
+        self.assertEqual(opened[0].kwargs["rate"], SAMPLE_RATE)
+        self.assertEqual(len(opened[0].written), 2 * 5 * SAMPLE_RATE // 50 * 2)
+        self.assertEqual(player.get_status()["played"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,795 @@
+"""
+语音输入模块测试
+"""
+import unittest
+import sys
+import os
+import math
+import time
+import array
+import json
+import wave
+import shutil
+import tempfile
+import threading
+from types import SimpleNamespace
+from unittest import mock
+
+import speech_recognition as sr
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from modules.recognizer_backend import (
+    RecognizerBackend, RecognitionResult, AzureRecognizerBackend, SocketRecognizerBackend, OfflineRecognizerBackend,
+    HybridRecognizerBackend
+)
+from modules.audio_encoding import AudioEncoder, decode_audio
+from modules.streaming_recognizer import SocketStreamingRecognizer
+from modules.vad import VoiceActivityDetector
+from modules.wake_word import WakeWordSpotter
+from modules.audio_capture import AudioCapture
+from modules.batch_transcriber import BatchTranscriber, load_completed
+from modules.noise_calibration import NoiseCalibrationStore
+from modules.virtual_microphone import VirtualMicrophone
+from utils.audio_utils import split_at_silence
+from utils.ring_buffer import ChunkRingBuffer
+from utils.work_queue import BoundedWorkQueue
+from tools.fake_speech_server import FakeSpeechServer
+
+SAMPLE_RATE = 16000
+CHUNK = 1024
+
+
+def make_pcm(duration, frequency=0, amplitude=3000, sample_rate=SAMPLE_RATE):
+    """生成16位单声道PCM：frequency为0时为静音"""
+    count = int(duration * sample_rate)
+    samples = array.array('h', (
+        int(amplitude * math.sin(2 * math.pi * frequency * i / sample_rate)) if frequency else 0
+        for i in range(count)
+    ))
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    return samples.tobytes()
+
+
+def make_vowel(duration, f0=140, amplitude=0.3, sample_rate=SAMPLE_RATE):
+    """生成带谐波结构的类元音信号（16位PCM）"""
+    import numpy as np
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+    signal = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 25))
+    return (amplitude * signal / np.abs(signal).max() * 32767).astype('<i2').tobytes()
+
+
+def make_noise(duration, amplitude, decay=None, seed=0, sample_rate=SAMPLE_RATE):
+    """生成宽带噪声（16位PCM），decay为衰减时间常数（秒）"""
+    import numpy as np
+    count = int(duration * sample_rate)
+    noise = np.random.default_rng(seed).normal(0, amplitude, count)
+    if decay:
+        noise *= np.exp(-np.arange(count) / (decay * sample_rate))
+    return (np.clip(noise, -1, 1) * 32767).astype('<i2').tobytes()
+
+
+def make_word(syllables, stretch=1.0, noise=0.0, seed=0, sample_rate=SAMPLE_RATE):
+    """
+    生成由若干“音节”组成的合成词（16位PCM）
+    syllables: [(时长, 基频, (共振峰频率, ...)), ...]
+    """
+    import numpy as np
+    parts = []
+    for duration, f0, formants in syllables:
+        t = np.arange(int(duration * stretch * sample_rate)) / sample_rate
+        signal = sum(
+            np.sin(2 * np.pi * f0 * k * t)
+            * (0.02 + sum(np.exp(-((f0 * k - formant) / 150) ** 2) for formant in formants))
+            for k in range(1, int(6000 / f0))
+        )
+        parts.append(0.3 * signal / np.abs(signal).max())
+    signal = np.concatenate(parts)
+    signal += np.random.default_rng(seed).normal(0, noise, len(signal))
+    return (np.clip(signal, -1, 1) * 32767).astype('<i2').tobytes()
+
+
+WAKE_WORD = [(0.2, 150, (700, 1200)), (0.15, 170, (300, 2300)), (0.25, 140, (500, 900))]
+OTHER_WORD = [(0.2, 150, (300, 2300)), (0.15, 170, (700, 1200)), (0.25, 140, (400, 2000))]
+
+
+def split_frames(pcm, chunk=CHUNK):
+    return [pcm[start:start + chunk * 2] for start in range(0, len(pcm), chunk * 2)]
+
+
+class FakeMicrophone(sr.AudioSource):
+    """按实时速度回放PCM数据的麦克风，数据读完后返回静音"""
+
+    def __init__(self, pcm, realtime=True):
+        self.SAMPLE_RATE = SAMPLE_RATE
+        self.SAMPLE_WIDTH = 2
+        self.CHUNK = CHUNK
+        self.realtime = realtime
+        self.frames = split_frames(pcm)
+        self.position = 0
+        self.last_speech_read = None
+        self.stream = SimpleNamespace(read=self.read)
+
+    def read(self, size):
+        if self.realtime:
+            time.sleep(size / self.SAMPLE_RATE)
+        if self.position < len(self.frames):
+            frame = self.frames[self.position]
+            self.position += 1
+            if any(frame):
+                self.last_speech_read = time.perf_counter()
+            return frame
+        return bytes(size * 2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+def make_voice_input(microphone, calibration=None, **kwargs):
+    """创建使用模拟麦克风与内存校准存储的VoiceInputModule"""
+    from modules.voice_input import VoiceInputModule
+
+    with mock.patch('modules.voice_input.sr.Microphone', return_value=microphone):
+        voice_input = VoiceInputModule(**kwargs)
+    voice_input.noise_calibration = calibration or NoiseCalibrationStore()
+    return voice_input
+
+
+class TestStreamingRecognition(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeSpeechServer(transcripts=["打开记事本", "锁屏"], end_silence_ms=300).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_socket_recognizer_interim_and_final(self):
+        """测试流式识别返回中间结果与最终结果，最终结果在语音结束后的静音时长内给出"""
+        results, errors = [], []
+        done = threading.Event()
+
+        def on_result(text, is_final):
+            results.append((text, is_final))
+            if is_final and sum(1 for _, final in results if final) == 2:
+                done.set()
+
+        recognizer = SocketStreamingRecognizer(self.server.address)
+        recognizer.start(on_result, errors.append)
+        pcm = make_pcm(0.2) + make_pcm(1.0, 440) + make_pcm(0.5) + make_pcm(0.4, 440)
+        for frame in split_frames(pcm):
+            recognizer.push_audio(frame)
+        # 第二条语句没有结尾静音，结束音频流时也应给出最终结果
+        recognizer.stop()
+
+        self.assertTrue(done.wait(2))
+        self.assertEqual(errors, [])
+        finals = [text for text, is_final in results if is_final]
+        self.assertEqual(finals, ["打开记事本", "锁屏"])
+        interims = [text for text, is_final in results[:results.index(("打开记事本", True))] if not is_final]
+        self.assertTrue(interims)
+        self.assertTrue(all("打开记事本".startswith(text) for text in interims))
+        self.assertEqual(self.server.stats["sessions"], 1)
+
+    def test_voice_input_streaming_mode(self):
+        """测试VoiceInputModule流式模式通过原有回调返回最终结果"""
+        microphone = FakeMicrophone(make_pcm(1.0) + make_pcm(0.6, 440))
+        voice_input = make_voice_input(
+            microphone,
+            recognition_mode='streaming',
+            streaming_recognizer=SocketStreamingRecognizer(self.server.address)
+        )
+
+        finals, interims = [], []
+        received = threading.Event()
+
+        def callback(text, error_message=None):
+            finals.append((text, error_message, time.perf_counter()))
+            received.set()
+
+        self.assertTrue(voice_input.start_listening(callback, interims.append))
+        try:
+            self.assertTrue(received.wait(5))
+        finally:
+            voice_input.stop_listening_input()
+
+        text, error_message, received_at = finals[0]
+        self.assertEqual((text, error_message), ("打开记事本", None))
+        self.assertTrue(interims)
+        # 停止说话后几百毫秒内给出最终结果
+        self.assertLess(received_at - microphone.last_speech_read, 0.8)
+
+    def test_streaming_results_not_blocking_recognizer(self):
+        """测试流式模式的最终结果经识别队列交给回调，较慢的回调不阻塞识别器线程"""
+        voice_input = make_voice_input(FakeMicrophone(b'', realtime=False), recognition_mode='streaming')
+        voice_input.is_listening = True
+        release = threading.Event()
+        received = []
+
+        def callback(text, error_message=None):
+            release.wait(5)
+            received.append((text, error_message))
+
+        voice_input.callback_function = callback
+        voice_input.recognition_queue.start()
+        self.addCleanup(voice_input.recognition_queue.stop)
+
+        start = time.perf_counter()
+        voice_input._on_stream_result("打开记事本", True)
+        voice_input._on_stream_result("锁", False)
+        voice_input._on_stream_error("无法理解，请重试")
+        self.assertLess(time.perf_counter() - start, 0.5)
+
+        release.set()
+        self.assertTrue(voice_input.recognition_queue.join(2))
+        self.assertEqual(received, [("打开记事本", None), (None, "无法理解，请重试")])
+        self.assertEqual(voice_input.get_status()["queue"]["processed"], 2)
+
+
+
+class TestVoiceActivityDetection(unittest.TestCase):
+    def test_detector_drops_non_speech(self):
+        """测试语音活动检测保留语音段、丢弃噪声段并统计丢弃数"""
+        vad = VoiceActivityDetector()
+        speech = make_pcm(0.3) + make_vowel(0.3) + make_vowel(0.25, f0=180) + make_pcm(0.5)
+        door_slam = make_pcm(0.3) + make_noise(0.1, 0.5, decay=0.025) + make_pcm(0.5)
+        keyboard = b''.join(make_pcm(0.08) + make_noise(0.008, 0.3, seed=i) for i in range(12))
+        fan = make_noise(1.0, 0.05)
+        hum = make_pcm(1.0, 50, amplitude=6000)
+
+        self.assertTrue(vad.is_speech(speech))
+        for noise in (door_slam, keyboard, fan, hum, make_pcm(1.0)):
+            self.assertFalse(vad.is_speech(noise))
+
+        status = vad.get_status()
+        self.assertEqual(status["segments_total"], 6)
+        self.assertEqual(status["segments_dropped"], 5)
+        self.assertGreater(status["frames_dropped"], 0)
+        self.assertGreater(status["frames_speech"], 0)
+
+    def test_phrase_mode_skips_recognition_for_noise(self):
+        """测试整句识别模式下噪声段在采集线程中丢弃，不进入识别队列、不请求识别、不触发重试提示"""
+        microphone = FakeMicrophone(b'', realtime=False)
+        backend = ScriptedBackend([("锁屏", 0.9)])
+        voice_input = make_voice_input(microphone, recognition_mode='phrase', recognizer_backend=backend)
+
+        received = []
+        with mock.patch.object(voice_input.capture, 'start') as capture_start:
+            self.assertTrue(voice_input.start_listening(lambda *args: received.append(args)))
+            audio_callback = capture_start.call_args[0][0]
+
+            audio_callback(sr.AudioData(make_noise(0.1, 0.5, decay=0.025), SAMPLE_RATE, 2))
+            self.assertTrue(voice_input.recognition_queue.join(2))
+            self.assertEqual(backend.requests, 0)
+            audio_callback(sr.AudioData(make_vowel(0.5), SAMPLE_RATE, 2))
+            self.assertTrue(voice_input.recognition_queue.join(2))
+            self.assertEqual(backend.requests, 1)
+            voice_input.stop_listening_input()
+
+        self.assertEqual(received, [("锁屏",)])
+        self.assertEqual(voice_input.get_status()["vad"]["segments_dropped"], 1)
+        self.assertEqual(voice_input.recognition_queue.get_status()["enqueued"], 1)
+
+    def test_noise_burst_does_not_evict_queued_speech(self):
+        """测试识别繁忙时的一串噪声段不占用队列名额，排队中的指令不会被挤掉"""
+        release = threading.Event()
+
+        class BlockingBackend(ScriptedBackend):
+            def _recognize(self, audio):
+                release.wait(2)
+                return super()._recognize(audio)
+
+        microphone = FakeMicrophone(b'', realtime=False)
+        backend = BlockingBackend([("打开记事本", 0.9), ("锁屏", 0.9)])
+        voice_input = make_voice_input(microphone, recognition_mode='phrase', recognizer_backend=backend)
+
+        received = []
+        with mock.patch.object(voice_input.capture, 'start') as capture_start:
+            self.assertTrue(voice_input.start_listening(lambda *args: received.append(args)))
+            audio_callback = capture_start.call_args[0][0]
+
+            # 第一条指令占住工作线程，第二条排队，随后的噪声段多于队列容量
+            audio_callback(sr.AudioData(make_vowel(0.5), SAMPLE_RATE, 2))
+            audio_callback(sr.AudioData(make_vowel(0.5, f0=180), SAMPLE_RATE, 2))
+            for i in range(voice_input.recognition_queue.max_size * 2):
+                audio_callback(sr.AudioData(make_noise(0.1, 0.5, decay=0.025, seed=i), SAMPLE_RATE, 2))
+            release.set()
+            self.assertTrue(voice_input.recognition_queue.join(2))
+            voice_input.stop_listening_input()
+
+        self.assertEqual(received, [("打开记事本",), ("锁屏",)])
+        status = voice_input.recognition_queue.get_status()
+        self.assertEqual(status["enqueued"], 2)
+        self.assertEqual(status["dropped_oldest"] + status["dropped_newest"], 0)
+
+
+
+class ScriptedBackend(RecognizerBackend):
+    """按顺序返回预设结果的识别后端，结果为异常实例时抛出"""
+    name = 'scripted'
+
+    def __init__(self, results):
+        super().__init__()
+        self.results = list(results)
+
+    def _recognize(self, audio):
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return RecognitionResult(result[0], result[1], self.name)
+
+
+class TestRecognizerBackends(unittest.TestCase):
+    def setUp(self):
+        self.audio = sr.AudioData(make_pcm(0.1), SAMPLE_RATE, 2)
+
+    def test_hybrid_prefers_confident_local_result(self):
+        """测试混合模式：本地高置信度直接采用，低置信度或无法识别时请求云端"""
+        local = ScriptedBackend([("锁屏", 0.95), ("锁屏", 0.4), sr.UnknownValueError(), ("暂停音乐", 0.5)])
+        cloud = ScriptedBackend([("所以呢", 0.9), ("打开记事本", 0.9), sr.RequestError("offline")])
+        hybrid = HybridRecognizerBackend(local, cloud, threshold=0.8)
+
+        self.assertEqual(hybrid.recognize(self.audio), RecognitionResult("锁屏", 0.95, "scripted"))
+        self.assertEqual(hybrid.recognize(self.audio).text, "所以呢")
+        self.assertEqual(hybrid.recognize(self.audio).text, "打开记事本")
+        # 云端不可用时退回本地结果
+        self.assertEqual(hybrid.recognize(self.audio).text, "暂停音乐")
+
+        status = hybrid.get_status()
+        self.assertEqual((status["local_answers"], status["cloud_escalations"]), (1, 3))
+        self.assertEqual(status["cloud"]["failures"], 1)
+
+    def test_azure_and_offline_backends(self):
+        """测试Azure结果解包与离线模型不可用时的错误"""
+        backend = AzureRecognizerBackend(key="test-key", region="eastasia", encoder=AudioEncoder('wav', SAMPLE_RATE))
+        response = mock.Mock()
+        response.json.return_value = {
+            "RecognitionStatus": "Success",
+            "NBest": [{"Display": "打开记事本。", "Confidence": 0.87}]
+        }
+        with mock.patch.object(backend._session, 'post', return_value=response) as post:
+            self.assertEqual(backend.recognize(self.audio), RecognitionResult("打开记事本。", 0.87, "azure"))
+        headers = post.call_args[1]["headers"]
+        self.assertEqual(headers["Content-Type"], "audio/wav; codecs=audio/pcm; samplerate=16000")
+        self.assertEqual(backend.get_status()["upload"]["bytes_sent"], len(post.call_args[1]["data"]))
+
+        # Azure短音频接口不接受FLAC
+        self.assertEqual(AzureRecognizerBackend(encoder=AudioEncoder('flac', SAMPLE_RATE)).encoder.encoding, 'wav')
+
+        offline = OfflineRecognizerBackend(model_path=os.path.join(os.path.dirname(__file__), 'no-such-model'))
+        self.assertFalse(offline.enabled)
+        with self.assertRaises(sr.RequestError):
+            offline.recognize(self.audio)
+        self.assertEqual(offline.get_status()["failures"], 1)
+
+    def test_compressed_upload_to_local_server(self):
+        """测试FLAC压缩上传：本地识别服务解码后识别，上传字节数少于原始PCM"""
+        audio = sr.AudioData(make_pcm(0.3) + make_vowel(0.8) + make_pcm(0.3), SAMPLE_RATE, 2)
+        server = FakeSpeechServer(transcripts=["打开记事本"]).start()
+        try:
+            backend = SocketRecognizerBackend(server.address, encoder=AudioEncoder('flac', SAMPLE_RATE))
+            self.assertEqual(backend.recognize(audio).text, "打开记事本")
+            silent = sr.AudioData(make_pcm(0.5), SAMPLE_RATE, 2)
+            with self.assertRaises(sr.UnknownValueError):
+                backend.recognize(silent)
+        finally:
+            server.stop()
+
+        upload = backend.get_status()["upload"]
+        self.assertEqual(upload["encoding"], "flac")
+        self.assertEqual(upload["uploads"], 2)
+        self.assertEqual(upload["bytes_sent"], server.stats["bytes_received"])
+        self.assertLess(upload["bytes_sent"], upload["raw_bytes"] * 0.6)
+        self.assertEqual(upload["raw_bytes"], len(audio.frame_data) + len(silent.frame_data))
+        self.assertIsNotNone(upload["avg_encode_ms"])
+        
+        # 上传失败（服务已停止）不计入原始与上传字节数
+        with self.assertRaises(sr.RequestError):
+            backend.recognize(audio)
+        failed = backend.get_status()["upload"]
+        self.assertEqual((failed["uploads"], failed["raw_bytes"], failed["bytes_sent"]),
+                         (upload["uploads"], upload["raw_bytes"], upload["bytes_sent"]))
+        self.assertEqual(failed["compression_ratio"], upload["compression_ratio"])
+
+    def test_flac_round_trip_is_lossless(self):
+        """测试FLAC编码后解码与原始PCM一致"""
+        pcm = make_noise(0.5, 0.3)
+        data = AudioEncoder('flac', SAMPLE_RATE).encode(sr.AudioData(pcm, SAMPLE_RATE, 2))
+        self.assertEqual(decode_audio(data, 'flac', SAMPLE_RATE), pcm)
+
+    @unittest.skipUnless(shutil.which('ffmpeg'), "需要ffmpeg")
+    def test_opus_upload_to_local_server(self):
+        """测试Opus低码率上传"""
+        audio = sr.AudioData(make_pcm(0.3) + make_vowel(0.8) + make_pcm(0.3), SAMPLE_RATE, 2)
+        server = FakeSpeechServer(transcripts=["锁屏"]).start()
+        try:
+            backend = SocketRecognizerBackend(server.address, encoder=AudioEncoder('opus', SAMPLE_RATE))
+            self.assertEqual(backend.recognize(audio).text, "锁屏")
+        finally:
+            server.stop()
+        upload = backend.get_status()["upload"]
+        self.assertLess(upload["bytes_sent"], upload["raw_bytes"] * 0.2)
+
+
+
+class TestWakeWord(unittest.TestCase):
+    def make_spotter(self):
+        spotter = WakeWordSpotter(sample_rate=SAMPLE_RATE)
+        self.assertTrue(spotter.add_template(make_pcm(0.2) + make_word(WAKE_WORD) + make_pcm(0.2)))
+        return spotter
+
+    def test_spotter_detects_only_wake_word(self):
+        """测试唤醒词检测：语速稍慢、带噪声的唤醒词能检测到，其他声音不会唤醒"""
+        spotter = self.make_spotter()
+        stream = (make_pcm(0.5) + make_word(OTHER_WORD) + make_pcm(0.5)
+                  + make_word(WAKE_WORD, stretch=1.15, noise=0.01) + make_pcm(0.5)
+                  + make_word(OTHER_WORD, stretch=0.9) + make_pcm(0.5))
+
+        detections = []
+        for index, frame in enumerate(split_frames(stream)):
+            if spotter.process(frame):
+                detections.append(index * CHUNK / SAMPLE_RATE)
+
+        self.assertEqual(len(detections), 1)
+        # 在唤醒词结束附近检测到（唤醒词位于1.1~1.79秒）
+        self.assertTrue(1.1 < detections[0] < 2.0)
+        status = spotter.get_status()
+        self.assertEqual(status["detections"], 1)
+        self.assertGreater(status["cpu_time_s"], 0)
+        # CPU开销远低于实时
+        self.assertLess(status["real_time_factor"], 0.2)
+
+    def test_voice_input_wake_word_gate(self):
+        """测试唤醒词模式只识别唤醒后的指令，唤醒后无指令记为误唤醒"""
+        command = make_vowel(0.6)
+        audio = (make_pcm(0.5) + make_word(OTHER_WORD) + make_pcm(0.3) + command + make_pcm(1.0)
+                 + make_word(WAKE_WORD) + make_pcm(0.2) + command + make_pcm(1.5)
+                 + make_word(WAKE_WORD) + make_pcm(6.0))
+        microphone = FakeMicrophone(make_pcm(1.0) + audio, realtime=False)
+        backend = ScriptedBackend([("锁屏", 0.9)])
+        voice_input = make_voice_input(microphone, recognition_mode='phrase', recognizer_backend=backend)
+        voice_input.wake_word = self.make_spotter()
+
+        received = []
+        self.assertTrue(voice_input.start_listening(lambda *args: received.append(args)))
+        try:
+            deadline = time.time() + 10
+            while microphone.position < len(microphone.frames) and time.time() < deadline:
+                time.sleep(0.05)
+            time.sleep(0.2)
+        finally:
+            voice_input.stop_listening_input()
+
+        # 唤醒前的说话不识别，只识别唤醒后的一条指令
+        self.assertEqual(received, [("锁屏",)])
+        self.assertEqual(backend.requests, 1)
+        status = voice_input.get_status()["wake_word"]
+        self.assertEqual(status["detections"], 2)
+        self.assertEqual(status["false_accepts"], 1)
+
+
+
+class TestRecognitionQueue(unittest.TestCase):
+    def make_queue(self, policy, **kwargs):
+        self.release = threading.Event()
+        self.handled = []
+
+        def handler(item):
+            self.release.wait(5)
+            self.handled.append(item)
+
+        work_queue = BoundedWorkQueue(handler, max_size=2, workers=1, overflow_policy=policy, **kwargs)
+        work_queue.start()
+        self.addCleanup(work_queue.stop)
+        # 第一个任务被工作线程取走并阻塞，之后的任务在队列中排队
+        work_queue.put(0)
+        self.assertTrue(self.wait_until(lambda: work_queue.get_status()["busy"] == 1))
+        return work_queue
+
+    def wait_until(self, predicate, timeout=2):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if predicate():
+                return True
+            time.sleep(0.01)
+        return False
+
+    def test_overflow_policies(self):
+        """测试队列满时丢弃最早/丢弃最新两种策略"""
+        for policy, expected, dropped_key in (('drop_oldest', [0, 3, 4], "dropped_oldest"),
+                                              ('drop_newest', [0, 1, 2], "dropped_newest")):
+            work_queue = self.make_queue(policy)
+            accepted = [work_queue.put(item) for item in (1, 2, 3, 4)]
+            status = work_queue.get_status()
+            self.assertEqual((status["depth"], status["max_depth"], status[dropped_key]), (2, 2, 2))
+            self.assertEqual(accepted, [True] * 4 if policy == 'drop_oldest' else [True, True, False, False])
+
+            self.release.set()
+            self.assertTrue(work_queue.join(2))
+            self.assertEqual(self.handled, expected)
+            self.assertEqual(work_queue.get_status()["processed"], 3)
+
+    def test_block_policy(self):
+        """测试block策略：提交方等待空位，超时后丢弃新任务"""
+        work_queue = self.make_queue('block', block_timeout=0.1)
+        work_queue.put(1)
+        work_queue.put(2)
+        self.assertFalse(work_queue.put(3))
+        status = work_queue.get_status()
+        self.assertEqual(status["dropped_newest"], 1)
+        self.assertGreaterEqual(status["blocked_time_s"], 0.1)
+
+        work_queue.block_timeout = None
+        threading.Timer(0.1, self.release.set).start()
+        # 工作线程处理完后有了空位，提交成功
+        self.assertTrue(work_queue.put(4))
+        self.assertTrue(work_queue.join(2))
+        self.assertEqual(self.handled, [0, 1, 2, 4])
+
+    def test_capture_not_blocked_by_slow_recognition(self):
+        """测试识别较慢时录音回调立即返回"""
+        release = threading.Event()
+
+        class SlowBackend(ScriptedBackend):
+            def _recognize(self, audio):
+                release.wait(5)
+                return super()._recognize(audio)
+
+        microphone = FakeMicrophone(b'', realtime=False)
+        backend = SlowBackend([("锁屏", 0.9)] * 3)
+        voice_input = make_voice_input(microphone, recognition_mode='phrase', recognizer_backend=backend)
+
+        received = []
+        with mock.patch.object(voice_input.capture, 'start') as capture_start:
+            self.assertTrue(voice_input.start_listening(lambda *args: received.append(args)))
+            audio_callback = capture_start.call_args[0][0]
+            start = time.perf_counter()
+            for _ in range(3):
+                audio_callback(sr.AudioData(make_vowel(0.5), SAMPLE_RATE, 2))
+            self.assertLess(time.perf_counter() - start, 0.5)
+
+            release.set()
+            self.assertTrue(voice_input.recognition_queue.join(2))
+            voice_input.stop_listening_input()
+
+        self.assertEqual(received, [("锁屏",)] * 3)
+        status = voice_input.get_status()["queue"]
+        self.assertEqual((status["enqueued"], status["processed"]), (3, 3))
+
+
+class TestAudioCapture(unittest.TestCase):
+    def test_ring_buffer_views(self):
+        """测试环形缓冲区：读取返回共享内存的视图，覆盖后的块不可再读"""
+        ring = ChunkRingBuffer(slots=3, slot_size=4)
+        for value in range(4):
+            ring.write(bytes([value]) * 4)
+        ring.write(b'\x09\x09')  # 不足一个槽位的块
+
+        self.assertEqual(ring.oldest_seq, 2)
+        view = ring.chunk(4)
+        self.assertIsInstance(view, memoryview)
+        self.assertTrue(view.readonly)
+        self.assertIs(view.obj, ring._buffer)
+        self.assertEqual(view.tobytes(), b'\x09\x09')
+        self.assertEqual(ring.read(2, 5), b'\x02' * 4 + b'\x03' * 4 + b'\x09\x09')
+        with self.assertRaises(IndexError):
+            ring.chunk(1)
+        with self.assertRaises(ValueError):
+            ring.write(bytes(5))
+
+    def capture_segment(self, pcm, pre_roll_ms):
+        recognizer = sr.Recognizer()
+        recognizer.energy_threshold = 300
+        recognizer.dynamic_energy_threshold = False
+        capture = AudioCapture(FakeMicrophone(pcm, realtime=False), recognizer, pre_roll_ms=pre_roll_ms,
+                               buffer_seconds=5, phrase_time_limit=3)
+        segments, chunk_types = [], set()
+        done = threading.Event()
+
+        def on_segment(audio):
+            segments.append(audio)
+            done.set()
+
+        capture.start(on_segment, on_chunk=lambda view: chunk_types.add(type(view)))
+        self.assertTrue(done.wait(5))
+        capture.stop()
+        self.assertEqual(chunk_types, {memoryview})
+        return segments[0], capture.get_status()
+
+    def test_pre_roll_keeps_quiet_onset(self):
+        """测试预录音：能量阈值以下的起始音节包含在语句中"""
+        onset = make_pcm(0.25, frequency=200, amplitude=200)  # 低于能量阈值的首字
+        word = make_vowel(0.6)
+        pcm = make_pcm(1.0) + onset + word + make_pcm(1.5)
+
+        clipped, _ = self.capture_segment(pcm, pre_roll_ms=0)
+        self.assertIn(word, clipped.frame_data)
+        self.assertNotIn(onset[:len(onset) // 2], clipped.frame_data)
+
+        audio, status = self.capture_segment(pcm, pre_roll_ms=300)
+        self.assertIn(onset + word, audio.frame_data)
+        self.assertEqual(status["segments"], 1)
+        self.assertEqual(status["bytes_copied"], len(audio.frame_data))
+        self.assertEqual(status["buffer_bytes"], math.ceil(5 * SAMPLE_RATE / CHUNK) * CHUNK * 2)
+
+
+class TestNoiseCalibration(unittest.TestCase):
+    def test_cached_calibration_skips_startup_sampling(self):
+        """测试同一设备再次启动时复用校准结果，启动流程只校准一次"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "noise_calibration.json")
+
+        microphone = FakeMicrophone(make_noise(2.0, 0.01), realtime=False)
+        voice_input = make_voice_input(microphone, calibration=NoiseCalibrationStore(path))
+        with mock.patch.object(voice_input.recognizer, 'adjust_for_ambient_noise',
+                               wraps=voice_input.recognizer.adjust_for_ambient_noise) as adjust, \
+                mock.patch.object(voice_input.capture, 'start'):
+            self.assertTrue(voice_input.setup_microphone())
+            self.assertTrue(voice_input.start_listening(lambda *args: None))
+            voice_input.stop_listening_input()
+        self.assertEqual(adjust.call_count, 1)
+        self.assertEqual(voice_input.get_status()["calibration"]["source"], "measured")
+        threshold = voice_input.recognizer.energy_threshold
+
+        microphone = FakeMicrophone(make_noise(2.0, 0.01), realtime=False)
+        restarted = make_voice_input(microphone, calibration=NoiseCalibrationStore(path))
+        self.assertTrue(restarted.setup_microphone())
+        self.assertEqual(microphone.position, 0)  # 没有阻塞采样环境噪声
+        status = restarted.get_status()["calibration"]
+        self.assertEqual((status["device"], status["source"]), ("FakeMicrophone", "cached"))
+        self.assertAlmostEqual(restarted.recognizer.energy_threshold, threshold, delta=0.01)
+
+        # 校准结果过期后重新校准
+        expired = make_voice_input(FakeMicrophone(b'', realtime=False),
+                                   calibration=NoiseCalibrationStore(path, max_age=0))
+        self.assertTrue(expired.setup_microphone())
+        self.assertEqual(expired.calibration_source, "measured")
+
+    def test_threshold_follows_room_noise_while_idle(self):
+        """测试空闲时在实时音频上持续校准，阈值随环境噪声变化并写回"""
+        calibration = NoiseCalibrationStore(save_interval=0)
+        for start_threshold in (1000, 120):
+            calibration.update("FakeMicrophone", start_threshold)
+            microphone = FakeMicrophone(make_noise(20.0, 0.003), realtime=False)  # 均方根约100
+            voice_input = make_voice_input(microphone, calibration=calibration, recognition_mode='phrase',
+                                           recognizer_backend=ScriptedBackend([]))
+            self.assertTrue(voice_input.start_listening(lambda *args: None))
+            try:
+                deadline = time.time() + 5
+                while microphone.position < 160 and time.time() < deadline:
+                    time.sleep(0.01)
+                stored = calibration.get("FakeMicrophone")
+            finally:
+                voice_input.stop_listening_input()
+            self.assertEqual(voice_input.calibration_source, "cached")
+            self.assertAlmostEqual(stored, 150, delta=30)
+
+
+class TestVirtualMicrophone(unittest.TestCase):
+    def test_scripted_playback_speed_and_timeline(self):
+        """测试虚拟麦克风按脚本回放：加速节流、片段时间线与查找片段"""
+        word = make_vowel(0.5)
+        microphone = VirtualMicrophone([0.3, {"pcm": word, "transcript": "锁屏"}, 0.2], speed=4, tail_silence=0.5)
+        self.assertAlmostEqual(microphone.duration, 1.5, places=3)
+        self.assertEqual(microphone.device_key, "virtual")
+
+        start = time.perf_counter()
+        pcm = b''
+        while not microphone.finished.is_set():
+            pcm += microphone.stream.read(CHUNK)
+        elapsed = time.perf_counter() - start
+        self.assertAlmostEqual(elapsed, 1.5 / 4, delta=0.15)
+
+        clip = microphone.clips[0]
+        self.assertEqual((clip["start_s"], clip["end_s"]), (0.3, 0.8))
+        self.assertAlmostEqual(clip["ended_at"] - clip["started_at"], 0.5 / 4, delta=0.1)
+        self.assertIs(microphone.find_clip(pcm), clip)
+        self.assertIsNone(microphone.find_clip(pcm[:len(pcm) // 3]))
+
+    def test_pacing_does_not_hold_lock(self):
+        """测试节流等待期间仍可查询回放状态"""
+        microphone = VirtualMicrophone([1.0], speed=1, tail_silence=0)
+        reader = threading.Thread(target=microphone.stream.read, args=(SAMPLE_RATE // 2,))
+        reader.start()
+        time.sleep(0.05)
+        start = time.perf_counter()
+        self.assertEqual(microphone.get_status()["position_s"], 0.5)
+        self.assertLess(time.perf_counter() - start, 0.1)
+        self.assertTrue(reader.is_alive())
+        reader.join(2)
+
+    def test_headless_assistant_end_to_end(self):
+        """测试无界面助手回放会话：指令按顺序执行，并统计端到端延迟"""
+        from benchmarks.e2e_benchmark import run_benchmark
+
+        report = run_benchmark(speed=20, recognition_latency=0.05)
+        self.assertTrue(report["completed"])
+        self.assertEqual((report["clips"], report["recognized"]), (5, 5))
+        self.assertEqual(report["command_accuracy"], 1.0)
+        for utterance in report["utterances"]:
+            # 端点检测需要约0.8秒（音频时间）的停顿，20倍速下约40毫秒
+            self.assertGreater(utterance["endpoint_ms"], 20)
+            self.assertGreater(utterance["end_to_end_ms"], utterance["endpoint_ms"] + 40)
+        self.assertEqual(report["vad"]["segments_dropped"], 0)
+
+
+class DurationBackend(RecognizerBackend):
+    """以片段时长作为识别文本的后端，fail_once 中的时长第一次请求时失败"""
+    name = 'duration'
+
+    def __init__(self, fail_once=()):
+        super().__init__()
+        self.fail_once = set(fail_once)
+
+    def _recognize(self, audio):
+        duration = round(len(audio.frame_data) / audio.sample_rate / audio.sample_width, 1)
+        with self._lock:
+            if duration in self.fail_once:
+                self.fail_once.discard(duration)
+                raise sr.RequestError("service unavailable")
+        return RecognitionResult(f"{duration}秒", 0.9, self.name)
+
+
+class TestBatchTranscription(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write_wav(self, name, pcm):
+        path = os.path.join(self.directory, name)
+        with wave.open(path, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(SAMPLE_RATE)
+            wav.writeframes(pcm)
+        return path
+
+    def test_split_at_silence(self):
+        """测试静音切分：短停顿不切开，长语音段强制切开并带重叠"""
+        pcm = (make_pcm(1.0) + make_vowel(0.5) + make_pcm(0.2) + make_vowel(0.3) + make_pcm(1.0)
+               + make_vowel(2.5) + make_pcm(1.0))
+        chunks = [(start / SAMPLE_RATE, end / SAMPLE_RATE)
+                  for start, end in split_at_silence(pcm, SAMPLE_RATE, max_chunk_s=1.5, overlap_s=0.2)]
+
+        self.assertEqual(len(chunks), 3)
+        self.assertAlmostEqual(chunks[0][0], 0.8, delta=0.05)
+        self.assertAlmostEqual(chunks[0][1], 2.2, delta=0.05)
+        # 2.5秒的语音切为两段，相邻片段重叠0.4秒
+        self.assertAlmostEqual(chunks[1][0], 2.8, delta=0.05)
+        self.assertAlmostEqual(chunks[1][1] - chunks[2][0], 0.4, delta=0.01)
+        self.assertAlmostEqual(chunks[2][1], 5.7, delta=0.05)
+        self.assertEqual(split_at_silence(make_pcm(1.0), SAMPLE_RATE), [])
+
+    def test_transcribe_directory_and_resume(self):
+        """测试目录批量转写：结果写入JSON Lines，失败的片段在续转时重做，已完成的跳过"""
+        silence = make_pcm(0.6)
+        self.write_wav("a.wav", silence + make_vowel(0.6) + silence + make_vowel(1.0) + silence)
+        os.makedirs(os.path.join(self.directory, "sub"))
+        self.write_wav(os.path.join("sub", "b.wav"), silence + make_vowel(1.4) + silence)
+        output = os.path.join(self.directory, "transcripts.jsonl")
+
+        backend = DurationBackend(fail_once={1.4})
+        transcriber = BatchTranscriber(backend, max_workers=3, rate_limit=0, overlap_s=0.2)
+        summary = transcriber.transcribe([self.directory], output)
+        self.assertEqual((summary["files"], summary["transcribed"], summary["failed"]), (2, 2, 1))
+
+        # 模拟中断：最后一行只写了一半
+        with open(output, 'a', encoding='utf-8') as f:
+            f.write('{"file": "a.wav", "chu')
+        summary = transcriber.transcribe([self.directory], output)
+        self.assertEqual((summary["skipped"], summary["transcribed"], summary["failed"]), (2, 1, 0))
+        self.assertEqual(backend.get_status()["requests"], 4)
+
+        with open(output, 'r', encoding='utf-8') as f:
+            records = [json.loads(line) for line in f if line.strip().endswith('}')]
+        done = sorted((os.path.basename(r["file"]), r["chunk"], r["text"]) for r in records if not r["error"])
+        self.assertEqual(done, [("a.wav", 0, "1.0秒"), ("a.wav", 1, "1.4秒"), ("b.wav", 0, "1.8秒")])
+        self.assertEqual(len(load_completed(output)), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
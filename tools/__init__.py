@@ -0,0 +1 @@
+# 开发与测试工具包
@@ -0,0 +1,195 @@
+"""
+本地模拟流式语音识别服务
+按 modules/streaming_recognizer.py 中的socket协议接收PCM音频（或整段WAV/FLAC/Opus上传），基于能量做端点检测，
+说话过程中返回预设文本的前缀作为中间结果，检测到语句结束后返回完整文本作为最终结果
+
+用法：python -m tools.fake_speech_server [--port 8766] [--transcript 打开记事本 --transcript 锁屏]
+然后设置环境变量 RECOGNITION_MODE=streaming STREAMING_RECOGNIZER=socket，
+或整句模式下 RECOGNIZER_BACKEND=socket UPLOAD_ENCODING=flac
+"""
+import os
+import sys
+import json
+import socket
+import argparse
+import logging
+import itertools
+import threading
+import socketserver
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from modules.audio_encoding import decode_audio
+from modules.streaming_recognizer import FRAME_HEADER
+from utils.audio_utils import pcm_rms
+
+logger = logging.getLogger(__name__)
+
+
+class FakeSpeechServer:
+    """
+    模拟流式识别服务
+    transcripts: 依次作为每条语句识别结果的文本（循环使用）
+    end_silence_ms: 语音后连续静音超过该时长即判定语句结束
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, transcripts=None, energy_threshold=500,
+                 end_silence_ms=300, interim_interval_ms=200):
+        self.transcripts = itertools.cycle(transcripts or ["打开记事本"])
+        self.energy_threshold = energy_threshold
+        self.end_silence_ms = end_silence_ms
+        self.interim_interval_ms = interim_interval_ms
+        self._lock = threading.Lock()
+        self.stats = {"sessions": 0, "frames": 0, "bytes_received": 0, "utterances": 0}
+
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                server._handle_session(self.rfile, self.connection)
+
+        self.tcp_server = socketserver.ThreadingTCPServer((host, port), Handler, bind_and_activate=False)
+        self.tcp_server.allow_reuse_address = True
+        self.tcp_server.daemon_threads = True
+        self.tcp_server.server_bind()
+        self.tcp_server.server_activate()
+        self._thread = None
+
+    @property
+    def address(self):
+        """供 SocketStreamingRecognizer 使用的服务地址"""
+        host, port = self.tcp_server.server_address[:2]
+        return f"{host}:{port}"
+
+    def start(self):
+        """在后台线程中启动服务"""
+        self._thread = threading.Thread(target=self.tcp_server.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"模拟流式识别服务已启动：{self.address}")
+        return self
+
+    def stop(self):
+        """停止服务"""
+        self.tcp_server.shutdown()
+        self.tcp_server.server_close()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _next_transcript(self):
+        with self._lock:
+            self.stats["utterances"] += 1
+            return next(self.transcripts)
+
+    def _read_frames(self, rfile):
+        """读取长度前缀帧，直到零长度帧或连接关闭"""
+        while True:
+            size_data = rfile.read(FRAME_HEADER.size)
+            if len(size_data) < FRAME_HEADER.size:
+                return
+            size = FRAME_HEADER.unpack(size_data)[0]
+            if size == 0:
+                return
+            frame = rfile.read(size)
+            with self._lock:
+                self.stats["frames"] += 1
+                self.stats["bytes_received"] += len(frame)
+            yield frame
+
+    def _frames(self, rfile, encoding, sample_rate, bytes_per_ms):
+        """
+        按帧产出PCM音频
+        encoding 为 pcm 时逐帧透传；为 wav/flac/opus 时接收完整段音频后解码，再按20毫秒切帧
+        """
+        if encoding == 'pcm':
+            yield from self._read_frames(rfile)
+            return
+        pcm = decode_audio(b''.join(self._read_frames(rfile)), encoding, sample_rate)
+        step = int(bytes_per_ms * 20)
+        for offset in range(0, len(pcm), step):
+            yield pcm[offset:offset + step]
+
+    def _handle_session(self, rfile, connection):
+        """处理一个识别会话"""
+        with self._lock:
+            self.stats["sessions"] += 1
+
+        def send(message):
+            connection.sendall(json.dumps(message, ensure_ascii=False).encode('utf-8') + b'\n')
+
+        try:
+            header = json.loads(rfile.readline() or b'{}')
+            sample_rate = header.get("sample_rate", 16000)
+            sample_width = header.get("sample_width", 2)
+            bytes_per_ms = sample_rate * sample_width / 1000
+
+            stream_ms = 0.0  # 已接收音频的时长
+            speech_ms = 0.0  # 当前语句中语音帧的累计时长
+            silence_ms = 0.0
+            last_interim_ms = 0.0
+            transcript = None
+
+            for frame in self._frames(rfile, header.get("encoding", "pcm"), sample_rate, bytes_per_ms):
+                frame_ms = len(frame) / bytes_per_ms
+                stream_ms += frame_ms
+
+                if pcm_rms(frame, sample_width) >= self.energy_threshold:
+                    if transcript is None:
+                        transcript = self._next_transcript()
+                    speech_ms += frame_ms
+                    silence_ms = 0.0
+                    if speech_ms - last_interim_ms >= self.interim_interval_ms:
+                        # 中间结果为预设文本的前缀，随语音时长增长（每个字约200毫秒）
+                        length = min(len(transcript) - 1, max(1, int(speech_ms / 200)))
+                        send({"type": "interim", "text": transcript[:length], "offset_ms": round(stream_ms)})
+                        last_interim_ms = speech_ms
+                elif transcript is not None:
+                    silence_ms += frame_ms
+                    if silence_ms >= self.end_silence_ms:
+                        send({"type": "final", "text": transcript, "offset_ms": round(stream_ms)})
+                        transcript, speech_ms, silence_ms, last_interim_ms = None, 0.0, 0.0, 0.0
+
+            # 音频结束时给出未完成语句的最终结果
+            if transcript is not None:
+                send({"type": "final", "text": transcript, "offset_ms": round(stream_ms)})
+        except RuntimeError as e:
+            send({"type": "error", "message": str(e)})
+        except (OSError, ValueError) as e:
+            logger.debug(f"识别会话异常结束：{e}")
+        finally:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="本地模拟流式语音识别服务")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=8766, help="监听端口")
+    parser.add_argument("--transcript", action="append", help="作为识别结果返回的文本（可多次指定，循环使用）")
+    parser.add_argument("--energy-threshold", type=float, default=500, help="语音帧的能量阈值")
+    parser.add_argument("--end-silence-ms", type=int, default=300, help="判定语句结束的静音时长（毫秒）")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    server = FakeSpeechServer(
+        host=args.host,
+        port=args.port,
+        transcripts=args.transcript,
+        energy_threshold=args.energy_threshold,
+        end_silence_ms=args.end_silence_ms
+    )
+    print(f"模拟流式识别服务：{server.address}")
+    try:
+        server.tcp_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.tcp_server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
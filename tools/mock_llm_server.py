@@ -0,0 +1,291 @@
+"""
+本地模拟LLM服务
+实现OpenAI兼容的聊天补全接口（含流式响应），支持可配置的延迟分布、预设响应、错误率与超时，
+用于在离线环境下对指令解析进行压测
+
+用法：python -m tools.mock_llm_server [--port 8765] [--latency lognormal --latency-mean 0.8] [--responses 语料.jsonl]
+然后设置环境变量 LLM_BASE_URL=http://127.0.0.1:8765/v1
+"""
+import sys
+import json
+import time
+import math
+import random
+import argparse
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESPONSE = {"command": None, "parameters": {}, "confidence": 0, "error": "无法理解的指令"}
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+STREAM_CHUNK_SIZE = 4
+
+
+class LatencyModel:
+    """
+    延迟分布
+    fixed: 固定为mean；uniform: 在 mean±spread 内均匀分布；lognormal: 均值为mean、对数标准差为spread的长尾分布
+    """
+
+    def __init__(self, distribution="fixed", mean=0.0, spread=0.0, seed=None):
+        if distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"不支持的延迟分布：{distribution}")
+        self.distribution = distribution
+        self.mean = mean
+        self.spread = spread
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self):
+        """采样一次延迟（秒）"""
+        if self.mean <= 0:
+            return 0.0
+        with self._lock:
+            if self.distribution == "uniform":
+                return max(0.0, self._rng.uniform(self.mean - self.spread, self.mean + self.spread))
+            if self.distribution == "lognormal":
+                # 使分布均值等于mean
+                mu = math.log(self.mean) - self.spread ** 2 / 2
+                return self._rng.lognormvariate(mu, self.spread)
+            return self.mean
+
+
+class MockLLMServer:
+    """
+    模拟LLM服务
+    responses: 指令文本到响应内容（字典或字符串）的映射，按提示词中“指令：”一行匹配
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, responses=None, latency=None,
+                 error_rate=0.0, timeout_rate=0.0, hang_time=60.0, seed=None):
+        self.responses = dict(responses or {})
+        self.latency = latency or LatencyModel()
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.hang_time = hang_time
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self.stats = {"requests": 0, "stream_requests": 0, "matched": 0, "errors": 0, "timeouts": 0}
+
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        """供OpenAI客户端使用的服务地址"""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        """在后台线程中启动服务"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"模拟LLM服务已启动：{self.base_url}")
+        return self
+
+    def stop(self):
+        """停止服务"""
+        self._stopped.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def serve_forever(self):
+        """在当前线程中运行服务"""
+        logger.info(f"模拟LLM服务已启动：{self.base_url}")
+        try:
+            self.httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.httpd.server_close()
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _roll(self):
+        """按错误率与超时率决定本次请求的结果：ok / error / timeout"""
+        with self._lock:
+            value = self._rng.random()
+        if value < self.timeout_rate:
+            return "timeout"
+        if value < self.timeout_rate + self.error_rate:
+            return "error"
+        return "ok"
+
+    def _content_for(self, messages):
+        """根据提示词中的指令文本查找预设响应"""
+        prompt = messages[-1].get("content", "") if messages else ""
+        voice_text = prompt.split("指令：", 1)[1].splitlines()[0].strip() if "指令：" in prompt else prompt.strip()
+        response = self.responses.get(voice_text)
+        if response is None:
+            response = DEFAULT_RESPONSE
+        else:
+            self._count("matched")
+        return response if isinstance(response, str) else json.dumps(response, ensure_ascii=False)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+            def _send_json(self, status, data):
+                body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path.rstrip("/") == "/v1/models":
+                    self._send_json(200, {"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "mock"}]})
+                elif self.path.rstrip("/") == "/stats":
+                    with server._lock:
+                        self._send_json(200, dict(server.stats))
+                else:
+                    self._send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+
+            def do_POST(self):
+                if self.path.rstrip("/") != "/v1/chat/completions":
+                    self._send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    request = json.loads(self.rfile.read(length) or b"{}")
+                except (ValueError, json.JSONDecodeError):
+                    self._send_json(400, {"error": {"message": "invalid json", "type": "invalid_request_error"}})
+                    return
+
+                server._count("requests")
+                outcome = server._roll()
+                if outcome == "timeout":
+                    # 挂起连接，模拟无响应的上游
+                    server._count("timeouts")
+                    server._stopped.wait(server.hang_time)
+                    self.close_connection = True
+                    return
+
+                time.sleep(server.latency.sample())
+                if outcome == "error":
+                    server._count("errors")
+                    self._send_json(500, {"error": {"message": "mock server error", "type": "server_error"}})
+                    return
+
+                content = server._content_for(request.get("messages") or [])
+                model = request.get("model", "mock")
+                if request.get("stream"):
+                    server._count("stream_requests")
+                    self._stream(model, content)
+                else:
+                    self._send_json(200, {
+                        "id": "chatcmpl-mock",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [{
+                            "index": 0,
+                            "message": {"role": "assistant", "content": content},
+                            "finish_reason": "stop"
+                        }],
+                        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+                    })
+
+            def _stream(self, model, content):
+                """以SSE格式分块返回内容"""
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+
+                def event(delta, finish_reason=None):
+                    chunk = {
+                        "id": "chatcmpl-mock",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode('utf-8'))
+                    self.wfile.flush()
+
+                try:
+                    event({"role": "assistant", "content": ""})
+                    for start in range(0, len(content), STREAM_CHUNK_SIZE):
+                        event({"content": content[start:start + STREAM_CHUNK_SIZE]})
+                    event({}, "stop")
+                    self.wfile.write(b"data: [DONE]\n\n")
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    # 客户端提前关闭了流
+                    pass
+
+        return Handler
+
+
+def load_responses(path):
+    """加载预设响应：JSON对象（指令文本 -> 响应）或基准测试语料（JSON Lines）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith(".jsonl"):
+            responses = {}
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if entry.get("command"):
+                    responses[entry["text"]] = {
+                        "command": entry["command"],
+                        "parameters": entry.get("parameters") or {},
+                        "confidence": 0.9
+                    }
+            return responses
+        return json.load(f)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="本地模拟LLM服务（OpenAI兼容接口）")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=8765, help="监听端口")
+    parser.add_argument("--responses", help="预设响应文件（JSON对象或语料JSON Lines）")
+    parser.add_argument("--latency", choices=LATENCY_DISTRIBUTIONS, default="fixed", help="延迟分布")
+    parser.add_argument("--latency-mean", type=float, default=0.0, help="平均延迟（秒）")
+    parser.add_argument("--latency-spread", type=float, default=0.0,
+                        help="延迟离散程度（uniform为半宽秒数，lognormal为对数标准差）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回500错误的比例")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="挂起不响应的比例")
+    parser.add_argument("--hang-time", type=float, default=60.0, help="挂起请求的持续时间（秒）")
+    parser.add_argument("--seed", type=int, help="随机种子")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    server = MockLLMServer(
+        host=args.host,
+        port=args.port,
+        responses=load_responses(args.responses) if args.responses else None,
+        latency=LatencyModel(args.latency, args.latency_mean, args.latency_spread, args.seed),
+        error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate,
+        hang_time=args.hang_time,
+        seed=args.seed
+    )
+    print(f"模拟LLM服务：{server.base_url}（预设响应 {len(server.responses)} 条）")
+    server.serve_forever()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,43 @@
+"""
+录制唤醒词模板
+依次录制几遍唤醒词，保存为16位单声道WAV，供 modules/wake_word.py 匹配使用
+
+用法：python -m tools.record_wake_word [--count 3] [--output models/wake_word]
+"""
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import speech_recognition as sr
+from config.settings import SAMPLE_RATE, WAKE_WORD_TEMPLATE_DIR
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="录制唤醒词模板")
+    parser.add_argument("--count", type=int, default=3, help="录制遍数")
+    parser.add_argument("--output", default=WAKE_WORD_TEMPLATE_DIR, help="模板保存目录")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.output):
+        os.makedirs(args.output)
+
+    recognizer = sr.Recognizer()
+    with sr.Microphone(sample_rate=SAMPLE_RATE) as source:
+        print("正在适应环境噪声，请保持安静...")
+        recognizer.adjust_for_ambient_noise(source, duration=1)
+        start = len([name for name in os.listdir(args.output) if name.endswith('.wav')])
+        for index in range(args.count):
+            input(f"[{index + 1}/{args.count}] 按回车后说出唤醒词...")
+            audio = recognizer.listen(source, timeout=5, phrase_time_limit=3)
+            path = os.path.join(args.output, f"wake_word_{start + index + 1}.wav")
+            with open(path, 'wb') as f:
+                f.write(audio.get_wav_data(convert_rate=SAMPLE_RATE, convert_width=2))
+            print(f"已保存：{path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
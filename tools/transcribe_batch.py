@@ -0,0 +1,65 @@
+"""
+批量转写录音
+将录音文件或目录（WAV/FLAC/AIFF）在静音处切分，并发识别后逐条写入JSON Lines；
+再次运行同一命令时跳过已完成的片段，只重做未完成或出错的部分
+
+用法：python -m tools.transcribe_batch 录音目录 [更多文件...] [--output transcripts.jsonl] [--workers 4]
+"""
+import os
+import sys
+import json
+import argparse
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from config.settings import (
+    BATCH_TRANSCRIBE_WORKERS, BATCH_TRANSCRIBE_RATE_LIMIT, BATCH_CHUNK_MAX_SECONDS, BATCH_MIN_SILENCE_SECONDS,
+    BATCH_CHUNK_OVERLAP_SECONDS, RECOGNIZER_BACKEND
+)
+from modules.batch_transcriber import BatchTranscriber
+from modules.recognizer_backend import create_recognizer_backend
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="批量转写录音文件")
+    parser.add_argument("paths", nargs="+", help="录音文件或目录")
+    parser.add_argument("--output", default="transcripts.jsonl", help="结果输出路径（JSON Lines）")
+    parser.add_argument("--backend", default=RECOGNIZER_BACKEND, help="识别后端：azure/socket/offline/hybrid")
+    parser.add_argument("--workers", type=int, default=BATCH_TRANSCRIBE_WORKERS, help="并发识别线程数")
+    parser.add_argument("--rate-limit", type=float, default=BATCH_TRANSCRIBE_RATE_LIMIT,
+                        help="每秒最多发出的识别请求数（0表示不限流）")
+    parser.add_argument("--max-chunk", type=float, default=BATCH_CHUNK_MAX_SECONDS, help="片段最长时长（秒）")
+    parser.add_argument("--min-silence", type=float, default=BATCH_MIN_SILENCE_SECONDS, help="切分点的最短静音（秒）")
+    parser.add_argument("--overlap", type=float, default=BATCH_CHUNK_OVERLAP_SECONDS, help="片段重叠时长（秒）")
+    parser.add_argument("--no-resume", action="store_true", help="忽略已有结果，重新转写全部片段")
+    parser.add_argument("--quiet", action="store_true", help="不在终端打印每个片段的结果")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    def print_record(record):
+        if args.quiet:
+            return
+        position = f"{record['file']}#{record['chunk']}"
+        if record.get("error"):
+            print(f"[失败] {position}：{record['error']}")
+        else:
+            print(f"[{record['start']:.1f}s] {position}：{record['text']}")
+
+    transcriber = BatchTranscriber(
+        recognizer_backend=create_recognizer_backend(args.backend),
+        max_workers=args.workers,
+        rate_limit=args.rate_limit,
+        max_chunk_s=args.max_chunk,
+        min_silence_s=args.min_silence,
+        overlap_s=args.overlap
+    )
+    summary = transcriber.transcribe(args.paths, args.output, resume=not args.no_resume, on_record=print_record)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""
+音频处理工具模块
+"""
+import io
+import sys
+import math
+import wave
+import array
+
+
+def pcm_rms(frame, sample_width=2):
+    """计算16位PCM帧的均方根能量（与speech_recognition的energy_threshold同一量纲）"""
+    if sample_width != 2 or len(frame) < 2:
+        return 0.0
+    samples = array.array('h')
+    samples.frombytes(frame[:len(frame) - len(frame) % 2])  # 支持bytes与memoryview
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    return math.sqrt(sum(sample * sample for sample in samples) / len(samples))
+
+
+def adapt_energy_threshold(recognizer, energy, seconds):
+    """
+    按一段非语音音频的能量更新识别器的动态能量阈值（与speech_recognition的动态阈值算法一致），
+    阈值逐渐向环境噪声能量的 dynamic_energy_ratio 倍收敛
+    """
+    damping = recognizer.dynamic_energy_adjustment_damping ** seconds
+    target = energy * recognizer.dynamic_energy_ratio
+    recognizer.energy_threshold = recognizer.energy_threshold * damping + target * (1 - damping)
+    return recognizer.energy_threshold
+
+
+def frame_rms(pcm, frame_length):
+    """按帧（frame_length个采样）计算16位PCM的均方根能量，不足一帧的尾部忽略"""
+    count = len(pcm) // (frame_length * 2)
+    try:
+        import numpy as np
+    except ImportError:
+        return [pcm_rms(pcm[index * frame_length * 2:(index + 1) * frame_length * 2]) for index in range(count)]
+    samples = np.frombuffer(pcm, dtype='<i2', count=count * frame_length).astype(np.float32)
+    return np.sqrt((samples.reshape(count, frame_length) ** 2).mean(axis=1)).tolist()
+
+
+def split_at_silence(pcm, sample_rate, max_chunk_s=15.0, min_silence_s=0.4, overlap_s=0.2, silence_threshold=300,
+                     frame_ms=30):
+    """
+    在静音处切分长录音（16位单声道PCM），返回各片段的 (起始采样, 结束采样)
+    间隔短于min_silence_s的语音合并为一段，超过max_chunk_s的语音段强制切开；
+    每段前后各扩展overlap_s，相邻片段因此略有重叠，切点附近的字不会丢失。全静音部分不返回
+    """
+    frame_length = int(sample_rate * frame_ms / 1000)
+    energies = frame_rms(pcm, frame_length)
+    min_gap = max(1, int(round(min_silence_s * 1000 / frame_ms)))
+
+    # 有声帧合并为语音段（帧序号，左闭右开）
+    regions = []
+    for index, energy in enumerate(energies):
+        if energy < silence_threshold:
+            continue
+        if regions and index - regions[-1][1] < min_gap:
+            regions[-1][1] = index + 1
+        else:
+            regions.append([index, index + 1])
+
+    total = len(pcm) // 2
+    max_chunk = max(frame_length, int(max_chunk_s * sample_rate))
+    overlap = int(overlap_s * sample_rate)
+    chunks = []
+    for start_frame, end_frame in regions:
+        start, end = start_frame * frame_length, end_frame * frame_length
+        while True:
+            piece_end = min(end, start + max_chunk)
+            chunks.append((max(0, start - overlap), min(total, piece_end + overlap)))
+            if piece_end >= end:
+                break
+            start = piece_end
+    return chunks
+
+
+def pcm_to_wav(pcm, sample_width=2, channels=1, rate=16000):
+    """为PCM数据加上WAV文件头"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(sample_width)
+        wav.setframerate(rate)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
+
+def wav_to_pcm(data):
+    """解析WAV数据，返回 (PCM, (采样宽度, 声道数, 采样率))；数据无效时抛出 wave.Error 或 EOFError"""
+    with wave.open(io.BytesIO(data), 'rb') as wav:
+        return wav.readframes(wav.getnframes()), (wav.getsampwidth(), wav.getnchannels(), wav.getframerate())
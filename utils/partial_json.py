@@ -0,0 +1,74 @@
+"""
+增量JSON解析工具模块
+用于在LLM流式输出过程中提前读取已经完整的JSON字段
+"""
+import json
+
+
+class PartialJSONParser:
+    """
+    增量解析单个JSON对象
+    每次喂入文本片段后，返回目前已完整输出的字段快照
+    """
+
+    _CLOSERS = {'{': '}', '[': ']'}
+
+    def __init__(self):
+        self.buffer = []
+        self.stack = []
+        self.started = False
+        self.in_string = False
+        self.escape = False
+        self.complete = False
+        self.snapshot = None
+        self.snapshot_depth = None  # 生成快照时的嵌套深度，1表示顶层字段都已完整
+
+    def feed(self, text):
+        """喂入文本片段，返回最新快照（尚无完整字段时返回None）"""
+        for char in text or "":
+            if self.complete:
+                break
+
+            if not self.started:
+                # 跳过JSON对象之前的说明文字
+                if char != '{':
+                    continue
+                self.started = True
+
+            self.buffer.append(char)
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == '\\':
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                continue
+
+            if char == '"':
+                self.in_string = True
+            elif char in self._CLOSERS:
+                self.stack.append(char)
+            elif char in '}]':
+                if self.stack:
+                    self.stack.pop()
+                self._take_snapshot(len(self.buffer))
+                if not self.stack:
+                    self.complete = True
+            elif char == ',':
+                # 逗号之前的所有值都已完整
+                self._take_snapshot(len(self.buffer) - 1)
+
+        return self.snapshot
+
+    def _take_snapshot(self, end):
+        """将缓冲区前缀补全括号后尝试解析"""
+        closers = ''.join(self._CLOSERS[opener] for opener in reversed(self.stack))
+        try:
+            value = json.loads(''.join(self.buffer[:end]) + closers)
+        except ValueError:
+            return
+        if isinstance(value, dict):
+            self.snapshot = value
+            self.snapshot_depth = len(self.stack)
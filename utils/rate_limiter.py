@@ -0,0 +1,39 @@
+"""
+限流工具模块
+"""
+import time
+import threading
+
+
+class RateLimiter:
+    """线程安全的令牌桶限流器"""
+
+    def __init__(self, rate, burst=None):
+        """
+        Args:
+            rate: 每秒允许的请求数，为空或0表示不限流
+            burst: 令牌桶容量，默认等于rate（至少为1）
+        """
+        self.rate = rate or 0
+        self.capacity = burst or max(1, self.rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """获取一个令牌，必要时阻塞等待；返回等待时长（秒）"""
+        if self.rate <= 0:
+            return 0.0
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
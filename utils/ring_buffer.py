@@ -0,0 +1,61 @@
+"""
+环形缓冲区模块
+"""
+import array
+
+
+class ChunkRingBuffer:
+    """
+    预分配的分块环形缓冲区
+    每次写入占用一个固定大小的槽位，按写入序号访问；读取返回指向缓冲区的memoryview，不复制数据。
+    返回的视图在对应槽位被覆盖前有效（即之后最多再写入 slots-1 块）
+    """
+
+    def __init__(self, slots, slot_size):
+        if slots < 1 or slot_size < 1:
+            raise ValueError("槽位数与槽位大小必须为正数")
+        self.slots = slots
+        self.slot_size = slot_size
+        self._buffer = bytearray(slots * slot_size)
+        self._view = memoryview(self._buffer)
+        self._lengths = array.array('I', bytes(4 * slots))
+        self.next_seq = 0  # 下一块的写入序号（即已写入的总块数）
+
+    @property
+    def oldest_seq(self):
+        """仍保留在缓冲区中的最早块序号"""
+        return max(0, self.next_seq - self.slots)
+
+    @property
+    def nbytes(self):
+        """缓冲区占用的字节数"""
+        return len(self._buffer)
+
+    def write(self, data):
+        """写入一块数据（不超过槽位大小），返回其序号"""
+        size = len(data)
+        if size > self.slot_size:
+            raise ValueError(f"数据块大小 {size} 超过槽位大小 {self.slot_size}")
+        seq = self.next_seq
+        slot = seq % self.slots
+        offset = slot * self.slot_size
+        self._view[offset:offset + size] = data
+        self._lengths[slot] = size
+        self.next_seq += 1
+        return seq
+
+    def chunk(self, seq):
+        """返回序号为seq的块的只读视图"""
+        if not self.oldest_seq <= seq < self.next_seq:
+            raise IndexError(f"块 {seq} 不在缓冲区中（{self.oldest_seq}~{self.next_seq - 1}）")
+        slot = seq % self.slots
+        offset = slot * self.slot_size
+        return self._view[offset:offset + self._lengths[slot]].toreadonly()
+
+    def chunks(self, start, end):
+        """返回序号在 [start, end) 内的块视图列表"""
+        return [self.chunk(seq) for seq in range(start, end)]
+
+    def read(self, start, end):
+        """将 [start, end) 内的块复制为一段连续的bytes（只在需要脱离缓冲区保存时调用）"""
+        return b''.join(self.chunks(start, end))
@@ -0,0 +1,42 @@
+"""
+文本处理工具模块
+"""
+import unicodedata
+
+
+def normalize_utterance(text):
+    """
+    归一化语音文本，用作缓存与规则的键
+    折叠全角字符、大小写，去除标点与空白
+    """
+    if not text:
+        return ""
+    text = unicodedata.normalize('NFKC', text).lower()
+    return ''.join(
+        char for char in text
+        if unicodedata.category(char)[0] in ('L', 'N')
+    )
+
+
+SENTENCE_BREAKS = '。！？!?；;，,、：:\n'
+
+
+def split_sentences(text, min_chars=6):
+    """
+    在标点处切分文本（标点保留在前一段末尾），用于分段合成语音
+    不足 min_chars 个字的片段并入下一段，末尾过短的片段并入前一段
+    """
+    pieces = []
+    current = ''
+    for char in text:
+        current += char
+        if char in SENTENCE_BREAKS and len(current.strip()) >= min_chars:
+            pieces.append(current.strip())
+            current = ''
+    current = current.strip()
+    if current:
+        if pieces and len(current) < min_chars:
+            pieces[-1] += current
+        else:
+            pieces.append(current)
+    return pieces
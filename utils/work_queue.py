@@ -0,0 +1,154 @@
+"""
+有界工作队列模块
+"""
+import time
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ('drop_oldest', 'drop_newest', 'block')
+
+
+class BoundedWorkQueue:
+    """由固定数量工作线程消费的有界队列，队列满时按溢出策略处理新任务"""
+
+    def __init__(self, handler, max_size=4, workers=1, overflow_policy='drop_oldest', block_timeout=None,
+                 name="work-queue"):
+        """
+        Args:
+            handler: 处理单个任务的函数，在工作线程中调用
+            max_size: 队列容量（不含正在处理的任务）
+            workers: 工作线程数
+            overflow_policy: drop_oldest=丢弃最早的排队任务，drop_newest=丢弃新任务，block=等待空位
+            block_timeout: block策略的最长等待时间（秒），超时后丢弃新任务；为空表示一直等待
+        """
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"不支持的溢出策略：{overflow_policy}")
+        self.handler = handler
+        self.max_size = max(1, max_size)
+        self.workers = max(1, workers)
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout
+        self.name = name
+
+        self._items = deque()
+        self._condition = threading.Condition()
+        self._threads = []
+        self._running = False
+
+        self.enqueued = 0
+        self.processed = 0
+        self.failed = 0
+        self.dropped_oldest = 0
+        self.dropped_newest = 0
+        self.blocked_time = 0.0
+        self.max_depth = 0
+        self.busy = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def start(self):
+        """启动工作线程"""
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"{self.name}-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=2):
+        """停止工作线程，丢弃尚未处理的任务"""
+        with self._condition:
+            self._running = False
+            self._items.clear()
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+    def put(self, item):
+        """提交任务，返回是否入队（入队后可能因drop_oldest被挤出）"""
+        with self._condition:
+            if len(self._items) >= self.max_size:
+                if self.overflow_policy == 'drop_newest':
+                    self.dropped_newest += 1
+                    logger.warning(f"{self.name} 队列已满，丢弃新任务")
+                    return False
+                if self.overflow_policy == 'drop_oldest':
+                    self._items.popleft()
+                    self.dropped_oldest += 1
+                    logger.warning(f"{self.name} 队列已满，丢弃最早的排队任务")
+                else:
+                    start = time.monotonic()
+                    has_space = self._condition.wait_for(
+                        lambda: len(self._items) < self.max_size or not self._running,
+                        timeout=self.block_timeout
+                    )
+                    self.blocked_time += time.monotonic() - start
+                    if not has_space or not self._running:
+                        self.dropped_newest += 1
+                        logger.warning(f"{self.name} 等待队列空位超时，丢弃新任务")
+                        return False
+
+            self._items.append((time.monotonic(), item))
+            self.enqueued += 1
+            self.max_depth = max(self.max_depth, len(self._items))
+            self._condition.notify_all()
+            return True
+
+    def _work(self):
+        """工作线程：依次取出任务并处理"""
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._items or not self._running)
+                if not self._running:
+                    return
+                enqueued_at, item = self._items.popleft()
+                wait = time.monotonic() - enqueued_at
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+                self.busy += 1
+                # 唤醒因队列满而阻塞的提交方
+                self._condition.notify_all()
+
+            try:
+                self.handler(item)
+            except Exception as e:
+                logger.error(f"{self.name} 任务处理异常：{e}")
+                with self._condition:
+                    self.failed += 1
+            finally:
+                with self._condition:
+                    self.busy -= 1
+                    self.processed += 1
+                    self._condition.notify_all()
+
+    def join(self, timeout=None):
+        """等待队列清空且没有正在处理的任务，返回是否已清空"""
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._items and not self.busy, timeout=timeout)
+
+    def get_status(self):
+        """获取队列状态"""
+        with self._condition:
+            started = self.processed + self.busy
+            return {
+                "depth": len(self._items),
+                "max_depth": self.max_depth,
+                "capacity": self.max_size,
+                "workers": self.workers,
+                "busy": self.busy,
+                "overflow_policy": self.overflow_policy,
+                "enqueued": self.enqueued,
+                "processed": self.processed,
+                "failed": self.failed,
+                "dropped_oldest": self.dropped_oldest,
+                "dropped_newest": self.dropped_newest,
+                "blocked_time_s": round(self.blocked_time, 3),
+                "avg_wait_ms": round(self.total_wait / started * 1000, 2) if started else None,
+                "max_wait_ms": round(self.max_wait * 1000, 2)
+            }